@@ -0,0 +1,241 @@
+"""
+    memory_benchmarks.py
+
+    Measure the peak memory of rendering every widget on synthetic domains of increasing size
+    and check it against a memory budget per widget and size.
+
+        python benchmarks/memory_benchmarks.py --sizes small medium --output memory_results.json
+        python benchmarks/memory_benchmarks.py --sizes medium --budgets my_budgets.json
+
+    Every measurement is a cold render: the widget is rendered once in a new process on a fresh
+    copy of the synthetic domain, so no process cache, forecast summary file, observation store or
+    current conditions history of an earlier render is reused and the results do not depend on the
+    order of the datasources. Each widget is measured twice, each time in its own process and copy:
+    once to measure the increase of the peak resident set size (RSS, including memory allocated by
+    netCDF/HDF5) and once with tracemalloc to find the peak of the Python and NumPy allocations and
+    the source lines of the largest allocations still held when the render returns. The command
+    exits with status 1 if a widget exceeds its budget or the increase of its peak RSS can not be
+    measured because the peak can not be reset (/proc/self/clear_refs, Linux only).
+"""
+import os
+import sys
+import gc
+import json
+import argparse
+import tempfile
+import shutil
+import tracemalloc
+import multiprocessing
+from typing import List
+
+# pylint: disable=C0413
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.synthetic_domain import DOMAIN_SIZES, create_synthetic_domain
+from benchmarks.run_benchmarks import (
+    BENCHMARK_QUERY_PARAMETERS,
+    USER_ID,
+    DOMAIN_ID,
+    get_error_message,
+    get_metadata,
+)
+from hydrogen_widgets.utilities.widget_registry import get_datasources
+
+MB = 1024 * 1024
+
+# Budget of the increase of the peak RSS in MB of a cold render of a widget for each size.
+# The budgets are targets, not the last measured values: the memory of a render must scale with
+# its response, not with its input files, and the responses of the synthetic domains are a few MB,
+# so every widget is budgeted 100 MB. A datasource without a budget for a size is measured but
+# never fails.
+MEMORY_BUDGETS = {
+    "small": {
+        "current_conditions_heatmap": 100,
+        "location_map": 100,
+        "terrain_map": 100,
+        "terrain_obs_points": 100,
+        "observation_points": 100,
+        "forecast_soilmoisture_heatmap": 100,
+        "forecast_watertable_heatmap": 100,
+        "forecast_time_series": 100,
+        "scenario_timeseries": 100,
+    },
+    "medium": {
+        "current_conditions_heatmap": 100,
+        "location_map": 100,
+        "terrain_map": 100,
+        "terrain_obs_points": 100,
+        "observation_points": 100,
+        "forecast_soilmoisture_heatmap": 100,
+        "forecast_watertable_heatmap": 100,
+        "forecast_time_series": 100,
+        "scenario_timeseries": 100,
+    },
+}
+
+
+def run_memory_benchmarks(sizes: List[str], budgets: dict = None, datasources: List[str] = None, top: int = 5) -> dict:
+    """
+    Measure the peak memory of rendering every widget on a synthetic domain of each size.
+
+    Parameters
+    ----------
+    sizes: List[str]
+        Names of the sizes in DOMAIN_SIZES.
+    budgets: dict
+        Dict of size to a dict of datasource to the budget of the peak RSS increase in MB.
+        Uses MEMORY_BUDGETS if None.
+    datasources: List[str]
+        Datasources to measure. All the registered datasources if None.
+    top: int
+        Number of the largest allocations reported per widget.
+    Returns
+    -------
+    dict
+        The results with the metadata of the run. The "passed" value of the results is False if
+        any widget exceeded its budget, failed to render or its peak RSS could not be measured.
+    """
+
+    budgets = budgets if budgets is not None else MEMORY_BUDGETS
+    datasources = datasources if datasources else get_datasources()
+    results = []
+    for size_name in sizes:
+        size = DOMAIN_SIZES[size_name]
+        with tempfile.TemporaryDirectory() as domain_data_path:
+            create_synthetic_domain(domain_data_path, USER_ID, DOMAIN_ID, size)
+            for datasource in datasources:
+                query_parameters = BENCHMARK_QUERY_PARAMETERS.get(datasource, None)
+                result = {"datasource": datasource, "query_parameters": query_parameters}
+                for traced in [False, True]:
+                    result.update(measure_cold_render(domain_data_path, datasource, query_parameters, top, traced))
+                budget = budgets.get(size_name, {}).get(datasource, None)
+                result["size"] = size_name
+                result["budget_mb"] = budget
+                result["passed"] = "error" not in result and (budget is None or result["peak_rss_mb"] <= budget)
+                results.append(result)
+                print(
+                    f"{size_name:8} {datasource:32} {result.get('peak_rss_mb', float('nan')):9.1f} MB rss "
+                    f"{result.get('peak_traced_mb', float('nan')):9.1f} MB traced "
+                    f"budget {budget if budget is not None else '-':>6} {'ok' if result['passed'] else 'FAILED'}"
+                    f"  {result.get('error', '')}",
+                    flush=True,
+                )
+    metadata = get_metadata(1)
+    return {"metadata": metadata, "passed": all(r["passed"] for r in results), "results": results}
+
+
+def measure_cold_render(domain_data_path: str, datasource: str, query_parameters: dict, top: int, traced: bool) -> dict:
+    """Render a widget in a new process on a fresh copy of the synthetic domain and return its peak memory."""
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as data_path:
+        shutil.copytree(os.path.join(domain_data_path, USER_ID), os.path.join(data_path, USER_ID))
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            return pool.apply(measure_widget_memory, (datasource, query_parameters, data_path, top, traced))
+
+
+def measure_widget_memory(datasource: str, query_parameters: dict, data_path: str, top: int, traced: bool) -> dict:
+    """
+    Render a widget once in the current process and return the increase of the peak RSS of the render,
+    or with traced=True the tracemalloc peak and largest allocations of the render.
+    """
+
+    # pylint: disable=C0415
+    from hydrogen_widgets.utilities.widget_registry import get_widget_function, render_widget
+    from hydrogen_widgets.utilities.widget_cache_path import configure_widget_cache_path
+
+    os.environ["CLIENT_HYDRO_DATA_PATH"] = data_path
+    configure_widget_cache_path(os.path.join(data_path, "widget_cache"))
+    result = {}
+    try:
+        # Import the widget before measuring so the imports are not counted
+        get_widget_function(datasource)
+        gc.collect()
+        if not traced:
+            if not _reset_peak_rss():
+                # The peak of an earlier allocation would be reported, so the budget can not be checked
+                raise Exception("The peak RSS can not be measured: /proc/self/clear_refs can not reset it")
+            rss_before = _get_rss_bytes("VmRSS")
+            response = render_widget(datasource, USER_ID, DOMAIN_ID, query_parameters)
+            del response
+            result["peak_rss_mb"] = max(0, _get_rss_bytes("VmHWM") - rss_before) / MB
+        else:
+            tracemalloc.start()
+            response = render_widget(datasource, USER_ID, DOMAIN_ID, query_parameters)
+            snapshot = tracemalloc.take_snapshot()
+            _, peak_traced = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del response
+            result["peak_traced_mb"] = peak_traced / MB
+            result["top_allocations"] = [
+                {"location": str(statistic.traceback[0]), "mb": statistic.size / MB, "count": statistic.count}
+                for statistic in snapshot.statistics("lineno")[:top]
+            ]
+    except Exception as e:  # pylint: disable=W0703
+        result["error"] = get_error_message(e)
+    return result
+
+
+def _reset_peak_rss() -> bool:
+    """
+    Reset the peak resident set size of the process (Linux) so an earlier peak is not reported.
+    Returns False if the peak was not reset, e.g. without /proc or write access to /proc/self/clear_refs.
+    """
+
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="utf-8") as stream:
+            stream.write("5")
+        with open("/proc/self/status", "r", encoding="utf-8") as stream:
+            status = dict(line.split(":", 1) for line in stream if ":" in line)
+        peak_rss = int(status["VmHWM"].split()[0]) * 1024
+        rss = int(status["VmRSS"].split()[0]) * 1024
+    except (OSError, KeyError, ValueError):
+        return False
+    return peak_rss - rss < MB
+
+
+def _get_rss_bytes(field: str) -> int:
+    """
+    Get the current (VmRSS) or peak (VmHWM) resident set size of the process from /proc.
+    Uses the peak from getrusage if /proc is not available. The getrusage peak can not be
+    reset and may include the memory of the parent process of a spawned process.
+    """
+
+    # pylint: disable=C0415
+    import resource
+
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as stream:
+            for line in stream:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def main():
+    """Run the memory benchmarks from the command line."""
+
+    parser = argparse.ArgumentParser(description="Measure the peak memory of widgets on synthetic domains.")
+    parser.add_argument("--sizes", nargs="+", default=["small"], choices=list(DOMAIN_SIZES.keys()))
+    parser.add_argument("--datasources", nargs="*", default=None, help="Datasources to measure (default all)")
+    parser.add_argument("--budgets", default=None, help="Json file of {size: {datasource: MB}} budgets")
+    parser.add_argument("--top", type=int, default=5, help="Number of largest allocations reported per widget")
+    parser.add_argument("--output", default="memory_results.json", help="Json file of the results")
+    args = parser.parse_args()
+
+    budgets = None
+    if args.budgets:
+        with open(args.budgets, "r", encoding="utf-8") as stream:
+            budgets = json.load(stream)
+    results = run_memory_benchmarks(args.sizes, budgets, args.datasources, args.top)
+    with open(args.output, "w", encoding="utf-8") as stream:
+        json.dump(results, stream, indent=2)
+    print(f"Wrote {args.output}")
+    sys.exit(0 if results["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+    run_benchmarks.py
+
+    Time the render function of every widget on synthetic domains of increasing size and write
+    the results to a json file that can be compared with the results of another release.
+
+        python benchmarks/run_benchmarks.py --sizes small medium --repeat 5 --output results.json
+        python benchmarks/run_benchmarks.py --sizes small --compare previous_results.json
+
+    The synthetic domains are generated in a temporary directory (see synthetic_domain.py) and the
+    files derived from their inputs are written to another temporary directory (widget_cache_path.py).
+    Each widget is rendered without the widget cache. Before each cold render the files and
+    process caches derived from the inputs (forecast summary files, heatmap pyramids, the
+    observation store, the current conditions history, active cells and dated file indexes) are
+    removed, then the widget is rendered again warm. The results contain the min, median and max
+    seconds of the cold renders ("seconds") and of the warm renders ("warm_seconds"), the median
+    seconds of each stage of the cold renders (render_timing.py) and the seconds and bytes of the
+    json encoding of the response. Results are compared by the cold median.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime
+import tempfile
+import statistics
+import shutil
+from typing import List
+import numpy as np
+
+# pylint: disable=C0413
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.synthetic_domain import DOMAIN_SIZES, SCENARIO_ID, create_synthetic_domain
+from hydrogen_widgets.utilities.widget_registry import get_datasources, render_widget
+from hydrogen_widgets.utilities.widget_json import dumps_widget_response
+from hydrogen_widgets.utilities.render_timing import (
+    StageTimingHistogram,
+    add_timing_sink,
+    remove_timing_sink,
+)
+from hydrogen_widgets.utilities.active_cells import clear_active_cells
+from hydrogen_widgets.utilities.current_conditions_history import clear_current_conditions_histories
+from hydrogen_widgets.utilities.dated_file_index import clear_dated_file_indexes
+from hydrogen_widgets.utilities.heatmap_pyramid import clear_heatmap_pyramids
+from hydrogen_widgets.utilities.observation_store import clear_observation_stores
+from hydrogen_widgets.utilities.widget_cache_path import configure_widget_cache_path, get_domain_cache_directory
+
+USER_ID = "benchmark_user"
+DOMAIN_ID = "benchmark_domain"
+
+# Query parameters used to render each datasource of the synthetic domain
+BENCHMARK_QUERY_PARAMETERS = {
+    "forecast_soilmoisture_heatmap": {"scenario_id": SCENARIO_ID},
+    "forecast_watertable_heatmap": {"scenario_id": SCENARIO_ID},
+    "forecast_time_series": {"scenario_id": SCENARIO_ID},
+    "scenario_timeseries": {"scenario_id": SCENARIO_ID},
+    "terrain_obs_points": {"site_id": "00000000", "site_type": "streamflow", "site_name": "SITE 0"},
+}
+
+
+def run_benchmarks(sizes: List[str], repeat: int = 3, datasources: List[str] = None) -> dict:
+    """
+    Render every widget on a synthetic domain of each size.
+
+    Parameters
+    ----------
+    sizes: List[str]
+        Names of the sizes in DOMAIN_SIZES.
+    repeat: int
+        Number of times each widget is rendered.
+    datasources: List[str]
+        Datasources to render. All the registered datasources if None.
+    Returns
+    -------
+    dict
+        The benchmark results with the metadata of the run.
+    """
+
+    datasources = datasources if datasources else get_datasources()
+    results = []
+    for size_name in sizes:
+        size = DOMAIN_SIZES[size_name]
+        with tempfile.TemporaryDirectory() as data_path, tempfile.TemporaryDirectory() as cache_path:
+            create_synthetic_domain(data_path, USER_ID, DOMAIN_ID, size)
+            os.environ["CLIENT_HYDRO_DATA_PATH"] = data_path
+            configure_widget_cache_path(cache_path)
+            for datasource in datasources:
+                result = benchmark_widget(datasource, repeat)
+                result["size"] = size_name
+                result["dimensions"] = size._asdict()
+                results.append(result)
+                print(
+                    f"{size_name:8} {datasource:32} {result.get('seconds', {}).get('median', float('nan')):10.4f}s cold"
+                    f" {result.get('warm_seconds', {}).get('median', float('nan')):10.4f}s warm  {result.get('error', '')}",
+                    flush=True,
+                )
+    return {"metadata": get_metadata(repeat), "results": results}
+
+
+def benchmark_widget(datasource: str, repeat: int) -> dict:
+    """Render a widget cold and warm repeat times and return the timings."""
+
+    query_parameters = BENCHMARK_QUERY_PARAMETERS.get(datasource, None)
+    domain_path = get_benchmark_domain_path()
+    histogram = StageTimingHistogram()
+    seconds = []
+    warm_seconds = []
+    try:
+        for _ in range(repeat):
+            reset_render_caches(domain_path)
+            add_timing_sink(histogram)
+            try:
+                start = time.perf_counter()
+                response = render_widget(datasource, USER_ID, DOMAIN_ID, query_parameters)
+                seconds.append(time.perf_counter() - start)
+            finally:
+                remove_timing_sink(histogram)
+            start = time.perf_counter()
+            response = render_widget(datasource, USER_ID, DOMAIN_ID, query_parameters)
+            warm_seconds.append(time.perf_counter() - start)
+    except Exception as e:  # pylint: disable=W0703
+        return {"datasource": datasource, "error": get_error_message(e)}
+
+    start = time.perf_counter()
+    response_json = dumps_widget_response(response)
+    encode_seconds = time.perf_counter() - start
+    stages = histogram.percentiles().get(datasource, {})
+    return {
+        "datasource": datasource,
+        "query_parameters": query_parameters,
+        "repeat": repeat,
+        "seconds": {"min": min(seconds), "median": statistics.median(seconds), "max": max(seconds)},
+        "warm_seconds": {
+            "min": min(warm_seconds),
+            "median": statistics.median(warm_seconds),
+            "max": max(warm_seconds),
+        },
+        "stages": {stage: timing["p50"] for stage, timing in stages.items()},
+        "json_seconds": encode_seconds,
+        "json_bytes": len(response_json),
+    }
+
+
+def get_benchmark_domain_path() -> str:
+    """Get the path of the synthetic domain in CLIENT_HYDRO_DATA_PATH."""
+
+    return os.path.join(os.environ["CLIENT_HYDRO_DATA_PATH"], USER_ID, DOMAIN_ID)
+
+
+def reset_render_caches(domain_path: str):
+    """Remove the files and process caches derived from the inputs of a domain so the next render is cold."""
+
+    shutil.rmtree(get_domain_cache_directory(domain_path), ignore_errors=True)
+    clear_current_conditions_histories()
+    clear_observation_stores()
+    clear_heatmap_pyramids()
+    clear_active_cells()
+    clear_dated_file_indexes()
+
+
+def get_error_message(error: Exception) -> str:
+    """Get the message of a widget render error including the message of the cause."""
+
+    message = str(error)
+    if error.__cause__ is not None and str(error.__cause__) not in message:
+        message = f"{message}: {str(error.__cause__)}"
+    return message
+
+
+def get_metadata(repeat: int) -> dict:
+    """Get the versions and machine of the benchmark run."""
+
+    # pylint: disable=C0415
+    from importlib.metadata import version, PackageNotFoundError
+
+    try:
+        package_version = version("hydrogen-widgets")
+    except PackageNotFoundError:
+        package_version = None
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "hydrogen_widgets": package_version,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+    }
+
+
+def compare_results(results: dict, previous: dict) -> List[dict]:
+    """
+    Compare the median seconds of benchmark results with previous results.
+    Returns a list of {size, datasource, previous, current, ratio} of the benchmarks in both results.
+    """
+
+    previous_seconds = {
+        (r["size"], r["datasource"]): r["seconds"]["median"] for r in previous.get("results", []) if "seconds" in r
+    }
+    comparison = []
+    for result in results.get("results", []):
+        key = (result["size"], result["datasource"])
+        if key in previous_seconds and "seconds" in result:
+            current = result["seconds"]["median"]
+            comparison.append(
+                {
+                    "size": key[0],
+                    "datasource": key[1],
+                    "previous": previous_seconds[key],
+                    "current": current,
+                    "ratio": current / previous_seconds[key] if previous_seconds[key] > 0 else None,
+                }
+            )
+    return comparison
+
+
+def main():
+    """Run the benchmarks from the command line."""
+
+    parser = argparse.ArgumentParser(description="Benchmark widget rendering on synthetic domains.")
+    parser.add_argument("--sizes", nargs="+", default=["small"], choices=list(DOMAIN_SIZES.keys()))
+    parser.add_argument("--repeat", type=int, default=3, help="Number of renders of each widget")
+    parser.add_argument("--datasources", nargs="*", default=None, help="Datasources to benchmark (default all)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Json file of the results")
+    parser.add_argument("--compare", default=None, help="Json file of previous results to compare with")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.repeat, args.datasources)
+    with open(args.output, "w", encoding="utf-8") as stream:
+        json.dump(results, stream, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as stream:
+            previous = json.load(stream)
+        for row in compare_results(results, previous):
+            ratio = f"{row['ratio']:.2f}x" if row["ratio"] is not None else "-"
+            print(f"{row['size']:8} {row['datasource']:32} {row['previous']:10.4f}s {row['current']:10.4f}s {ratio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+    synthetic_domain.py
+
+    Generate synthetic user domains with the files read by the widgets, scaled by grid size,
+    number of forecast members and time steps, scenario runs, observation sites and
+    shapefile vertices. The generated files have the same variables and layout as the
+    files of tests/test_data/test_user/test_domain.
+"""
+import os
+import json
+import datetime
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+import xarray as xr
+import shapefile
+
+
+class DomainSize(NamedTuple):
+    """Dimensions of a synthetic domain."""
+
+    nx: int = 49
+    ny: int = 20
+    nz: int = 5
+    forecast_members: int = 4
+    forecast_times: int = 12
+    forecast_files: int = 1
+    current_conditions_files: int = 1
+    scenario_runs: int = 4
+    scenario_times: int = 90
+    observation_sites: int = 6
+    observation_days: int = 3650
+    shapefile_vertices: int = 100
+
+
+# Sizes used by the benchmarks. "small" is about the size of the test domain.
+DOMAIN_SIZES = {
+    "small": DomainSize(),
+    "medium": DomainSize(
+        nx=250, ny=200, forecast_members=8, forecast_times=30, forecast_files=5, current_conditions_files=30,
+        scenario_runs=8, scenario_times=120, observation_sites=50, observation_days=7300, shapefile_vertices=2000,
+    ),
+    "large": DomainSize(
+        nx=1000, ny=800, forecast_members=16, forecast_times=60, forecast_files=10, current_conditions_files=90,
+        scenario_runs=16, scenario_times=180, observation_sites=200, observation_days=14600, shapefile_vertices=20000,
+    ),
+}
+
+SCENARIO_ID = "benchmark"
+_WGS84_BOUNDS = [-105.5, 39.6, -104.9, 39.9]
+
+
+def create_synthetic_domain(data_path: str, user_id: str, domain_id: str, size: DomainSize, seed: int = 0) -> str:
+    """
+    Create the files of a synthetic domain.
+
+    Parameters
+    ----------
+    data_path: str
+        Root directory of user domains (the value of CLIENT_HYDRO_DATA_PATH).
+    user_id: str
+        User id of the domain.
+    domain_id: str
+        Domain id of the domain.
+    size: DomainSize
+        The dimensions of the domain.
+    seed: int
+        Seed of the random values.
+    Returns
+    -------
+    str
+        The path of the domain directory.
+    """
+
+    domain_path = f"{data_path}/{user_id}/{domain_id}"
+    rng = np.random.default_rng(seed)
+    for directory in [
+        "domain_files",
+        "current_conditions",
+        f"forecast/{SCENARIO_ID}",
+        f"scenarios/{SCENARIO_ID}",
+        "observations/streamflow",
+        "observations/groundwater",
+    ]:
+        os.makedirs(f"{domain_path}/{directory}", exist_ok=True)
+
+    create_domain_state(domain_path, size)
+    create_static_domain_variables(domain_path, size, rng)
+    create_current_conditions(domain_path, size, rng)
+    create_forecasts(domain_path, size, rng)
+    create_scenarios(domain_path, size, rng)
+    create_observations(domain_path, size, rng)
+    create_shapefile(domain_path, size)
+    return domain_path
+
+
+def create_domain_state(domain_path: str, size: DomainSize):
+    """Create domain_state.json."""
+
+    domain_state = {
+        "name": os.path.basename(domain_path),
+        "wgs84_bounds": _WGS84_BOUNDS,
+        "grid_bounds": [1000, 700, 1000 + size.nx, 700 + size.ny],
+        "generated_scenarios": [SCENARIO_ID],
+    }
+    with open(f"{domain_path}/domain_state.json", "w") as stream:
+        json.dump(domain_state, stream, indent=2)
+
+
+def create_static_domain_variables(domain_path: str, size: DomainSize, rng: np.random.Generator):
+    """Create domain_files/static_domain_variables.nc with the porosity of the domain."""
+
+    porosity = rng.uniform(0.2, 0.5, (size.nz, size.ny, size.nx)).astype("float32")
+    ds = xr.Dataset({"porosity": (("z", "y", "x"), porosity)})
+    ds.to_netcdf(f"{domain_path}/domain_files/static_domain_variables.nc")
+
+
+def create_current_conditions(domain_path: str, size: DomainSize, rng: np.random.Generator):
+    """Create one current_conditions.MMDDYYYY.nc file per day ending today."""
+
+    today = datetime.date.today()
+    for day in range(size.current_conditions_files):
+        date = today - datetime.timedelta(days=day)
+        ds = xr.Dataset(
+            {
+                "soil_moisture": (("y", "x"), rng.uniform(0.0, 0.5, (size.ny, size.nx))),
+                "water_table_depth": (("y", "x"), rng.uniform(0.0, 40.0, (size.ny, size.nx))),
+            },
+            coords={"time": np.datetime64(date.isoformat(), "ns")},
+        )
+        ds.to_netcdf(f"{domain_path}/current_conditions/current_conditions.{date.strftime('%m%d%Y')}.nc")
+
+
+def create_forecasts(domain_path: str, size: DomainSize, rng: np.random.Generator):
+    """Create forecast files with saturation (member, time, z, y, x) and water_table_depth (member, time, y, x)."""
+
+    today = datetime.date.today()
+    shape = (size.forecast_members, size.forecast_times, size.nz, size.ny, size.nx)
+    for index in range(size.forecast_files):
+        date = today - datetime.timedelta(days=7 * index)
+        saturation = rng.uniform(0.2, 1.0, shape).astype("float32")
+        water_table_depth = rng.uniform(0.0, 40.0, shape[:2] + shape[3:]).astype("float32")
+        # Cells outside of the watershed are missing
+        saturation[..., : max(1, size.ny // 10), : max(1, size.nx // 10)] = np.nan
+        water_table_depth[..., : max(1, size.ny // 10), : max(1, size.nx // 10)] = np.nan
+        ds = xr.Dataset(
+            {
+                "saturation": (("member", "time", "z", "y", "x"), saturation),
+                "water_table_depth": (("member", "time", "y", "x"), water_table_depth),
+            },
+            coords={"time": pd.date_range(date.isoformat(), periods=size.forecast_times, freq="D")},
+        )
+        ds.to_netcdf(f"{domain_path}/forecast/{SCENARIO_ID}/forecast.{date.strftime('%m%d%Y')}.nc")
+
+
+def create_scenarios(domain_path: str, size: DomainSize, rng: np.random.Generator):
+    """Create the forcing files of the scenario runs."""
+
+    shape = (size.scenario_times, size.ny, size.nx)
+    times = pd.date_range("2022-05-24", periods=size.scenario_times, freq="D")
+    for run in range(1, size.scenario_runs + 1):
+        ds = xr.Dataset(
+            {
+                "APCP": (("time", "y", "x"), rng.uniform(0.0, 10.0, shape)),
+                "Temp_min": (("time", "y", "x"), rng.uniform(270.0, 285.0, shape)),
+                "Temp_max": (("time", "y", "x"), rng.uniform(285.0, 305.0, shape)),
+                "Temp_mean": (("time", "y", "x"), rng.uniform(280.0, 295.0, shape)),
+                "DSWR": (("time", "y", "x"), rng.uniform(100.0, 350.0, shape)),
+            },
+            coords={"time": times},
+        )
+        year = 2000 + run
+        ds.to_netcdf(f"{domain_path}/scenarios/{SCENARIO_ID}/run{run}.0524{year}_0821{year}.nc")
+
+
+def create_observations(domain_path: str, size: DomainSize, rng: np.random.Generator):
+    """Create obs_sites.csv and one daily observation file per site ending yesterday."""
+
+    end = datetime.date.today() - datetime.timedelta(days=1)
+    dates = pd.date_range(end=end.isoformat(), periods=size.observation_days, freq="D").strftime("%Y-%m-%d")
+    rows = []
+    for index in range(size.observation_sites):
+        site_type, variable = ("groundwater", "wtd") if index % 3 == 2 else ("streamflow", "streamflow")
+        site_id = f"{index:08d}"
+        latitude = rng.uniform(_WGS84_BOUNDS[1], _WGS84_BOUNDS[3])
+        longitude = rng.uniform(_WGS84_BOUNDS[0], _WGS84_BOUNDS[2])
+        values = rng.gamma(2.0, 5.0, size.observation_days)
+        values[rng.random(size.observation_days) < 0.05] = np.nan
+        ds = xr.Dataset({variable: (("datetime",), values)}, coords={"datetime": dates.to_numpy().astype("U10")})
+        ds.to_netcdf(f"{domain_path}/observations/{site_type}/{site_id}.nc")
+        rows.append(
+            [site_type, site_id, f"SITE {index}", latitude, longitude, f"{site_id}.nc", dates[0], dates[-1]]
+        )
+    columns = ["site_type", "site_id", "site_name", "latitude", "longitude", "netcdf_file", "start_date", "end_date"]
+    pd.DataFrame(rows, columns=columns).to_csv(f"{domain_path}/domain_files/obs_sites.csv", index=False)
+
+
+def create_shapefile(domain_path: str, size: DomainSize):
+    """Create domain_files/domain.shp with one polygon of the watershed with the number of vertices of the size."""
+
+    angles = np.linspace(0.0, 2.0 * np.pi, max(4, size.shapefile_vertices))
+    center_lon = (_WGS84_BOUNDS[0] + _WGS84_BOUNDS[2]) / 2
+    center_lat = (_WGS84_BOUNDS[1] + _WGS84_BOUNDS[3]) / 2
+    radius_lon = (_WGS84_BOUNDS[2] - _WGS84_BOUNDS[0]) * 0.45
+    radius_lat = (_WGS84_BOUNDS[3] - _WGS84_BOUNDS[1]) * 0.45
+    wobble = 1.0 + 0.1 * np.sin(angles * 7)
+    points = np.column_stack(
+        (center_lon + radius_lon * wobble * np.cos(angles), center_lat + radius_lat * wobble * np.sin(angles))
+    )
+    points[-1] = points[0]
+    with shapefile.Writer(f"{domain_path}/domain_files/domain", shapeType=shapefile.POLYGON) as writer:
+        writer.field("name", "C")
+        writer.poly([points.tolist()])
+        writer.record("watershed")
@@ -2,15 +2,31 @@
     current_conditions_heatmap.py
 """
 import os
+import datetime
 from typing import List
-from datetime import datetime
+import numpy as np
 from netCDF4 import Dataset
 from hydrogen_common import get_domain_path
-import plotly.graph_objs as go
 from hydrogen_widgets.utilities.create_plotly_html_file import create_plotly_html_file
+from hydrogen_widgets.utilities.heatmap_utilities import get_z_encoding
+from hydrogen_widgets.utilities.active_cells import ActiveCells, get_active_cells
+from hydrogen_widgets.utilities.heatmap_pyramid import (
+    HeatmapView,
+    get_heatmap_grid,
+    get_heatmap_values,
+    get_heatmap_view,
+)
+from hydrogen_widgets.utilities.render_timing import timed_stage
+from hydrogen_widgets.utilities.dated_file_index import DatedFile, get_dated_file_index
+from hydrogen_widgets.utilities.current_conditions_history import (
+    HISTORY_VARIABLES,
+    get_current_conditions_history,
+    parse_history_date,
+    read_current_conditions_grid,
+)
 
 
-def render_current_conditions_heatmap(user_id: str, domain_id: str) -> dict:
+def render_current_conditions_heatmap(user_id: str, domain_id: str, query_parameters: dict = None) -> dict:
     """
     Return API response to support the current conditions heatmap widget.
 
@@ -20,6 +36,14 @@ def render_current_conditions_heatmap(user_id: str, domain_id: str) -> dict:
         User id of the domain to get data.
     domain_id: str
         Domain id that identifies the user domain containing the widget data.
+    query_parameters: dict
+        Optional dictionary of options sent by query parameters to the API. The option 'z_encoding'
+        ("f4", "f8", "u8" or "u16") returns the z values of the heatmaps as plotly.js typed arrays instead of nested lists.
+        The options 'x_min', 'x_max', 'y_min', 'y_max', 'width' and 'height' return a window of the grid at
+        the resolution of the plot (see heatmap_pyramid.py). The option 'date' (YYYY-MM-DD) returns the
+        current conditions on or before the date instead of the latest current conditions and the options
+        'start_date' and 'end_date' return plotly frames of all the dates between them read from the
+        history of the domain (see current_conditions_history.py).
 
     Returns
     -------
@@ -29,102 +53,200 @@ def render_current_conditions_heatmap(user_id: str, domain_id: str) -> dict:
 
     try:
         domain_path = get_domain_path(user_id=user_id, domain_directory=domain_id)
+        z_encoding = get_z_encoding(query_parameters)
+        view = get_heatmap_view(query_parameters)
+        active_cells = get_active_cells(domain_path)
+        mask_inactive = active_cells.mask_inactive if active_cells is not None else lambda grid: grid
+        history_files = get_history_files(domain_path, query_parameters)
+        if history_files is not None:
+            return render_current_conditions_history(history_files, domain_path, z_encoding, view, active_cells)
         cc_date = find_recent_current_conditions_date(domain_path)
 
         # load data for heatmap for the date given above
         file = f"{domain_path}/current_conditions/current_conditions.{cc_date}.nc"
-        dataset = Dataset(file)
+        with timed_stage("open"):
+            dataset = Dataset(file)
 
         # Compute aspect ratio
         aspect_ratio = (
             dataset.variables["soil_moisture"].shape[0]
             / dataset.variables["soil_moisture"].shape[1]
         )
+        file_stat = os.stat(file)
+        soil_moisture_key = (file, file_stat.st_size, file_stat.st_mtime_ns, "soil_moisture", active_cells)
+        water_table_depth_key = (file, file_stat.st_size, file_stat.st_mtime_ns, "water_table_depth", active_cells)
+        with timed_stage("read"):
+            soil_moisture = get_heatmap_grid(
+                soil_moisture_key, view, lambda: mask_inactive(dataset.variables["soil_moisture"][:])
+            )
+            water_table_depth = get_heatmap_grid(
+                water_table_depth_key, view, lambda: mask_inactive(dataset.variables["water_table_depth"][:])
+            )
 
         # Collect data for traces
-        traces = []
-        traces.append(
-            {
-                "z": get_z_values(dataset, "soil_moisture"),
-                "type": "heatmap",
-                "visible": False,
-                "colorscale": "Viridis",
-                "reversescale": True,
-                "colorbar": {"title": "SM [-]"},
-            }
-        )
-        traces.append(
-            {
-                "z": get_z_values(dataset, "water_table_depth"),
-                "visible": True,
-                "type": "heatmap",
-                "colorscale": "Blues",
-                "colorbar": {"title": "WTD [m]"},
-            }
-        )
+        with timed_stage("encode"):
+            soil_moisture = get_heatmap_values(soil_moisture_key, soil_moisture, view, z_encoding)
+            water_table_depth = get_heatmap_values(water_table_depth_key, water_table_depth, view, z_encoding)
+        traces = get_traces(soil_moisture, water_table_depth)
+        layout = get_layout()
+
+        # Return response
+        response = {"traces": traces, "layout": layout, "aspectRatio": aspect_ratio}
+        return response
+    except Exception as e:
+        raise Exception("Unable to render current_conditions_heatmap") from e
+
+
+def render_current_conditions_history(
+    history_files: List[DatedFile], domain_path: str, z_encoding: str, view: HeatmapView, active_cells: ActiveCells
+) -> dict:
+    """
+    Return the API response of the current conditions heatmap widget for dates of the history of the domain.
+    The response of several dates contains a plotly frame and a slider step for each date.
+    """
+
+    mask_inactive = active_cells.mask_inactive if active_cells is not None else lambda grid: grid
+    history = get_current_conditions_history(domain_path)
+    with timed_stage("read"):
+        if history is not None:
+            grids = [history.frames(variable, history_files) for variable in HISTORY_VARIABLES]
+        else:
+            # Without history files read the grids of each date from its current conditions file
+            grids = [
+                [read_current_conditions_grid(f.path, variable) for f in history_files]
+                for variable in HISTORY_VARIABLES
+            ]
 
-        # Create menu buttons
-        updatemenus = [
+    frames = []
+    with timed_stage("encode"):
+        for (number, dated_file) in enumerate(history_files):
+            file_stat = os.stat(dated_file.path)
+            data = []
+            for (variable, variable_grids) in zip(HISTORY_VARIABLES, grids):
+                key = (dated_file.path, file_stat.st_size, file_stat.st_mtime_ns, variable, active_cells)
+                data.append(get_heatmap_values(key, mask_inactive(variable_grids[number]), view, z_encoding))
+            frames.append({"name": dated_file.date.isoformat(), "data": data})
+    (rows, columns) = np.shape(grids[0][0])
+    response = {
+        "traces": get_traces(*frames[0]["data"]),
+        "layout": get_layout(),
+        "aspectRatio": rows / columns,
+        "date": frames[0]["name"],
+    }
+    if len(frames) > 1:
+        response["frames"] = frames
+        response["layout"]["sliders"] = [
             {
-                "buttons": [
+                "active": 0,
+                "currentvalue": {"prefix": "Date: "},
+                "steps": [
                     {
-                        "args": [{"visible": [False, True]}],
-                        "label": "WTD",
-                        "method": "restyle",
-                    },
-                    {
-                        "args": [{"visible": [True, False]}],
-                        "label": "SM",
-                        "method": "restyle",
-                    },
+                        "label": frame["name"],
+                        "method": "animate",
+                        "args": [[frame["name"]], {"mode": "immediate", "frame": {"duration": 0, "redraw": True}}],
+                    }
+                    for frame in frames
                 ],
-                "direction": "down",
-                "pad": {"r": 10, "t": 10},
-                "showactive": True,
-                "x": 0.1,
-                "xanchor": "left",
-                "y": 1.0,
-                "yanchor": "top",
             }
         ]
+    return response
+
+
+def get_traces(soil_moisture: dict, water_table_depth: dict) -> List[dict]:
+    """Get the heatmap traces of the soil moisture and water table depth z values."""
 
-        # Create layout
-        layout = {
-            "margin": {"r": 0, "t": 30, "b": 50, "l": 50},
-            "updatemenus": updatemenus,
-            "xaxis": {"title": "X [km]"},
-            "yaxis": {"title": "Y [km]"},
+    traces = []
+    traces.append(
+        {
+            **soil_moisture,
+            "type": "heatmap",
+            "visible": False,
+            "colorscale": "Viridis",
+            "reversescale": True,
+            "colorbar": {"title": "SM [-]"},
+        }
+    )
+    traces.append(
+        {
+            **water_table_depth,
+            "visible": True,
+            "type": "heatmap",
+            "colorscale": "Blues",
+            "colorbar": {"title": "WTD [m]"},
         }
+    )
+    return traces
 
-        # Return response
-        response = {"traces": traces, "layout": layout, "aspectRatio": aspect_ratio}
-        return response
-    except Exception as e:
-        raise Exception("Unable to render current_conditions_heatmap") from e
+
+def get_layout() -> dict:
+    """Get the plotly layout with the menu to select the heatmap trace."""
+
+    # Create menu buttons
+    updatemenus = [
+        {
+            "buttons": [
+                {
+                    "args": [{"visible": [False, True]}],
+                    "label": "WTD",
+                    "method": "restyle",
+                },
+                {
+                    "args": [{"visible": [True, False]}],
+                    "label": "SM",
+                    "method": "restyle",
+                },
+            ],
+            "direction": "down",
+            "pad": {"r": 10, "t": 10},
+            "showactive": True,
+            "x": 0.1,
+            "xanchor": "left",
+            "y": 1.0,
+            "yanchor": "top",
+        }
+    ]
+
+    # Create layout
+    layout = {
+        "margin": {"r": 0, "t": 30, "b": 50, "l": 50},
+        "updatemenus": updatemenus,
+        "xaxis": {"title": "X [km]"},
+        "yaxis": {"title": "Y [km]"},
+    }
+    return layout
 
 
-def get_z_values(dataset: Dataset, value: str) -> List[List[float]]:
-    """Generate z values of the plotly heatmap"""
+def get_history_files(domain_path: str, query_parameters: dict) -> List[DatedFile]:
+    """
+    Get the current conditions files of the dates selected by the query parameters 'date' (the latest
+    file on or before the date) or 'start_date' and 'end_date' (the files from the start to the end date).
+    Dates are YYYY-MM-DD. Returns None if no dates are selected.
+    """
 
-    heatmap = go.Heatmap(z=dataset.variables[value])
-    return heatmap["z"].tolist()
+    query_parameters = query_parameters if query_parameters else {}
+    (date, start_date, end_date) = [query_parameters.get(name, None) for name in ["date", "start_date", "end_date"]]
+    if date is None and start_date is None and end_date is None:
+        return None
+    index = get_dated_file_index(f"{domain_path}/current_conditions", "current_conditions.")
+    if date is not None:
+        dated_file = index.on_or_before(parse_history_date(date))
+        if dated_file is None:
+            raise Exception(f"No current conditions on or before {date}.")
+        return [dated_file]
+    start_date = parse_history_date(start_date) if start_date is not None else datetime.date.min
+    end_date = parse_history_date(end_date) if end_date is not None else datetime.date.max
+    files = index.between(start_date, end_date)
+    if not files:
+        raise Exception(f"No current conditions from {start_date} to {end_date}.")
+    return files
 
 
-def find_recent_current_conditions_date(domain_path: str) -> List[str]:
+def find_recent_current_conditions_date(domain_path: str) -> str:
     """Look in domain_path to find the date of the most recent current_conditions files."""
 
-    result = None
     current_conditions_path = f"{domain_path}/current_conditions"
-    for f in os.listdir(current_conditions_path):
-        if f.startswith("current_conditions.") and f.endswith(".nc"):
-            start_pos = len("current_conditions.")
-            end_pos = start_pos + len("MMDDYYYY")
-            date_part = f[start_pos:end_pos]
-            if result is None or datetime.strptime(
-                date_part, "%m%d%Y"
-            ) > datetime.strptime(result, "%m%d%Y"):
-                result = date_part
-    return result
+    latest = get_dated_file_index(current_conditions_path, "current_conditions.").latest()
+    return latest.date.strftime("%m%d%Y") if latest is not None else None
 
 
 if __name__ == "__main__":
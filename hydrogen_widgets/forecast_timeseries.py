@@ -2,20 +2,20 @@
     forecast_timeseries_heatmap.py
 """
 import os
-from datetime import datetime
-from netCDF4 import Dataset
-import xarray as xr
+from typing import List
 import numpy as np
-from hydrogen_common import get_domain_path, get_domain_state
-import plotly.graph_objs as go
 from hydrogen_widgets.utilities.create_plotly_html_file import create_plotly_html_file
+from hydrogen_widgets.utilities.plotly_traces import build_trace
+from hydrogen_widgets.utilities.render_context import RenderContext
+from hydrogen_widgets.utilities.render_timing import timed_stage
 from hydrogen_widgets.utilities.forecast_utilities import (
-    get_forecast_nc_file,
-    get_latest_forecast_file,
+    get_forecast_times,
+    get_forecast_soil_moisture_summary,
+    get_forecast_water_table_depth_summary,
 )
 
 
-def render_forecast_timeseries(user_id:str, domain_id:str, query_parameters:dict)->dict:
+def render_forecast_timeseries(user_id:str, domain_id:str, query_parameters:dict, context:RenderContext=None)->dict:
     """
     Return API response to support the forecast_timeseries_heatmap widget.
 
@@ -25,6 +25,11 @@ def render_forecast_timeseries(user_id:str, domain_id:str, query_parameters:dict
         User id of the domain to get data.
     domain_id: str
         Domain id that identifies the user domain containing the widget data.
+    query_parameters: dict
+        A dictionary of options sent by query parameters to the API. This must include the
+        option 'scenario_id'.
+    context: RenderContext
+        Optional inputs shared with other widgets rendered for the same domain.
 
     Returns
     -------
@@ -32,130 +37,27 @@ def render_forecast_timeseries(user_id:str, domain_id:str, query_parameters:dict
         A dictionary (json structure) containing the response to be sent back to the UI
     """
 
+    if context is None:
+        # Close the datasets opened for this widget when it is not rendered with other widgets
+        with RenderContext(user_id, domain_id) as context:
+            return render_forecast_timeseries(user_id, domain_id, query_parameters, context)
+
     try:
-        domain_path = get_domain_path(user_id=user_id, domain_directory=domain_id)
         scenario_id = query_parameters.get("scenario_id", None)
-        forecast_nc_path = get_forecast_nc_file(domain_path, scenario_id)
-        static_domain_variables = (
-            f"{domain_path}/domain_files/static_domain_variables.nc"
-        )
-        ds = xr.open_mfdataset([forecast_nc_path, static_domain_variables])
-        (t, x, y) = ds["water_table_depth"].isel(member=0).shape
-
-        sm0 = np.array(
-            np.nan_to_num(np.array(ds["saturation"].isel(member=0)))
-            * np.nan_to_num(np.array(ds["porosity"]))
-        ).sum(axis=-1).sum(axis=-1)[:, -1] / (x * y)
-        sm1 = np.array(
-            np.nan_to_num(np.array(ds["saturation"].isel(member=1)))
-            * np.nan_to_num(np.array(ds["porosity"]))
-        ).sum(axis=-1).sum(axis=-1)[:, -1] / (x * y)
-        sm2 = np.array(
-            np.nan_to_num(np.array(ds["saturation"].isel(member=2)))
-            * np.nan_to_num(np.array(ds["porosity"]))
-        ).sum(axis=-1).sum(axis=-1)[:, -1] / (x * y)
-        sm3 = np.array(
-            np.nan_to_num(np.array(ds["saturation"].isel(member=3)))
-            * np.nan_to_num(np.array(ds["porosity"]))
-        ).sum(axis=-1).sum(axis=-1)[:, -1] / (x * y)
-
-        wtd0 = np.nan_to_num(np.array(ds["water_table_depth"].isel(member=0)).sum(axis=-1).sum(
-            axis=-1
-        ) / (x * y))
-        wtd1 = np.nan_to_num(np.array(ds["water_table_depth"].isel(member=1)).sum(axis=-1).sum(
-            axis=-1
-        ) / (x * y))
-        wtd2 = np.nan_to_num(np.array(ds["water_table_depth"].isel(member=2)).sum(axis=-1).sum(
-            axis=-1
-        ) / (x * y))
-        wtd3 = np.nan_to_num(np.array(ds["water_table_depth"].isel(member=3)).sum(axis=-1).sum(
-            axis=-1
-        ) / (x * y))
-
-        # Collect soil moisture values (0-3)
-        sm_traces = []
-        dates = ds.time.values.squeeze()
-
-        # Add soil moisture line graph traces
-        colors = ["blue", "red", "green", "purple"]
-        sm_traces.append(
-            {
-                "name": "Run 1",
-                "type": "scatter",
-                "line": {"width": 4, "color": colors[0]},
-                "x": [str(d) for d in dates],
-                "y": go.Scatter(y=(sm0 - sm0[0]))["y"].tolist(),
-            }
-        )
-        sm_traces.append(
-            {
-                "name": "Run 2",
-                "type": "scatter",
-                "line": {"width": 4, "color": colors[1]},
-                "x": [str(d) for d in dates],
-                "y": go.Scatter(y=(sm1 - sm1[0]))["y"].tolist(),
-            }
-        )
-        sm_traces.append(
-            {
-                "name": "Run 3",
-                "type": "scatter",
-                "line": {"width": 4, "color": colors[2]},
-                "x": [str(d) for d in dates],
-                "y": go.Scatter(y=(sm2 - sm2[0]))["y"].tolist(),
-            }
-        )
-        sm_traces.append(
-            {
-                "name": "Run 4",
-                "type": "scatter",
-                "line": {"width": 4, "color": colors[3]},
-                "x": [str(d) for d in dates],
-                "y": go.Scatter(y=(sm3 - sm3[0]))["y"].tolist(),
-            }
-        )
-        sm_layout = get_sm_layout()
-
-        # Collect waterdepth values (0-3)
-        wt_traces = []
-        # Add soil moisture line graph traces
-        wt_traces.append(
-            {
-                "name": "Run 1",
-                "type": "scatter",
-                "line": {"width": 4, "color": colors[0]},
-                "x": [str(d) for d in dates],
-                "y": go.Scatter(y=(wtd0 - wtd0[0]))["y"].tolist(),
-            }
-        )
-        wt_traces.append(
-            {
-                "name": "Run 2",
-                "type": "scatter",
-                "line": {"width": 4, "color": colors[1]},
-                "x": [str(d) for d in dates],
-                "y": go.Scatter(y=(wtd1 - wtd1[0]))["y"].tolist(),
-            }
-        )
-        wt_traces.append(
-            {
-                "name": "Run 3",
-                "type": "scatter",
-                "line": {"width": 4, "color": colors[2]},
-                "x": [str(d) for d in dates],
-                "y": go.Scatter(y=(wtd2 - wtd2[0]))["y"].tolist(),
-            }
-        )
-        wt_traces.append(
-            {
-                "name": "Run 4",
-                "type": "scatter",
-                "line": {"width": 4, "color": colors[3]},
-                "x": [str(d) for d in dates],
-                "y": go.Scatter(y=(wtd3 - wtd3[0]))["y"].tolist(),
-            }
-        )
-        wt_layout = get_wt_layout()
+        times = get_forecast_times(context, scenario_id)
+        soil_moisture = get_forecast_soil_moisture_summary(context, scenario_id)
+        water_table_depth = get_forecast_water_table_depth_summary(context, scenario_id)
+
+        with timed_stage("compute"):
+            sm_changes = soil_moisture.mean_changes()
+            wtd_changes = water_table_depth.mean_changes()
+
+        with timed_stage("encode"):
+            dates = [str(d) for d in times.squeeze()]
+            sm_traces = get_member_traces(dates, sm_changes)
+            sm_layout = get_sm_layout()
+            wt_traces = get_member_traces(dates, wtd_changes)
+            wt_layout = get_wt_layout()
 
         response = {
             "subplots": [
@@ -169,6 +71,24 @@ def render_forecast_timeseries(user_id:str, domain_id:str, query_parameters:dict
         raise Exception("Unable to render forecast_timeseries") from e
 
 
+def get_member_traces(dates:List[str], changes:np.ndarray)->List[dict]:
+    """Get a line graph trace of the changes (member, time) of each forecast member."""
+
+    colors = ["blue", "red", "green", "purple"]
+    traces = []
+    for member, member_changes in enumerate(changes):
+        traces.append(
+            build_trace(
+                "scatter",
+                name=f"Run {member + 1}",
+                line={"width": 4, "color": colors[member % len(colors)]},
+                x=dates,
+                y=member_changes,
+            )
+        )
+    return traces
+
+
 def get_sm_layout()->dict:
     """Get plotly layout to display soil moisture."""
 
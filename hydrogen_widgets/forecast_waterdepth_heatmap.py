@@ -2,19 +2,20 @@
     forecast_waterdepth_heatmap.py
 """
 import os
-from netCDF4 import Dataset
-import xarray as xr
-import numpy as np
-from hydrogen_common import get_domain_path, get_domain_state
-import plotly.graph_objs as go
 from hydrogen_widgets.utilities.create_plotly_html_file import create_plotly_html_file
+from hydrogen_widgets.utilities.render_context import RenderContext
+from hydrogen_widgets.utilities.heatmap_utilities import get_z_encoding
+from hydrogen_widgets.utilities.heatmap_pyramid import get_heatmap_view
+from hydrogen_widgets.utilities.heatmap_traces import add_heatmap_values, get_trace_loading
+from hydrogen_widgets.utilities.render_timing import timed_stage
 from hydrogen_widgets.utilities.forecast_utilities import (
-    get_forecast_nc_file,
+    get_forecast_heatmap_grids,
+    get_forecast_key,
 )
 
 
 def render_forecast_waterdepth_heatmap(
-    user_id: str, domain_id: str, query_parameters: dict
+    user_id: str, domain_id: str, query_parameters: dict, context: RenderContext = None
 ) -> dict:
     """
     Return API response to support the forecast_waterdepth_heatmap widget.
@@ -25,6 +26,15 @@ def render_forecast_waterdepth_heatmap(
         User id of the domain to get data.
     domain_id: str
         Domain id that identifies the user domain containing the widget data.
+    query_parameters: dict
+        A dictionary of options sent by query parameters to the API. This must include the
+        option 'scenario_id'. The option 'z_encoding' ("f4", "f8", "u8" or "u16") returns the z values
+        of the heatmaps as plotly.js typed arrays instead of nested lists. The options 'x_min', 'x_max',
+        'y_min', 'y_max', 'width' and 'height' return a window of the grids at the resolution of the
+        plot (see heatmap_pyramid.py). The option 'lazy_traces' returns values only for the visible
+        trace and 'trace_index' returns only one trace (see heatmap_traces.py).
+    context: RenderContext
+        Optional inputs shared with other widgets rendered for the same domain.
 
     Returns
     -------
@@ -32,82 +42,53 @@ def render_forecast_waterdepth_heatmap(
         A dictionary (json structure) containing the response to be sent back to the UI
     """
 
+    if context is None:
+        # Close the datasets opened for this widget when it is not rendered with other widgets
+        with RenderContext(user_id, domain_id) as context:
+            return render_forecast_waterdepth_heatmap(user_id, domain_id, query_parameters, context)
+
     try:
-        domain_path = get_domain_path(user_id=user_id, domain_directory=domain_id)
-        domain_state = get_domain_state(user_id=user_id, domain_directory=domain_id)
+        domain_state = context.domain_state
         grid_bounds = domain_state["grid_bounds"]
         scenario_id = query_parameters.get("scenario_id", None)
+        z_encoding = get_z_encoding(query_parameters)
+        view = get_heatmap_view(query_parameters)
+        trace_loading = get_trace_loading(query_parameters)
         aspectRatio = round(
             (grid_bounds[3] - grid_bounds[1]) / (grid_bounds[2] - grid_bounds[0]), 3
         )
-        forecast_nc_path = get_forecast_nc_file(domain_path, scenario_id)
-
-        ds = xr.open_mfdataset(forecast_nc_path)
-        var = "water_table_depth"
-        wtd0 = ds[var].isel(member=0)
-        wtd1 = ds[var].isel(member=1)
-        wtd2 = ds[var].isel(member=2)
-        wtd3 = ds[var].isel(member=3)
-
-        delta0 = np.nan_to_num(np.array(wtd0)[0] - np.array(wtd0)[-1])
-        delta1 = np.nan_to_num(np.array(wtd1)[0] - np.array(wtd1)[-1])
-        delta2 = np.nan_to_num(np.array(wtd2)[0] - np.array(wtd2)[-1])
-        delta3 = np.nan_to_num(np.array(wtd3)[0] - np.array(wtd3)[-1])
-
-        start = np.array(wtd0)[0]
-
-        traces = []
-        traces.append(
-            {
-                "type": "heatmap",
-                "name": "WDT",
-                "colorscale": "Blues",
-                "colorbar": {"title": "WDT      "},
-                "visible": True,
-                "z": get_z_values(start),
-            }
-        )
-        traces.append(
-            {
-                "type": "heatmap",
-                "name": "WDT Change",
-                "colorscale": "Blues",
-                "colorbar": {"title": "WTD Change Run 1"},
-                "visible": False,
-                "z": get_z_values(delta0),
-            }
-        )
-        traces.append(
-            {
-                "type": "heatmap",
-                "name": "WDT Change",
-                "colorscale": "Blues",
-                "colorbar": {"title": "WTD Change Run 2"},
-                "visible": False,
-                "z": get_z_values(delta1),
-            }
-        )
-        traces.append(
-            {
-                "type": "heatmap",
-                "name": "WDT Change",
-                "colorscale": "Blues",
-                "colorbar": {"title": "WTD Change Run 3"},
-                "visible": False,
-                "z": get_z_values(delta2),
-            }
-        )
-        traces.append(
-            {
-                "type": "heatmap",
-                "name": "WDT Change",
-                "colorscale": "Blues",
-                "colorbar": {"title": "WTD Change Run 4"},
-                "visible": False,
-                "z": get_z_values(delta3),
-            }
-        )
-        layout = get_layout(traces)
+        # Without a stored summary lazy traces read only the members of the traces returned with values
+        lazy = trace_loading.lazy or trace_loading.trace_index is not None
+        forecast_grids = get_forecast_heatmap_grids(context, scenario_id, "water_table_depth", lazy)
+        grid_key = get_forecast_key(context, scenario_id) + ("water_table_depth",)
+
+        with timed_stage("encode"):
+            traces = []
+            traces.append(
+                {
+                    "type": "heatmap",
+                    "name": "WDT",
+                    "colorscale": "Blues",
+                    "colorbar": {"title": "WDT      "},
+                    "visible": True,
+                }
+            )
+            grids = [(grid_key + ("start",), forecast_grids[0])]
+            for member in range(len(forecast_grids) - 1):
+                traces.append(
+                    {
+                        "type": "heatmap",
+                        "name": "WDT Change",
+                        "colorscale": "Blues",
+                        "colorbar": {"title": f"WTD Change Run {member + 1}"},
+                        "visible": False,
+                    }
+                )
+                grids.append((grid_key + (member,), forecast_grids[member + 1]))
+            traces = add_heatmap_values(traces, grids, view, z_encoding, trace_loading)
+            if trace_loading.trace_index is not None:
+                return {"traces": traces, "trace_index": trace_loading.trace_index}
+            layout = get_layout(traces)
         response = {"traces": traces, "aspectRatio": aspectRatio, "layout": layout}
         return response
     except Exception as e:
@@ -149,13 +130,6 @@ def get_layout(traces):
     return layout
 
 
-def get_z_values(nparray):
-    """Generate z values of the plotly heatmap"""
-
-    heatmap = go.Heatmap(z=nparray)
-    return heatmap["z"].tolist()
-
-
 if __name__ == "__main__":
     # Generate local HTML file for local testing
 
@@ -5,9 +5,10 @@ import os
 from typing import List
 import shapefile
 import pandas as pd
-import plotly.graph_objects as go
 from hydrogen_common import get_domain_path, get_domain_state
 from hydrogen_widgets.utilities.create_plotly_html_file import create_plotly_html_file
+from hydrogen_widgets.utilities.plotly_traces import build_trace
+from hydrogen_widgets.utilities.render_timing import timed_stage
 
 # pylint: disable=C0103,R0914
 
@@ -40,19 +41,20 @@ def render_location_map(user_id:str, domain_id:str)->dict:
 
         ## load in watershed outline
         shapefile_path = f"{domain_path}/domain_files/domain.shp"
-        watershed = shapefile.Reader(shapefile_path)
+        with timed_stage("read"):
+            watershed = shapefile.Reader(shapefile_path)
 
-        # read points from the watershed shapefile
-        shapefile_points = []
-        for shape in watershed.shapes():
-            for i in shape.points:
-                shapefile_points.append(i)
+            # read points from the watershed shapefile
+            shapefile_points = []
+            for shape in watershed.shapes():
+                for i in shape.points:
+                    shapefile_points.append(i)
 
-        shapefile_points = pd.DataFrame(shapefile_points, columns=["lon", "lat"])
+            shapefile_points = pd.DataFrame(shapefile_points, columns=["lon", "lat"])
 
-        # load observation locations
-        obs_site_file = f"{domain_path}/domain_files/obs_sites.csv"
-        OBS = pd.read_csv(obs_site_file)
+            # load observation locations
+            obs_site_file = f"{domain_path}/domain_files/obs_sites.csv"
+            OBS = pd.read_csv(obs_site_file)
 
         ### panel 2: geographic location and data points
         bbox_lat = (
@@ -70,49 +72,38 @@ def render_location_map(user_id:str, domain_id:str)->dict:
             domain_bounds[0],
         )
 
-        observation_points = go.Scattergeo(
-            lon=OBS["longitude"], lat=OBS["latitude"], name="Observations"
-        )
-
-        watershed_bounderies = go.Scattergeo(
-            lon=shapefile_points["lon"],
-            lat=shapefile_points["lat"],
-            mode="lines",
-            name="Watershed",
-            line=dict(width=1, color="cyan"),
-        )
-
-        traces = []
-        traces.append(
-            {
-                "type": "scattergeo",
-                "lat": bbox_lat,
-                "lon": bbox_lon,
-                "mode": "lines",
-                "name": "Bounding Box",
-                "line": {"width": 1, "color": "black"},
-            }
-        )
-
-        traces.append(
-            {
-                "type": "scattergeo",
-                "lat": observation_points["lat"].tolist(),
-                "lon": observation_points["lon"].tolist(),
-                "mode": "markers",
-                "marker": {"size": 3, "color": "blue"},
-            }
-        )
-
-        traces.append(
-            {
-                "type": "scattergeo",
-                "lat": watershed_bounderies["lat"].tolist(),
-                "lon": watershed_bounderies["lon"].tolist(),
-                "mode": "lines",
-                "line": {"width": 1, "color": "cyan"},
-            }
-        )
+        with timed_stage("encode"):
+            traces = []
+            traces.append(
+                build_trace(
+                    "scattergeo",
+                    lat=bbox_lat,
+                    lon=bbox_lon,
+                    mode="lines",
+                    name="Bounding Box",
+                    line={"width": 1, "color": "black"},
+                )
+            )
+
+            traces.append(
+                build_trace(
+                    "scattergeo",
+                    lat=OBS["latitude"],
+                    lon=OBS["longitude"],
+                    mode="markers",
+                    marker={"size": 3, "color": "blue"},
+                )
+            )
+
+            traces.append(
+                build_trace(
+                    "scattergeo",
+                    lat=shapefile_points["lat"],
+                    lon=shapefile_points["lon"],
+                    mode="lines",
+                    line={"width": 1, "color": "cyan"},
+                )
+            )
 
         projection_scale = get_projection_scale(domain_bounds)
 
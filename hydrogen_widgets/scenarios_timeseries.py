@@ -6,11 +6,17 @@ import os
 import glob
 from typing import List
 from hydrogen_common import get_domain_path
+import numpy as np
 import xarray as xr
+from hydrogen_widgets.utilities.active_cells import ActiveCells, get_active_cells
 from hydrogen_widgets.utilities.create_plotly_html_file import create_plotly_html_file
+from hydrogen_widgets.utilities.render_timing import timed_stage
 
 # pylint: disable=C0103,R0914,C0200
 
+# Number of time steps of a scenario variable read at a time
+TIME_CHUNK = 16
+
 
 def render_scenario_timeseries(user_id:str, domain_id:str, query_parameters:dict)->dict:
     """
@@ -53,9 +59,11 @@ def render_scenario_timeseries(user_id:str, domain_id:str, query_parameters:dict
         file_list = glob.glob(directory + "/*run*")
 
         ## Read in just one ensemble member to the number of timesteps and the variable list
-        run1 = xr.open_dataset(file_list[0])
+        with timed_stage("open"):
+            with xr.open_dataset(file_list[0]) as run1:
+                var_list = list(run1.data_vars)
+                dates = run1.time.values.squeeze()
         n_members = len(file_list)
-        var_list = list(run1.data_vars)
         ## add human readable names for buttons
         var_name = ["Precip", "Temp_min", "Temp_max", "Temp_mean", "Solar"]
         ## add descriptive axes for each plot
@@ -69,28 +77,36 @@ def render_scenario_timeseries(user_id:str, domain_id:str, query_parameters:dict
         ## turn off all plots except precip when first viewed
         vis_init = [True, False, False, False, False]
 
-        # Read the NetCDF files and concatenate all of the ensemble members together
-        ens_list = []
+        # Read the ensemble members one at a time so only one (time, y, x) variable is in memory
+        active_cells = get_active_cells(domain_path)
+        means = {}
         for i in range(n_members):
-            ds = xr.open_dataset(file_list[i])
-            ens_list.append(ds)
-
-        ens_ds = xr.concat(ens_list, dim="member")
-        dates = ens_ds.time.values.squeeze()
-        for j in range(len(var_list)):
-            for i in range(n_members):
-                temp_plot = ens_ds[var_list[j]].mean(dim=["x", "y"]).values.squeeze()
-                # get the spatially averaged values for a given variable
-                trace_name = f"{var_name[j]}: Run {i+1}"
-                trace = dict(
-                    type="scatter",
-                    line={"width": 2},
-                    x=[str(d) for d in dates],
-                    y=list(temp_plot[i, :]),
-                    name=trace_name,
-                    visible=vis_init[j],
-                )
-                traces.append(trace)
+            with timed_stage("open"):
+                ds = xr.open_dataset(file_list[i])
+            with ds, timed_stage("compute"):
+                for j in range(len(var_list)):
+                    # get the spatially averaged values for a given variable over the active cells
+                    means[(j, i)] = np.concatenate(
+                        [
+                            get_spatial_means(ds[var_list[j]].isel(time=slice(t, t + TIME_CHUNK)).values, active_cells)
+                            for t in range(0, ds.sizes["time"], TIME_CHUNK)
+                        ]
+                    )
+
+        with timed_stage("encode"):
+            x = [str(d) for d in dates]
+            for j in range(len(var_list)):
+                for i in range(n_members):
+                    trace_name = f"{var_name[j]}: Run {i+1}"
+                    trace = dict(
+                        type="scatter",
+                        line={"width": 2},
+                        x=x,
+                        y=list(means[(j, i)]),
+                        name=trace_name,
+                        visible=vis_init[j],
+                    )
+                    traces.append(trace)
 
         # Create Plotly layout and return response
         layout = create_layout(var_list, n_members, var_name, axis_name)
@@ -100,6 +116,22 @@ def render_scenario_timeseries(user_id:str, domain_id:str, query_parameters:dict
         raise Exception("Unable to render render_scenario_timeseries") from e
 
 
+def get_spatial_means(values:np.ndarray, active_cells:ActiveCells)->np.ndarray:
+    """
+    Get the means of the (..., y, x) values over the active cells ignoring missing (NaN) values (...), like
+    mean(dim=["x", "y"]) of xarray over the active cells. The mean of a time without a value is NaN.
+    """
+
+    if active_cells is not None and values.shape[-2:] == active_cells.shape:
+        values = active_cells.compress(values)
+    else:
+        # Forcing on another grid than the domain grid is averaged over all its cells
+        values = values.reshape(values.shape[:-2] + (-1,))
+    counts = np.count_nonzero(~np.isnan(values), axis=-1)
+    sums = np.nansum(values, axis=-1)
+    return np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+
+
 def create_layout(var_list:List[str], n_members:int, var_name:str, axis_name:str)->dict:
     """Create the plotly layout to draw the graph."""
 
@@ -4,12 +4,14 @@
 import os
 import datetime
 from typing import List
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-import xarray as xr
 import dateutil.relativedelta
 from hydrogen_common import get_domain_path
 from hydrogen_widgets.utilities.create_plotly_html_file import create_plotly_html_file
+from hydrogen_widgets.utilities.observation_store import get_observations
+from hydrogen_widgets.utilities.plotly_traces import build_trace
+from hydrogen_widgets.utilities.render_timing import timed_stage
 
 # pylint: disable=C0103,R0914,C0200
 
@@ -37,37 +39,33 @@ def render_streamflow_points(user_id:str, domain_id:str)->dict:
         traces = []
         buttons = []
         obs_sites_path = f"{domain_path}/domain_files/obs_sites.csv"
-        OBS = pd.read_csv(obs_sites_path)
+        with timed_stage("read"):
+            OBS = pd.read_csv(obs_sites_path)
         nRows = OBS.shape[0]
-        filepath = f"{domain_path}/observations/streamflow/"
 
-        range_min = (
-            datetime.datetime.now()
-            + dateutil.relativedelta.relativedelta(months=-12 * 2)
-        ).strftime("%Y-%m-%d")
+        range_min = np.datetime64(
+            (
+                datetime.datetime.now()
+                + dateutil.relativedelta.relativedelta(months=-12 * 2)
+            ).strftime("%Y-%m-%d")
+        )
         nRows = nRows if nRows <= 8 else 8
         for i in range(nRows):
             if OBS["site_type"][i] == "streamflow":
-                streamflow_filepath = filepath + OBS["netcdf_file"][i]
-                streamflow = xr.open_dataset(streamflow_filepath)
-                streamflow = streamflow.sel(datetime=streamflow.datetime >= range_min)
-                nPoints = streamflow["streamflow"].shape[0]
+                site_id = os.path.splitext(OBS["netcdf_file"][i])[0]
+                with timed_stage("read"):
+                    dates, values = get_observations(domain_path, "streamflow", site_id, start=range_min)
+                nPoints = len(dates)
                 if nPoints > 0:
-                    data = go.Scatter(
-                        x=streamflow["datetime"],
-                        y=streamflow["streamflow"].round(2),
-                        name=OBS["site_name"][i],
-                        visible=True,
-                    )
-                    dates = data["x"].tolist()
-                    name = data["name"]
-                    entry = {
-                        "type": "scatter",
-                        "name": name,
-                        "x": dates,
-                        "y": data["y"].tolist(),
-                    }
-                    traces.append(entry)
+                    with timed_stage("encode"):
+                        name = str(OBS["site_name"][i])
+                        entry = build_trace(
+                            "scatter",
+                            name=name,
+                            x=np.datetime_as_string(dates, unit="D"),
+                            y=values.round(2),
+                        )
+                        traces.append(entry)
                     button = {"label": name, "method": "update"}
                     buttons.append(button)
 
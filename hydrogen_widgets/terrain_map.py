@@ -10,6 +10,7 @@ import pandas
 import xarray
 from hydrogen_common import get_domain_path, get_domain_state
 from hydrogen_widgets.utilities.create_plotly_html_file import create_plotly_html_file
+from hydrogen_widgets.utilities.render_timing import timed_stage
 
 # pylint: disable=C0200,R0914,C0103
 
@@ -68,37 +69,40 @@ def get_watershed_and_gauge_info(domain_path:str, shape_file_path:str, wgs84_bou
     if not os.path.exists(shape_file_path):
         raise Exception(f"Shape file {shape_file_path} does not exist.")
 
-    watershed = shapefile.Reader(shape_file_path)
+    with timed_stage("read"):
+        watershed = shapefile.Reader(shape_file_path)
     huc_info_list = []
     min_lon = 1000
     max_lon = -1000
     min_lat = 1000
     max_lat = -1000
 
-    for shape in watershed.shapes():
-        lon_points = []
-        lat_points = []
-        for point in shape.points:
-            lon = point[0]
-            lat = point[1]
-            max_lon = lon if lon > max_lon else max_lon
-            min_lon = lon if lon < min_lon else min_lon
-            max_lat = lat if lat > max_lat else max_lat
-            min_lat = lat if lat < min_lat else min_lat
-            lon_points.append(str(lon))
-            lat_points.append(str(lat))
-
-        center_lon = (max_lon + min_lon) / 2
-        center_lat = (max_lat + min_lat) / 2
-
-        # creates the huc object and adds it to the list, for each huc
-        huc_info = {
-            "lat": lat_points,
-            "lon": lon_points,
-        }
-        huc_info_list.append(huc_info)
+    with timed_stage("compute"):
+        for shape in watershed.shapes():
+            lon_points = []
+            lat_points = []
+            for point in shape.points:
+                lon = point[0]
+                lat = point[1]
+                max_lon = lon if lon > max_lon else max_lon
+                min_lon = lon if lon < min_lon else min_lon
+                max_lat = lat if lat > max_lat else max_lat
+                min_lat = lat if lat < min_lat else min_lat
+                lon_points.append(str(lon))
+                lat_points.append(str(lat))
+
+            center_lon = (max_lon + min_lon) / 2
+            center_lat = (max_lat + min_lat) / 2
+
+            # creates the huc object and adds it to the list, for each huc
+            huc_info = {
+                "lat": lat_points,
+                "lon": lon_points,
+            }
+            huc_info_list.append(huc_info)
 
-    gauge_labels_in_shapefile = get_observation_sites(domain_path)
+    with timed_stage("read"):
+        gauge_labels_in_shapefile = get_observation_sites(domain_path)
 
     traces = []
 
@@ -4,10 +4,12 @@
 import os
 import datetime
 from typing import List
+import numpy
 import pandas
-import xarray
 from hydrogen_common import get_domain_path
 from hydrogen_widgets.utilities.create_plotly_html_file import create_plotly_html_file
+from hydrogen_widgets.utilities.observation_store import get_observations
+from hydrogen_widgets.utilities.render_timing import timed_stage
 
 # pylint: disable=C0103,R0914,C0200
 
@@ -39,11 +41,9 @@ def render_terrain_obs_points(user_id:str, domain_id:str, query_parameters:dict)
         site_type = query_parameters.get("site_type", None)
         site_name = query_parameters.get("site_name", None)
         if site_type == "streamflow":
-            add_obs_points_trace(
-                traces, domain_path, site_id, "streamflow", "streamflow"
-            )
+            add_obs_points_trace(traces, domain_path, site_id, "streamflow")
         if site_type == "groundwater":
-            add_obs_points_trace(traces, domain_path, site_id, "groundwater", "wtd")
+            add_obs_points_trace(traces, domain_path, site_id, "groundwater")
         layout = create_layout(site_type, site_id, site_name)
         response = {"traces": traces, "layout": layout}
         return response
@@ -117,31 +117,22 @@ def create_layout(site_type:str, site_id:str, site_name:str)->dict:
     return layout
 
 
-def add_obs_points_trace(traces:List[dict], domain_path:str, site_id:str, site_type:str, variable_name:List[str]):
-    """Get the stream flow data for the stream flow from the domain observations"""
-
-    dir_path = f"{domain_path}/observations/{site_type}/"
-    filepath = dir_path + site_id + ".nc"
-    ds = xarray.open_dataset(filepath)
-    ds = ds.dropna(dim="datetime")
-    ds["datetime"] = pandas.DatetimeIndex(ds["datetime"].values)
+def add_obs_points_trace(traces:List[dict], domain_path:str, site_id:str, site_type:str):
+    """Get the observations of a site from the observation store of the domain"""
 
     # limit the number of months of data returned, but return enough ...
     range_max = datetime.datetime.today().date()
     range_min = range_max - pandas.DateOffset(months=12 * 15)
 
-    # select data from original ds with dates in that range (through present)
-    past_six_months = ds.sel(datetime=ds.datetime >= range_min)
-
-    dates = past_six_months["datetime"]
-    ds = past_six_months[variable_name]
-
-    dates = dates.to_numpy().tolist()
-    values = ds.to_numpy().tolist()
+    # select the observations with dates in that range (through present)
+    with timed_stage("read"):
+        dates, values = get_observations(
+            domain_path, site_type, site_id, start=pandas.Timestamp(range_min).to_datetime64(), dropna=True
+        )
 
-    for date in range(len(dates)):
-        dates[date] = datetime.date.fromtimestamp(int(dates[date] / 1000000000))
-        dates[date] = dates[date].strftime("%Y-%m-%d")
+    with timed_stage("encode"):
+        dates = numpy.datetime_as_string(dates, unit="D").tolist()
+        values = values.tolist()
 
     traces.append({"mode": "lines", "x": dates, "y": values})
 
@@ -0,0 +1,147 @@
+"""
+    active_cells.py
+
+    Active cell index of a domain used to reduce grids over the watershed instead of over its bounding box.
+
+    A domain is a rectangular bounding box around an irregular watershed. The cells outside of the
+    watershed are inactive. The active cells are read from the "mask" variable (active if > 0) of
+    domain_files/static_domain_variables.nc or, if the file has no mask, from the top layer of the
+    "porosity" variable (active if finite and > 0). Grids with dimensions (..., y, x) are compressed
+    to vectors with dimensions (..., cells) over the active cells before they are reduced and are
+    scattered back to (..., y, x) grids with missing (NaN) inactive cells only to be displayed.
+    The active cells of a domain are cached in the process until the static file changes.
+"""
+import os
+import threading
+import numpy as np
+import xarray as xr
+
+
+class ActiveCells:
+    """Index of the active cells of a domain grid."""
+
+    def __init__(self, mask: np.ndarray):
+        """Create the index from a 2D (y, x) boolean grid that is True for the active cells."""
+
+        self.mask = np.asarray(mask, dtype=bool)
+        self.shape = self.mask.shape
+        self.indexes = np.flatnonzero(self.mask)
+        self.count = len(self.indexes)
+        self.all_active = self.count == self.mask.size
+
+    def compress(self, values: np.ndarray) -> np.ndarray:
+        """
+        Get the values of the active cells of grids.
+
+        Parameters
+        ----------
+        values: np.ndarray
+            Grids with dimensions (..., y, x). A NumPy or a dask array with one chunk over y and x.
+        Returns
+        -------
+        np.ndarray
+            The values with dimensions (..., cells). A view of the values if all the cells are active.
+        """
+
+        self._check_shape(values.shape[-2:])
+        flat = values.reshape(values.shape[:-2] + (-1,))
+        if self.all_active:
+            return flat
+        return np.take(flat, self.indexes, axis=-1)
+
+    def scatter(self, vectors: np.ndarray, fill_value: float = np.nan) -> np.ndarray:
+        """
+        Get the grids of vectors of values of the active cells.
+
+        Parameters
+        ----------
+        vectors: np.ndarray
+            Values with dimensions (..., cells).
+        fill_value: float
+            Value of the inactive cells.
+        Returns
+        -------
+        np.ndarray
+            The grids with dimensions (..., y, x). Integer vectors are converted to float if fill_value is NaN.
+        """
+
+        vectors = np.asarray(vectors)
+        if vectors.shape[-1] != self.count:
+            raise Exception(f"Expected {self.count} active cells but got {vectors.shape[-1]}.")
+        if self.all_active:
+            return vectors.reshape(vectors.shape[:-1] + self.shape)
+        dtype = np.result_type(vectors.dtype, np.min_scalar_type(fill_value))
+        grids = np.full(vectors.shape[:-1] + (self.mask.size,), fill_value, dtype=dtype)
+        grids[..., self.indexes] = vectors
+        return grids.reshape(vectors.shape[:-1] + self.shape)
+
+    def mask_inactive(self, grid: np.ndarray) -> np.ndarray:
+        """Get a float grid with dimensions (..., y, x) where the inactive and masked cells are NaN."""
+
+        self._check_shape(np.shape(grid)[-2:])
+        if self.all_active:
+            return grid
+        grid = np.ma.asarray(grid)
+        dtype = grid.dtype if np.issubdtype(grid.dtype, np.floating) else np.float64
+        return np.where(self.mask, np.ma.filled(grid.astype(dtype), np.nan), np.nan).astype(dtype)
+
+    def _check_shape(self, shape: tuple):
+        """Raise an exception if the (y, x) shape of grids is not the shape of the domain."""
+
+        if tuple(shape) != self.shape:
+            raise Exception(f"The grid shape {tuple(shape)} is not the domain shape {self.shape}.")
+
+
+def read_active_cells(static_domain_variables_path: str) -> ActiveCells:
+    """Read the active cells from the mask or porosity of a static domain variables file."""
+
+    with xr.open_dataset(static_domain_variables_path) as ds:
+        if "mask" in ds:
+            mask = np.asarray(ds["mask"])
+            mask = mask[-1] if mask.ndim == 3 else mask
+            return ActiveCells(np.nan_to_num(mask) > 0)
+        if "porosity" in ds:
+            porosity = np.asarray(ds["porosity"].isel(z=-1))
+            return ActiveCells(np.isfinite(porosity) & (porosity > 0))
+    raise Exception(f"The file '{static_domain_variables_path}' has no mask or porosity variable.")
+
+
+_active_cells = {}
+_active_cells_lock = threading.Lock()
+
+
+def get_active_cells(domain_path: str) -> ActiveCells:
+    """
+    Get the active cells of a domain.
+
+    Parameters
+    ----------
+    domain_path: str
+        Path to the domain directory.
+    Returns
+    -------
+    ActiveCells
+        The active cells of the domain or None if the domain has no static domain variables file.
+    """
+
+    path = f"{domain_path}/domain_files/static_domain_variables.nc"
+    try:
+        file_stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (file_stat.st_size, file_stat.st_mtime_ns)
+    with _active_cells_lock:
+        (cached_key, active_cells) = _active_cells.get(path, (None, None))
+    if cached_key == key:
+        return active_cells
+    active_cells = read_active_cells(path)
+    with _active_cells_lock:
+        _active_cells[path] = (key, active_cells)
+    return active_cells
+
+
+def clear_active_cells():
+    """Remove all the cached active cells."""
+
+    with _active_cells_lock:
+        _active_cells.clear()
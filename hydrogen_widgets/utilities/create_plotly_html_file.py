@@ -1,5 +1,6 @@
 import os
 import json
+from hydrogen_widgets.utilities.widget_json import to_json_compatible
 
 def create_plotly_html_file(basefile_name:str, api_result:dict):
     """
@@ -27,7 +28,7 @@ def create_plotly_html_file(basefile_name:str, api_result:dict):
     from_path = os.path.dirname(__file__)
     with open(f"{from_path}/data/demo.html", "r") as stream:
         contents = stream.read()
-        contents = contents.replace("${API_RESULT}", json.dumps(api_result, indent=2))
+        contents = contents.replace("${API_RESULT}", json.dumps(to_json_compatible(api_result), indent=2))
     html_file = f"{target_path}/{target_name}.html"
     with open(html_file, "w+") as stream:
         stream.write(contents)
@@ -0,0 +1,270 @@
+"""
+    current_conditions_history.py
+
+    Memory mapped history cube of the current conditions of a domain.
+
+    The soil_moisture and water_table_depth grids of each current_conditions.MMDDYYYY.nc file of a
+    domain are appended once to the raw files current_conditions/history/<variable>.dat in the widget
+    cache directory of the domain (widget_cache_path.py), one (y, x) frame per file, and the file name,
+    size and modification time of each frame are written to current_conditions/history/index.json.
+    The .dat files are memory mapped, so the grids of any
+    date or sequence of dates are sliced from the cube without opening the netCDF files. Files
+    added or modified since the history was last updated are appended (or their frame rewritten)
+    when the history is requested. Missing values are NaN.
+
+    The history is not used if the environment variable HYDROGEN_WIDGET_CURRENT_CONDITIONS_HISTORY
+    is 0, HYDROGEN_WIDGET_CACHE_PATH is not set, the widget cache directory is not writable or the
+    platform has no fcntl file locks to share the history files between processes (Windows).
+"""
+import os
+import json
+import datetime
+import tempfile
+import threading
+from typing import List
+import numpy as np
+from netCDF4 import Dataset
+from hydrogen_widgets.utilities.dated_file_index import DatedFile, get_dated_file_index
+from hydrogen_widgets.utilities.widget_cache_path import get_domain_cache_directory
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Increment when the format of the history files changes so existing histories are rebuilt
+CURRENT_CONDITIONS_HISTORY_VERSION = 1
+
+# Variables of the current conditions files stored in the history
+HISTORY_VARIABLES = ["soil_moisture", "water_table_depth"]
+
+_config = {"enabled": os.environ.get("HYDROGEN_WIDGET_CURRENT_CONDITIONS_HISTORY", "1") != "0"}
+
+
+class CurrentConditionsHistory:
+    """Frames of the current conditions variables of a domain mapped from the history files."""
+
+    def __init__(self, directory: str, index: dict):
+        """Map the history files of a directory described by the contents of its index file."""
+
+        self.directory = directory
+        self.shape = tuple(index["shape"])
+        self.dtype = np.dtype(index["dtype"])
+        # (name, size, mtime_ns) of the current conditions file of each frame
+        self.frame_files = [tuple(frame) for frame in index["frames"]]
+        self._frames = {frame[0]: number for (number, frame) in enumerate(self.frame_files)}
+        self._cubes = {}
+        self._lock = threading.Lock()
+
+    def cube(self, variable: str) -> np.ndarray:
+        """Get the read only memory mapped frames of a variable with dimensions (frame, y, x)."""
+
+        with self._lock:
+            cube = self._cubes.get(variable, None)
+            if cube is None:
+                cube = np.memmap(
+                    f"{self.directory}/{variable}.dat",
+                    dtype=self.dtype,
+                    mode="r",
+                    shape=(len(self.frame_files),) + self.shape,
+                )
+                self._cubes[variable] = cube
+            return cube
+
+    def frames(self, variable: str, files: List[DatedFile]) -> np.ndarray:
+        """
+        Get the grids of a variable of current conditions files.
+
+        Parameters
+        ----------
+        variable: str
+            The name of the variable, e.g. "soil_moisture".
+        files: List[DatedFile]
+            Current conditions files from the dated file index of the domain.
+        Returns
+        -------
+        np.ndarray
+            The grids with dimensions (file, y, x). A view of the memory mapped cube if the frames
+            of the files are consecutive. Raises an exception if a file is not in the history.
+        """
+
+        try:
+            numbers = [self._frames[f.name] for f in files]
+        except KeyError as e:
+            raise Exception(f"The current conditions file {e} is not in the history.") from e
+        cube = self.cube(variable)
+        if numbers and numbers == list(range(numbers[0], numbers[0] + len(numbers))):
+            return cube[numbers[0] : numbers[0] + len(numbers)]
+        return cube[numbers]
+
+
+def configure_current_conditions_history(enabled: bool):
+    """Enable or disable the current conditions history files."""
+
+    _config["enabled"] = enabled
+
+
+def is_current_conditions_history_enabled() -> bool:
+    """Return True if the current conditions history files are used."""
+
+    return _config["enabled"]
+
+
+def get_current_conditions_history_directory(domain_path: str) -> str:
+    """Get the directory of the history files of a domain or None if HYDROGEN_WIDGET_CACHE_PATH is not set."""
+
+    cache_directory = get_domain_cache_directory(domain_path)
+    if cache_directory is None:
+        return None
+    return os.path.join(cache_directory, "current_conditions", "history")
+
+
+_histories = {}
+# Lock of the threads updating the history of each directory
+_directory_locks = {}
+_histories_lock = threading.Lock()
+
+
+def get_current_conditions_history(domain_path: str) -> CurrentConditionsHistory:
+    """
+    Get the history of the current conditions of a domain after appending the current conditions
+    files added or modified since the history was last updated.
+
+    Parameters
+    ----------
+    domain_path: str
+        Path to the domain directory.
+    Returns
+    -------
+    CurrentConditionsHistory
+        The history or None if history files are disabled, the domain has no current conditions
+        files or the widget cache directory of the domain is not set or not writable.
+    """
+
+    directory = get_current_conditions_history_directory(domain_path)
+    if not _config["enabled"] or directory is None or fcntl is None:
+        return None
+    current_conditions_path = f"{domain_path}/current_conditions"
+    files = get_dated_file_index(current_conditions_path, "current_conditions.").files
+    if not files:
+        return None
+    frame_files = [_get_frame_file(f) for f in files]
+    with _histories_lock:
+        history = _histories.get(directory, None)
+    if history is not None and set(frame_files).issubset(history.frame_files):
+        return history
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        lock_stream = open(f"{directory}/.lock", "a", encoding="utf-8")
+    except OSError:
+        return None
+    with _histories_lock:
+        directory_lock = _directory_locks.setdefault(directory, threading.Lock())
+    with directory_lock, lock_stream:
+        # Other processes append to the same files, so the index is read again while locked
+        fcntl.flock(lock_stream, fcntl.LOCK_EX)
+        index = _read_index(directory)
+        index = _append_frames(directory, index, files, frame_files)
+        history = CurrentConditionsHistory(directory, index)
+    with _histories_lock:
+        _histories[directory] = history
+    return history
+
+
+def clear_current_conditions_histories():
+    """Remove all the cached histories. The history files are not removed."""
+
+    with _histories_lock:
+        _histories.clear()
+
+
+def read_current_conditions_grid(path: str, variable: str) -> np.ndarray:
+    """Read the (y, x) grid of a variable of a current conditions file with NaN missing values."""
+
+    with Dataset(path) as dataset:
+        grid = dataset.variables[variable][:]
+    dtype = grid.dtype if np.issubdtype(grid.dtype, np.floating) else np.float64
+    return np.ma.filled(np.ma.asarray(grid).astype(dtype), np.nan)
+
+
+def _get_frame_file(dated_file: DatedFile) -> tuple:
+    """Get the (name, size, mtime_ns) of a current conditions file."""
+
+    file_stat = os.stat(dated_file.path)
+    return (dated_file.name, file_stat.st_size, file_stat.st_mtime_ns)
+
+
+def _read_index(directory: str) -> dict:
+    """Read the index file of a history or return None if it does not exist or has another version."""
+
+    try:
+        with open(f"{directory}/index.json", "r", encoding="utf-8") as stream:
+            index = json.load(stream)
+    except (OSError, ValueError):
+        return None
+    return index if index.get("version", None) == CURRENT_CONDITIONS_HISTORY_VERSION else None
+
+
+def _append_frames(directory: str, index: dict, files: List[DatedFile], frame_files: List[tuple]) -> dict:
+    """Write the frames of the files that are not in the history or were modified and return the new index."""
+
+    if index is None:
+        # Rebuild the history from the first file
+        grids = {variable: read_current_conditions_grid(files[0].path, variable) for variable in HISTORY_VARIABLES}
+        index = {
+            "version": CURRENT_CONDITIONS_HISTORY_VERSION,
+            "shape": list(grids[HISTORY_VARIABLES[0]].shape),
+            "dtype": grids[HISTORY_VARIABLES[0]].dtype.str,
+            "frames": [],
+        }
+        for variable in HISTORY_VARIABLES:
+            open(f"{directory}/{variable}.dat", "wb").close()
+    frames = [tuple(frame) for frame in index["frames"]]
+    numbers = {frame[0]: number for (number, frame) in enumerate(frames)}
+    shape = tuple(index["shape"])
+    dtype = np.dtype(index["dtype"])
+    changed = False
+    for (dated_file, frame_file) in zip(files, frame_files):
+        number = numbers.get(frame_file[0], None)
+        if number is not None and frames[number] == frame_file:
+            continue
+        if number is None:
+            number = len(frames)
+            frames.append(frame_file)
+        frames[number] = frame_file
+        for variable in HISTORY_VARIABLES:
+            grid = read_current_conditions_grid(dated_file.path, variable)
+            if grid.shape != shape:
+                raise Exception(f"The grid shape {grid.shape} of '{dated_file.path}' is not the history shape {shape}.")
+            with open(f"{directory}/{variable}.dat", "r+b") as stream:
+                stream.seek(number * dtype.itemsize * grid.size)
+                stream.write(np.ascontiguousarray(grid, dtype=dtype).tobytes())
+        changed = True
+    index["frames"] = [list(frame) for frame in frames]
+    if changed:
+        _write_index(directory, index)
+    return index
+
+
+def _write_index(directory: str, index: dict):
+    """Replace the index file of a history."""
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as stream:
+            json.dump(index, stream)
+        os.replace(temp_path, f"{directory}/index.json")
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def parse_history_date(value: str) -> datetime.date:
+    """Parse a YYYY-MM-DD date query parameter."""
+
+    try:
+        return datetime.date.fromisoformat(str(value))
+    except ValueError as e:
+        raise Exception(f"Invalid date '{value}'. Expected YYYY-MM-DD.") from e
@@ -0,0 +1,140 @@
+"""
+    dated_file_index.py
+
+    Index of the files of a directory with a date in the file name, for example
+    forecast.MMDDYYYY.nc or current_conditions.MMDDYYYY.nc.
+
+    The dates of the file names are parsed once and kept sorted so the latest file, the file
+    nearest to a date and the files in a date range are found with a binary search. The index
+    of a directory is shared by all requests and is rebuilt when the modification time of the
+    directory changes (a file is added, removed or renamed).
+"""
+import os
+import time
+import bisect
+import datetime
+import threading
+from typing import List, NamedTuple
+
+# An index is rebuilt on the next lookup if the directory was modified less than this number
+# of seconds before it was scanned, because a file added in the same clock tick as the scan
+# would not change the modification time of the directory.
+_RACY_SECONDS = 2.0
+
+
+class DatedFile(NamedTuple):
+    """A file of a directory with the date of its file name."""
+
+    date: datetime.date
+    name: str
+    path: str
+
+
+class DatedFileIndex:
+    """Sorted dated files of a directory."""
+
+    def __init__(self, files: List[DatedFile]):
+        """Create an index of the dated files."""
+
+        self.files = sorted(files)
+        self.dates = [f.date for f in self.files]
+
+    def __len__(self):
+        return len(self.files)
+
+    def latest(self) -> DatedFile:
+        """Get the file with the latest date or None if there are no files."""
+
+        return self.files[-1] if self.files else None
+
+    def nearest(self, date: datetime.date) -> DatedFile:
+        """Get the file with the date nearest to the date (the earlier file if two are as near) or None if there are no files."""
+
+        if not self.files:
+            return None
+        index = bisect.bisect_left(self.dates, date)
+        if index == 0:
+            return self.files[0]
+        if index == len(self.files):
+            return self.files[-1]
+        before = self.files[index - 1]
+        after = self.files[index]
+        return before if date - before.date <= after.date - date else after
+
+    def on_or_before(self, date: datetime.date) -> DatedFile:
+        """Get the latest file with a date on or before the date or None if there is no such file."""
+
+        index = bisect.bisect_right(self.dates, date)
+        return self.files[index - 1] if index > 0 else None
+
+    def between(self, start_date: datetime.date, end_date: datetime.date) -> List[DatedFile]:
+        """Get the files with a date from start_date to end_date (inclusive) sorted by date."""
+
+        return self.files[bisect.bisect_left(self.dates, start_date) : bisect.bisect_right(self.dates, end_date)]
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_dated_file_index(
+    directory: str, prefix: str, suffix: str = ".nc", date_format: str = "%m%d%Y"
+) -> DatedFileIndex:
+    """
+    Get the index of the files of a directory named prefix + date + suffix.
+
+    Parameters
+    ----------
+    directory: str
+        Path of the directory.
+    prefix: str
+        Start of the file names. E.g. "forecast.".
+    suffix: str
+        End of the file names.
+    date_format: str
+        Format of the date following the prefix. Any characters between the date and the suffix are ignored.
+    Returns
+    -------
+    DatedFileIndex
+        The index of the files. Files with a name that does not contain a valid date are not included.
+        Raises an exception if the directory does not exist.
+    """
+
+    mtime_ns = os.stat(directory).st_mtime_ns
+    key = (directory, prefix, suffix, date_format)
+    with _lock:
+        entry = _indexes.get(key, None)
+    if entry is not None and entry[0] == mtime_ns:
+        return entry[1]
+
+    scan_time = time.time()
+    index = DatedFileIndex(_scan_directory(directory, prefix, suffix, date_format))
+    if scan_time - mtime_ns / 1e9 < _RACY_SECONDS:
+        # Do not trust the modification time of a directory modified while it was scanned
+        mtime_ns = None
+    with _lock:
+        _indexes[key] = (mtime_ns, index)
+    return index
+
+
+def clear_dated_file_indexes():
+    """Remove all the cached directory indexes."""
+
+    with _lock:
+        _indexes.clear()
+
+
+def _scan_directory(directory: str, prefix: str, suffix: str, date_format: str) -> List[DatedFile]:
+    """Parse the dates of the names of the matching files of the directory."""
+
+    date_length = len(datetime.date(2000, 12, 31).strftime(date_format))
+    result = []
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(suffix):
+            date_part = name[len(prefix) : len(prefix) + date_length]
+            try:
+                date = datetime.datetime.strptime(date_part, date_format).date()
+            except ValueError:
+                continue
+            result.append(DatedFile(date, name, f"{directory}/{name}"))
+    return result
@@ -0,0 +1,128 @@
+"""
+    ensemble_reduction.py
+
+    Vectorized reductions of forecast ensembles used by the forecast widgets.
+
+    The values of all the members of an ensemble are reduced together in one pass over the
+    member dimension instead of one expression per member, so the widgets work for any
+    number of members. Ensembles larger than memory are reduced chunk by chunk from dask arrays
+    with summarize_chunked_ensemble. The spatial means are computed over the active cells of the
+    domain (see active_cells.py) and the values may be compressed to the active cells before they
+    are reduced.
+"""
+from typing import NamedTuple
+import numpy as np
+import dask
+from hydrogen_widgets.utilities.active_cells import ActiveCells
+
+
+class EnsembleSummary(NamedTuple):
+    """Reductions of ensemble values with dimensions (member, time, y, x)."""
+
+    # Values of the first member at the first time with dimensions (y, x). Inactive cells are NaN.
+    start: np.ndarray
+    # Values at the first time minus the values at the last time of each member with
+    # dimensions (member, y, x). Missing values are 0 and inactive cells are NaN.
+    deltas: np.ndarray
+    # Mean of the values of each member and time over the active cells with dimensions
+    # (member, time). The mean of a time with a missing value is 0. None if not computed.
+    means: np.ndarray
+
+    @property
+    def members(self) -> int:
+        """Number of members of the ensemble."""
+
+        return self.deltas.shape[0]
+
+    def mean_changes(self) -> np.ndarray:
+        """Get the means of each member minus the mean at the first time of the member (member, time)."""
+
+        return self.means - self.means[:, :1]
+
+
+def top_layer_soil_moisture(saturation: np.ndarray, porosity: np.ndarray) -> np.ndarray:
+    """
+    Compute the soil moisture (saturation * porosity) of the top layer of all the members.
+
+    Parameters
+    ----------
+    saturation: np.ndarray
+        Saturation with dimensions (member, time, z, y, x), or (member, time, z, cells) if compressed
+        to the active cells. The top layer is the last z.
+    porosity: np.ndarray
+        Porosity with dimensions (z, y, x), or (z, cells) if compressed to the active cells.
+    Returns
+    -------
+    np.ndarray
+        The soil moisture with dimensions (member, time, y, x) or (member, time, cells). Missing values are 0.
+    """
+
+    soil_moisture = np.nan_to_num(saturation[:, :, -1])
+    soil_moisture *= np.nan_to_num(porosity[-1])
+    return soil_moisture
+
+
+def summarize_ensemble(values: np.ndarray, means: bool = True, active_cells: ActiveCells = None) -> EnsembleSummary:
+    """
+    Compute the start values, the start to end deltas and the spatial means of all the members.
+
+    Parameters
+    ----------
+    values: np.ndarray
+        Ensemble values with dimensions (member, time, y, x), or (member, time, cells) if compressed
+        to the active_cells.
+    means: bool
+        False to skip the spatial means, e.g. when the values contain only the first and last times.
+    active_cells: ActiveCells
+        The active cells the values are compressed to. None if the values are (y, x) grids where all the cells are active.
+    Returns
+    -------
+    EnsembleSummary
+        The reductions of the values.
+    """
+
+    if active_cells is None:
+        active_cells = ActiveCells(np.ones(values.shape[-2:], dtype=bool))
+        values = active_cells.compress(values)
+    start = active_cells.scatter(np.array(values[0, 0]))
+    deltas = np.subtract(values[:, 0], values[:, -1])
+    np.nan_to_num(deltas, copy=False)
+    deltas = active_cells.scatter(deltas)
+    if not means:
+        return EnsembleSummary(start, deltas, None)
+    spatial_means = values.sum(axis=-1)
+    spatial_means /= max(active_cells.count, 1)
+    np.nan_to_num(spatial_means, copy=False)
+    return EnsembleSummary(start, deltas, spatial_means)
+
+
+def summarize_chunked_ensemble(values, scheduler="synchronous", active_cells: ActiveCells = None) -> EnsembleSummary:
+    """
+    Compute the start values, the start to end deltas and the spatial means of all the members
+    of a chunked (dask) ensemble without loading the whole ensemble.
+
+    Parameters
+    ----------
+    values: dask.array.Array
+        Ensemble values with dimensions (member, time, y, x), or (member, time, cells) if compressed
+        to the active_cells, chunked by member and time. Only the chunks processed by the scheduler
+        at the same time are held in memory.
+    scheduler:
+        The dask scheduler computing the chunks, e.g. "synchronous" (one chunk at a time),
+        "threads" or a dask.distributed Client.
+    active_cells: ActiveCells
+        The active cells the values are compressed to. None if the values are (y, x) grids where all the cells are active.
+    Returns
+    -------
+    EnsembleSummary
+        The reductions of the values. The same as summarize_ensemble except for the rounding of the means.
+    """
+
+    if active_cells is None:
+        active_cells = ActiveCells(np.ones(values.shape[-2:], dtype=bool))
+        values = active_cells.compress(values)
+    start = values[0, 0]
+    deltas = np.nan_to_num(values[:, 0] - values[:, -1])
+    means = np.nan_to_num(values.sum(axis=-1) / max(active_cells.count, 1))
+    (start, deltas, means) = dask.compute(start, deltas, means, scheduler=scheduler)
+    return EnsembleSummary(active_cells.scatter(start), active_cells.scatter(deltas), means)
@@ -0,0 +1,185 @@
+"""
+    forecast_summary.py
+
+    Summary files of forecasts written to the widget cache directory of the domain.
+
+    The forecast widgets only use small products of the forecast ensemble: the times, the start
+    grids, the start to end delta grids and the spatial mean time series of each member. These
+    are written to forecast.MMDDYYYY.summary.npz next to forecast.MMDDYYYY.nc as the widgets
+    compute them and read by the widgets instead of the forecast file. The summary file of
+    forecast/<scenario>/forecast.MMDDYYYY.nc is forecast/<scenario>/forecast.MMDDYYYY.summary.npz in
+    the widget cache directory of the domain (widget_cache_path.py), not in the forecast directory, so
+    writing it does not change the forecast directory. A summary file may only
+    include some of the summaries, or the summaries without the means, until a widget that needs
+    the rest computed them. A summary file stores the format version and
+    the fingerprint (name, size, modification time) of the files it was computed from and is
+    ignored when either changed. Summary files are not used if the environment variable
+    HYDROGEN_WIDGET_FORECAST_SUMMARY_FILES is 0, HYDROGEN_WIDGET_CACHE_PATH is not set or the
+    widget cache directory is not writable.
+"""
+import os
+import tempfile
+from typing import List, NamedTuple
+import numpy as np
+from hydrogen_widgets.utilities.ensemble_reduction import EnsembleSummary
+from hydrogen_widgets.utilities.widget_cache_path import get_domain_cache_directory
+
+# Increment when the contents of the summary files change so existing files are rebuilt
+FORECAST_SUMMARY_VERSION = 2
+
+_config = {"enabled": os.environ.get("HYDROGEN_WIDGET_FORECAST_SUMMARY_FILES", "1") != "0"}
+
+
+class ForecastSummary(NamedTuple):
+    """Summaries of the variables of a forecast used by the forecast widgets. Parts not computed yet are None."""
+
+    times: np.ndarray
+    soil_moisture: EnsembleSummary
+    water_table_depth: EnsembleSummary
+
+
+def configure_forecast_summary_files(enabled: bool):
+    """Enable or disable reading and writing forecast summary files."""
+
+    _config["enabled"] = enabled
+
+
+def is_forecast_summary_files_enabled() -> bool:
+    """Return True if the forecast widgets use forecast summary files."""
+
+    return _config["enabled"]
+
+
+def get_forecast_summary_path(domain_path: str, forecast_nc_path: str) -> str:
+    """Get the path of the summary file of a forecast file of a domain or None if summary files are not written."""
+
+    cache_directory = get_domain_cache_directory(domain_path)
+    if cache_directory is None:
+        return None
+    (root, _) = os.path.splitext(os.path.relpath(os.path.abspath(forecast_nc_path), os.path.abspath(domain_path)))
+    return os.path.join(cache_directory, f"{root}.summary.npz")
+
+
+def read_forecast_summary(domain_path: str, forecast_files: List[str], fingerprint: str) -> ForecastSummary:
+    """
+    Read the summary file of a forecast.
+
+    Parameters
+    ----------
+    domain_path: str
+        Path to the domain directory of the forecast.
+    forecast_files: List[str]
+        Paths of the forecast file followed by the other files used to compute the summary.
+    fingerprint: str
+        The current fingerprint of the files returned by get_forecast_fingerprint.
+    Returns
+    -------
+    ForecastSummary
+        The summary or None if the summary file does not exist, can not be read or was
+        computed from a different version of the files.
+    """
+
+    path = get_forecast_summary_path(domain_path, forecast_files[0])
+    if path is None:
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            if int(npz["version"]) != FORECAST_SUMMARY_VERSION:
+                return None
+            if str(npz["fingerprint"]) != fingerprint:
+                return None
+            return ForecastSummary(
+                npz["times"] if "times" in npz else None,
+                _read_ensemble_summary(npz, "soil_moisture"),
+                _read_ensemble_summary(npz, "water_table_depth"),
+            )
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _read_ensemble_summary(npz, name: str) -> EnsembleSummary:
+    """Read the summary of a variable from a summary file or None if the file does not include it."""
+
+    if f"{name}_start" not in npz:
+        return None
+    means = npz[f"{name}_means"] if f"{name}_means" in npz else None
+    return EnsembleSummary(npz[f"{name}_start"], npz[f"{name}_deltas"], means)
+
+
+def write_forecast_summary(
+    domain_path: str, forecast_files: List[str], fingerprint: str, summary: ForecastSummary
+) -> bool:
+    """
+    Write the summary file of a forecast.
+
+    Parameters
+    ----------
+    domain_path: str
+        Path to the domain directory of the forecast.
+    forecast_files: List[str]
+        Paths of the forecast file followed by the other files used to compute the summary.
+    fingerprint: str
+        The fingerprint of the files returned by get_forecast_fingerprint before the summary was computed.
+    summary: ForecastSummary
+        The summary computed from the files. Parts that are None, and summaries without the means,
+        are replaced by the parts of the existing summary file computed from the same files.
+    Returns
+    -------
+    bool
+        True if the file was written or False if HYDROGEN_WIDGET_CACHE_PATH is not set or the
+        widget cache directory is not writable.
+    """
+
+    path = get_forecast_summary_path(domain_path, forecast_files[0])
+    if path is None:
+        return False
+    existing = read_forecast_summary(domain_path, forecast_files, fingerprint)
+    if existing is not None:
+        summary = ForecastSummary(
+            existing.times if summary.times is None else summary.times,
+            _merge_ensemble_summary(existing.soil_moisture, summary.soil_moisture),
+            _merge_ensemble_summary(existing.water_table_depth, summary.water_table_depth),
+        )
+    arrays = {"version": np.array(FORECAST_SUMMARY_VERSION), "fingerprint": np.array(fingerprint)}
+    if summary.times is not None:
+        arrays["times"] = summary.times
+    for name in ["soil_moisture", "water_table_depth"]:
+        ensemble_summary = getattr(summary, name)
+        if ensemble_summary is not None:
+            arrays[f"{name}_start"] = ensemble_summary.start
+            arrays[f"{name}_deltas"] = ensemble_summary.deltas
+            if ensemble_summary.means is not None:
+                arrays[f"{name}_means"] = ensemble_summary.means
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, "wb") as stream:
+            np.savez(stream, **arrays)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return True
+
+
+def _merge_ensemble_summary(existing: EnsembleSummary, summary: EnsembleSummary) -> EnsembleSummary:
+    """Keep the existing summary of a variable unless the new summary adds the means."""
+
+    if summary is None or (existing is not None and existing.means is not None and summary.means is None):
+        return existing
+    return summary
+
+
+def get_forecast_fingerprint(paths: List[str]) -> str:
+    """Get the (name, size, modification time) of the files used to compute a summary as a string."""
+
+    fingerprint = []
+    for path in paths:
+        stat = os.stat(path)
+        fingerprint.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+    return repr(tuple(fingerprint))
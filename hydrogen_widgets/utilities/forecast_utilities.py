@@ -2,27 +2,90 @@
     forecast_utilities.py
 
     Methods to support forecast visualzations.
+
+    Forecast variables larger than a memory limit are reduced chunk by chunk (streaming mode)
+    instead of being loaded into memory. The mode defaults to the environment variables:
+        HYDROGEN_WIDGET_FORECAST_STREAMING  "1" always stream, "0" never stream (default stream
+                                            only variables larger than the memory limit).
+        HYDROGEN_WIDGET_FORECAST_MEMORY     Memory limit in bytes of a forecast reduction (default 1 GB).
+        HYDROGEN_WIDGET_DASK_SCHEDULER      Dask scheduler of the streaming reductions (default "synchronous").
 """
 import os
-from datetime import datetime
+import functools
+from typing import List
+import numpy as np
+import xarray as xr
+from hydrogen_widgets.utilities.render_context import RenderContext
+from hydrogen_widgets.utilities.active_cells import ActiveCells, get_active_cells
+from hydrogen_widgets.utilities.dated_file_index import get_dated_file_index
+from hydrogen_widgets.utilities.ensemble_reduction import (
+    EnsembleSummary,
+    summarize_chunked_ensemble,
+    summarize_ensemble,
+    top_layer_soil_moisture,
+)
+from hydrogen_widgets.utilities.forecast_summary import (
+    ForecastSummary,
+    get_forecast_fingerprint,
+    is_forecast_summary_files_enabled,
+    read_forecast_summary,
+    write_forecast_summary,
+)
+from hydrogen_widgets.utilities.render_timing import timed_stage
+
+_streaming_config = {
+    "streaming": {"1": True, "0": False}.get(os.environ.get("HYDROGEN_WIDGET_FORECAST_STREAMING", ""), None),
+    "memory_limit": int(os.environ.get("HYDROGEN_WIDGET_FORECAST_MEMORY", str(1024 * 1024 * 1024))),
+    "scheduler": os.environ.get("HYDROGEN_WIDGET_DASK_SCHEDULER", "synchronous"),
+}
+
+# Number of chunk sized arrays held by one dask worker while reducing a chunk: the chunk read
+# from the file, its nan_to_num copy, the soil moisture product and the first and last times of the deltas.
+_ARRAYS_PER_CHUNK = 4
+
+
+def configure_forecast_streaming(streaming:bool=None, memory_limit:int=None, scheduler=None):
+    """
+    Change when and how forecast variables are reduced chunk by chunk.
+
+    Parameters
+    ----------
+    streaming: bool
+        True to always stream, False to never stream or None to stream the variables larger than memory_limit.
+    memory_limit: int
+        Memory limit in bytes of a forecast reduction. The chunks are sized so the chunks reduced at the same time by all
+        the dask workers fit in the limit.
+    scheduler:
+        Dask scheduler of the streaming reductions, e.g. "synchronous", "threads" or a dask.distributed Client.
+    """
+
+    _streaming_config["streaming"] = streaming
+    if memory_limit is not None:
+        _streaming_config["memory_limit"] = memory_limit
+    if scheduler is not None:
+        _streaming_config["scheduler"] = scheduler
+
+
+def get_forecast_streaming_config()->dict:
+    """Get a copy of the forecast streaming configuration."""
+
+    return dict(_streaming_config)
+
+
+def is_streamed(nbytes:int)->bool:
+    """Return True if forecast values of nbytes bytes are reduced chunk by chunk instead of loaded into memory."""
+
+    streaming = _streaming_config["streaming"]
+    if streaming is None:
+        return nbytes > _streaming_config["memory_limit"]
+    return streaming
 
 
 def get_latest_forecast_file(forecast_nc_path:str)->str:
     """Find the most recent forcast file using the date in the file."""
 
-    found_date = None
-    result = None
-    for f in os.listdir(forecast_nc_path):
-        if f.startswith("forecast.") and f.endswith(".nc"):
-            start_pos = len("forecast.")
-            end_pos = start_pos + len("MMDDYYYY")
-            date_part = f[start_pos:end_pos]
-            if found_date is None or datetime.strptime(
-                date_part, "%m%d%Y"
-            ) > datetime.strptime(found_date, "%m%d%Y"):
-                found_date = date_part
-                result = f
-    return result
+    latest = get_dated_file_index(forecast_nc_path, "forecast.").latest()
+    return latest.name if latest is not None else None
 
 
 def get_forecast_nc_file(domain_path:str, scenario_id:str)->str:
@@ -34,7 +97,293 @@ def get_forecast_nc_file(domain_path:str, scenario_id:str)->str:
             f"Forecase result directory '{forecast_scenario_path}' does not exist."
         )
     forecast_nc_name = get_latest_forecast_file(forecast_scenario_path)
-    forecast_nc_path = f"{forecast_scenario_path}/{forecast_nc_name}"
-    if not forecast_nc_path:
+    if not forecast_nc_name:
         raise Exception("No forecast result file found")
-    return forecast_nc_path
+    return f"{forecast_scenario_path}/{forecast_nc_name}"
+
+
+def get_forecast_files(context:RenderContext, scenario_id:str)->list:
+    """Get the paths of the latest forecast file of the scenario and of the static domain variables file."""
+
+    forecast_nc_path = get_forecast_nc_file(context.domain_path, scenario_id)
+    static_domain_variables = (
+        f"{context.domain_path}/domain_files/static_domain_variables.nc"
+    )
+    return [forecast_nc_path, static_domain_variables]
+
+
+def get_forecast_dataset(context:RenderContext, scenario_id:str)->xr.Dataset:
+    """
+    Open the latest forecast file of the scenario together with the static domain variables.
+    The values of a variable are read from the files when the variable is loaded, so only the
+    layers and times selected (isel) before loading are read.
+    """
+
+    def open_forecast_dataset():
+        forecast_files = get_forecast_files(context, scenario_id)
+        with timed_stage("open"):
+            datasets = [xr.open_dataset(path) for path in forecast_files]
+            ds = xr.merge(datasets)
+
+        def close_datasets():
+            for dataset in datasets:
+                dataset.close()
+
+        ds.set_close(close_datasets)
+        return ds
+
+    return context.get(("forecast_dataset", scenario_id), open_forecast_dataset)
+
+
+def get_chunked_forecast_dataset(context:RenderContext, scenario_id:str)->xr.Dataset:
+    """Open the forecast dataset with dask chunks of one member, one layer and the times fitting in the memory limit."""
+
+    def open_chunked_forecast_dataset():
+        ds = get_forecast_dataset(context, scenario_id)
+        scheduler = _streaming_config["scheduler"]
+        workers = 1 if scheduler in ("synchronous", "sync", "single-threaded") else os.cpu_count()
+        chunk_bytes = _streaming_config["memory_limit"] // (workers * _ARRAYS_PER_CHUNK)
+        time_step_bytes = ds.sizes["y"] * ds.sizes["x"] * ds["saturation"].dtype.itemsize
+        times = max(1, min(ds.sizes["time"], chunk_bytes // time_step_bytes))
+        forecast_files = get_forecast_files(context, scenario_id)
+        with timed_stage("open"):
+            return xr.open_mfdataset(forecast_files, chunks={"member": 1, "time": times, "z": 1})
+
+    return context.get(("chunked_forecast_dataset", scenario_id), open_chunked_forecast_dataset)
+
+
+def get_forecast_summary(context:RenderContext, scenario_id:str)->ForecastSummary:
+    """
+    Get the times and the summaries with the means of the variables of the latest forecast of the scenario.
+    The parts found in the summary file of the forecast are read from it. The other parts are computed from
+    the forecast file and added to the summary file.
+    """
+
+    return ForecastSummary(
+        get_forecast_times(context, scenario_id),
+        get_forecast_soil_moisture_summary(context, scenario_id),
+        get_forecast_water_table_depth_summary(context, scenario_id),
+    )
+
+
+def get_forecast_key(context:RenderContext, scenario_id:str)->tuple:
+    """Get the path and fingerprint of the latest forecast of the scenario that change when the forecast changes."""
+
+    def load_forecast_key():
+        forecast_files = get_forecast_files(context, scenario_id)
+        return (forecast_files[0], get_forecast_fingerprint(forecast_files))
+
+    return context.get(("forecast_key", scenario_id), load_forecast_key)
+
+
+def get_forecast_times(context:RenderContext, scenario_id:str)->np.ndarray:
+    """Get the times of the latest forecast of the scenario."""
+
+    stored_summary = _read_stored_summary(context, scenario_id)
+    if stored_summary is not None and stored_summary.times is not None:
+        return stored_summary.times
+    return np.array(get_forecast_dataset(context, scenario_id)["time"])
+
+
+def get_forecast_soil_moisture_summary(context:RenderContext, scenario_id:str, means:bool=True)->EnsembleSummary:
+    """
+    Get the start values, deltas and spatial means of the top layer soil moisture of all the forecast members.
+    The summary is read from the summary file of the forecast if the file includes it. Otherwise only the top
+    layer is read and, with means=False, only the first and last times are read and the means of the summary
+    are None, unless the summary with the means was already computed in the context.
+    """
+
+    return _get_summary(context, "soil_moisture", scenario_id, means, _compute_soil_moisture_summary)
+
+
+def get_forecast_water_table_depth_summary(context:RenderContext, scenario_id:str, means:bool=True)->EnsembleSummary:
+    """
+    Get the start values, deltas and spatial means of the water table depth of all the forecast members.
+    The summary is read from the summary file of the forecast if the file includes it. Otherwise with
+    means=False only the first and last times are read and the means of the summary are None,
+    unless the summary with the means was already computed in the context.
+    """
+
+    return _get_summary(context, "water_table_depth", scenario_id, means, _compute_water_table_depth_summary)
+
+
+def get_forecast_members(context:RenderContext, scenario_id:str)->int:
+    """Get the number of members of the latest forecast of the scenario."""
+
+    stored_summary = _read_stored_summary(context, scenario_id)
+    for summary in [] if stored_summary is None else [stored_summary.soil_moisture, stored_summary.water_table_depth]:
+        if summary is not None:
+            return summary.members
+    return get_forecast_dataset(context, scenario_id).sizes["member"]
+
+
+def get_forecast_heatmap_grids(context:RenderContext, scenario_id:str, name:str, lazy:bool=False)->List:
+    """
+    Get the start grid followed by the start to end delta grid of each member of a variable of the latest forecast
+    of the scenario shown by the forecast heatmaps. name is "soil_moisture" or "water_table_depth". With lazy=True the
+    grids are functions returning the grid (see heatmap_traces.py): the grids are taken from the summary of all the
+    members if it is in the summary file or already computed in the context, otherwise only their member is read
+    from the forecast file.
+    """
+
+    if not lazy:
+        summary = _get_summary(context, name, scenario_id, False, _COMPUTE_SUMMARY[name])
+        return [summary.start] + list(summary.deltas)
+    grids = [functools.partial(_get_member_grid, context, name, scenario_id, 0, "start")]
+    for member in range(get_forecast_members(context, scenario_id)):
+        grids.append(functools.partial(_get_member_grid, context, name, scenario_id, member, "delta"))
+    return grids
+
+
+def _get_member_grid(context:RenderContext, name:str, scenario_id:str, member:int, grid:str)->np.ndarray:
+    """Get the "start" or "delta" grid of a forecast member."""
+
+    summary = _get_member_summary(context, name, scenario_id, member)
+    return summary.start if grid == "start" else summary.deltas[0]
+
+
+def _get_member_summary(context:RenderContext, name:str, scenario_id:str, member:int)->EnsembleSummary:
+    """
+    Get the summary without the means of one member from the summary of all the members if it is available, where
+    the start values of members other than the first are None, or compute it from the member.
+    """
+
+    summary = None
+    for key in [f"forecast_{name}_summary", f"forecast_{name}_summary_without_means"]:
+        if (key, scenario_id) in context:
+            summary = context.get((key, scenario_id), None)
+            break
+    if summary is None:
+        stored_summary = _read_stored_summary(context, scenario_id)
+        summary = None if stored_summary is None else getattr(stored_summary, name)
+    if summary is None:
+        return context.get(
+            (f"forecast_{name}_member_summary", scenario_id, member),
+            lambda: _COMPUTE_SUMMARY[name](context, scenario_id, False, [member]),
+        )
+    if not 0 <= member < summary.members:
+        raise Exception(f"The forecast member {member} does not exist.")
+    # The start values of the summary of all the members are the start values of the first member
+    start = summary.start if member == 0 else None
+    return EnsembleSummary(start, summary.deltas[member : member + 1], None)
+
+
+def _get_summary(context:RenderContext, name:str, scenario_id:str, means:bool, compute_summary)->EnsembleSummary:
+    """Get the summary with the means, or without the means if they are not needed and not already computed."""
+
+    key = f"forecast_{name}_summary"
+    if means or (key, scenario_id) in context:
+        return context.get(
+            (key, scenario_id), lambda: _load_summary(context, name, scenario_id, True, compute_summary)
+        )
+    return context.get(
+        (f"{key}_without_means", scenario_id), lambda: _load_summary(context, name, scenario_id, False, compute_summary)
+    )
+
+
+def _load_summary(context:RenderContext, name:str, scenario_id:str, means:bool, compute_summary)->EnsembleSummary:
+    """Read the summary from the summary file of the forecast or compute it and add it to the summary file."""
+
+    stored_summary = _read_stored_summary(context, scenario_id)
+    summary = None if stored_summary is None else getattr(stored_summary, name)
+    if summary is not None and (summary.means is not None or not means):
+        return summary
+    summary = compute_summary(context, scenario_id, means)
+    if is_forecast_summary_files_enabled():
+        times = np.array(get_forecast_dataset(context, scenario_id)["time"])
+        summaries = {"soil_moisture": None, "water_table_depth": None, name: summary}
+        forecast_files = get_forecast_files(context, scenario_id)
+        fingerprint = get_forecast_key(context, scenario_id)[1]
+        write_forecast_summary(context.domain_path, forecast_files, fingerprint, ForecastSummary(times, **summaries))
+    return summary
+
+
+def _read_stored_summary(context:RenderContext, scenario_id:str)->ForecastSummary:
+    """Read the summary file of the latest forecast of the scenario or None if it is disabled or out of date."""
+
+    def load_stored_summary():
+        if not is_forecast_summary_files_enabled():
+            return None
+        forecast_files = get_forecast_files(context, scenario_id)
+        with timed_stage("read"):
+            return read_forecast_summary(context.domain_path, forecast_files, get_forecast_key(context, scenario_id)[1])
+
+    return context.get(("stored_forecast_summary", scenario_id), load_stored_summary)
+
+
+def _compute_soil_moisture_summary(
+    context:RenderContext, scenario_id:str, means:bool, members:List[int]=None
+)->EnsembleSummary:
+    """Compute the top layer soil moisture summary of the active cells of members (default all) from the forecast."""
+
+    ds = get_forecast_dataset(context, scenario_id)
+    active_cells = get_active_cells(context.domain_path)
+    compress = _get_compress(active_cells)
+    saturation = ds["saturation"].isel(z=[-1]) if means else ds["saturation"].isel(z=[-1], time=[0, -1])
+    if means and is_streamed(saturation.nbytes):
+        ds = get_chunked_forecast_dataset(context, scenario_id)
+        with timed_stage("compute"):
+            saturation = compress(ds["saturation"].data)
+            porosity = compress(ds["porosity"].data)
+            soil_moisture = top_layer_soil_moisture(saturation, porosity)
+            return summarize_chunked_ensemble(soil_moisture, _streaming_config["scheduler"], active_cells)
+    with timed_stage("read"):
+        porosity = compress(np.array(ds["porosity"].isel(z=[-1])))
+    return _summarize_by_member(
+        saturation, means, active_cells, lambda saturation: top_layer_soil_moisture(saturation, porosity), members
+    )
+
+
+def _compute_water_table_depth_summary(
+    context:RenderContext, scenario_id:str, means:bool, members:List[int]=None
+)->EnsembleSummary:
+    """Compute the summary of the water table depth of the active cells of members (default all) from the forecast."""
+
+    ds = get_forecast_dataset(context, scenario_id)
+    active_cells = get_active_cells(context.domain_path)
+    compress = _get_compress(active_cells)
+    water_table_depth = ds["water_table_depth"] if means else ds["water_table_depth"].isel(time=[0, -1])
+    if means and is_streamed(water_table_depth.nbytes):
+        ds = get_chunked_forecast_dataset(context, scenario_id)
+        with timed_stage("compute"):
+            water_table_depth = compress(ds["water_table_depth"].data)
+            return summarize_chunked_ensemble(water_table_depth, _streaming_config["scheduler"], active_cells)
+    return _summarize_by_member(
+        water_table_depth, means, active_cells, lambda water_table_depth: water_table_depth, members
+    )
+
+
+def _summarize_by_member(
+    values:xr.DataArray, means:bool, active_cells:ActiveCells, prepare, members:List[int]=None
+)->EnsembleSummary:
+    """
+    Summarize the values of the members (default all) of a forecast variable reading one member at a time, so only the
+    values of one member are in memory. prepare computes the values to summarize from the values of a member compressed
+    to the active cells. The start values are the start values of the first summarized member.
+    """
+
+    compress = _get_compress(active_cells)
+    summaries = []
+    for member in range(values.sizes["member"]) if members is None else members:
+        with timed_stage("read"):
+            member_values = compress(np.array(values.isel(member=[member])))
+        with timed_stage("compute"):
+            summaries.append(summarize_ensemble(prepare(member_values), means, active_cells))
+    return EnsembleSummary(
+        summaries[0].start,
+        np.concatenate([summary.deltas for summary in summaries]),
+        np.concatenate([summary.means for summary in summaries]) if means else None,
+    )
+
+
+# Function computing the summary of each variable from the forecast file
+_COMPUTE_SUMMARY = {
+    "soil_moisture": _compute_soil_moisture_summary,
+    "water_table_depth": _compute_water_table_depth_summary,
+}
+
+
+def _get_compress(active_cells:ActiveCells):
+    """Get the function compressing values to the active cells or keeping the grids if active_cells is None."""
+
+    return active_cells.compress if active_cells is not None else lambda values: values
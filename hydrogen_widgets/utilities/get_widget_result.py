@@ -2,20 +2,36 @@
     Get the api_results for a visualization widget.
     This is called by the hydrogen API when a widget is requested.
 """
-from hydrogen_widgets.current_conditions_heatmap import render_current_conditions_heatmap
-from hydrogen_widgets.location_map import render_location_map
-from hydrogen_widgets.terrain_map import render_terrain_map
-from hydrogen_widgets.terrain_obs_points import render_terrain_obs_points
-from hydrogen_widgets.forecast_soilmoisture_heatmap import render_forecast_soilmoisture_heatmap
-from hydrogen_widgets.forecast_waterdepth_heatmap import render_forecast_waterdepth_heatmap
-from hydrogen_widgets.forecast_timeseries import render_forecast_timeseries
-from hydrogen_widgets.streamflow_points import render_streamflow_points
-from hydrogen_widgets.scenarios_timeseries import render_scenario_timeseries
-
-def get_widget_result(datasource:str, user_id:str, domain_id:str, query_parameters:dict=None)->dict:
+from hydrogen_widgets.utilities.widget_registry import get_widget_spec, render_widget
+from hydrogen_widgets.utilities.widget_cache import (
+    get_json_compatible_cache,
+    get_widget_cache,
+    get_widget_cache_key,
+    get_widget_etag,
+)
+from hydrogen_widgets.utilities.widget_disk_cache import read_disk_cache, write_disk_cache, get_disk_cache_dir
+from hydrogen_widgets.utilities.render_context import RenderContext
+from hydrogen_widgets.utilities.widget_json import dumps_widget_response, to_json_compatible
+from hydrogen_widgets.utilities.widget_delta import get_widget_delta, remember_delta_base
+from hydrogen_common import get_domain_path
+
+class NotModified:
+    """Marker returned instead of a response when the response has the ETag given by if_none_match."""
+
+    def __repr__(self):
+        return "NOT_MODIFIED"
+
+
+NOT_MODIFIED = NotModified()
+
+
+def get_widget_result(datasource:str, user_id:str, domain_id:str, query_parameters:dict=None, use_cache:bool=True, context:RenderContext=None, use_processes:bool=False, if_none_match:str=None, return_etag:bool=False, accept_delta:bool=False):
     """
     Execute the code to get the requested visualization result for a datasource.
 
+    The widget of the datasource is found in the widget registry (widget_registry.py) and
+    the module of the widget is imported the first time the widget is rendered.
+
     Parameters
     ----------
     datasource : str
@@ -27,6 +43,25 @@ def get_widget_result(datasource:str, user_id:str, domain_id:str, query_paramete
     query_parameters: dict
         A dictionary of optional options passed to the widget using the query parameters
         from the API request. This may be None of there are no options.
+    use_cache: bool
+        If True, return the response from the process level widget cache or the on-disk widget
+        cache when the input files of the widget have not changed since the response was cached.
+    context: RenderContext
+        Optional opened inputs and computed values shared with other widgets of the same domain.
+    use_processes: bool
+        If True, render the widget in the widget process pool (widget_process_pool.py) instead
+        of the calling thread. The context is not used by the worker process.
+    if_none_match: str
+        Optional ETag (or comma separated ETags) of a response the caller already has, for example
+        the If-None-Match header of the API request. If the ETag of the response is the same, the
+        widget is not rendered and NOT_MODIFIED is returned instead of the response.
+    return_etag: bool
+        If True, return a tuple (response, etag). The etag is computed from the input files of the
+        widget and the version of the widget in the registry. It is None if the widget has no input files.
+    accept_delta: bool
+        If True and the response of an ETag of if_none_match is cached as a delta base, return the
+        delta {"delta_from": etag, "operations": [...]} from that response to the new response when
+        the delta is smaller than the response (see widget_delta.py).
     Returns
     -------
     response: dict
@@ -34,24 +69,165 @@ def get_widget_result(datasource:str, user_id:str, domain_id:str, query_paramete
         to render the widget in the UI. Returns None if the datasoruce is not supported.
     """    
 
-    result = None
-    if datasource:
-        if datasource == "current_conditions_heatmap":
-            result = render_current_conditions_heatmap(user_id, domain_id)
-        elif datasource == "location_map":
-            result = render_location_map(user_id, domain_id)
-        elif datasource == "terrain_map":
-            result = render_terrain_map(user_id, domain_id)
-        elif datasource == "terrain_obs_points":
-            result = render_terrain_obs_points(user_id, domain_id, query_parameters)
-        elif datasource == "forecast_soilmoisture_heatmap":
-            result = render_forecast_soilmoisture_heatmap(user_id, domain_id, query_parameters)
-        elif datasource == "forecast_watertable_heatmap":
-            result = render_forecast_waterdepth_heatmap(user_id, domain_id, query_parameters)
-        elif datasource == "forecast_time_series":
-            result = render_forecast_timeseries(user_id, domain_id, query_parameters)
-        elif datasource == "observation_points":
-            result = render_streamflow_points(user_id, domain_id)
-        elif datasource == "scenario_timeseries":
-            result = render_scenario_timeseries(user_id, domain_id, query_parameters)
+    result, etag, cache_key = _get_widget_response(
+        datasource, user_id, domain_id, query_parameters, use_cache, context, use_processes, if_none_match, return_etag, accept_delta
+    )
+    if result is not None and result is not NOT_MODIFIED:
+        result = get_json_compatible_result(cache_key, result)
+    return (result, etag) if return_etag else result
+
+
+def get_widget_result_json(datasource:str, user_id:str, domain_id:str, query_parameters:dict=None, use_cache:bool=True, context:RenderContext=None, use_processes:bool=False, if_none_match:str=None, return_etag:bool=False, accept_delta:bool=False):
+    """
+    Get the json encoded response of a widget.
+
+    Same as get_widget_result, but the NumPy arrays of the response are written directly to
+    json (widget_json.py) without creating nested lists of Python floats. Missing values are
+    written as null. Use this when the response is sent to the UI as is.
+
+    Returns
+    -------
+    response: bytes
+        The utf-8 encoded json response, NOT_MODIFIED or None if the datasource is not supported.
+    """
+
+    result, etag, _ = _get_widget_response(
+        datasource, user_id, domain_id, query_parameters, use_cache, context, use_processes, if_none_match, return_etag, accept_delta
+    )
+    if result is not None and result is not NOT_MODIFIED:
+        result = dumps_widget_response(result)
+    return (result, etag) if return_etag else result
+
+
+def get_widget_response(datasource:str, user_id:str, domain_id:str, query_parameters:dict=None, use_cache:bool=True, context:RenderContext=None, use_processes:bool=False)->dict:
+    """
+    Get the response of a widget as returned by the widget, which may contain NumPy arrays.
+    A cached response is shared between callers and must not be modified.
+    """
+
+    result, _, _ = _get_widget_response(datasource, user_id, domain_id, query_parameters, use_cache, context, use_processes)
     return result
+
+
+def _get_widget_response(datasource:str, user_id:str, domain_id:str, query_parameters:dict, use_cache:bool, context:RenderContext, use_processes:bool, if_none_match:str=None, return_etag:bool=False, accept_delta:bool=False)->tuple:
+    """
+    Get the (response, etag, cache_key) of a widget. The etag is only computed if needed. The cache_key
+    is None if the response is not cached, for example when it is a delta.
+    """
+
+    result, etag, cache_key = _get_full_widget_response(
+        datasource, user_id, domain_id, query_parameters, use_cache, context, use_processes, if_none_match, return_etag
+    )
+    if result is None or result is NOT_MODIFIED or etag is None:
+        return result, etag, cache_key
+    if accept_delta or return_etag:
+        # Keep the responses of callers that use ETags as the bases of their next deltas
+        remember_delta_base(etag, result)
+    if accept_delta and if_none_match:
+        delta = get_widget_delta(parse_etags(if_none_match), result)
+        if delta is not None:
+            return delta, etag, None
+    return result, etag, cache_key
+
+
+def _get_full_widget_response(datasource:str, user_id:str, domain_id:str, query_parameters:dict, use_cache:bool, context:RenderContext, use_processes:bool, if_none_match:str, return_etag:bool)->tuple:
+    """Get the (response, etag, cache_key) of a widget from the widget caches or by rendering the widget."""
+
+    if not datasource or get_widget_spec(datasource) is None:
+        return None, None, None
+
+    cache_key = None
+    etag = None
+    use_cache = use_cache and is_widget_cache_enabled()
+    if use_cache or if_none_match or return_etag:
+        if context is not None:
+            domain_path = context.domain_path
+        else:
+            domain_path = get_domain_path(user_id=user_id, domain_directory=domain_id)
+        cache_key = get_widget_cache_key(datasource, domain_path, user_id, domain_id, query_parameters)
+        etag = get_widget_etag(cache_key)
+        if etag_matches(if_none_match, etag):
+            return NOT_MODIFIED, etag, None
+        if not use_cache:
+            cache_key = None
+        result = get_cached_widget_result(cache_key)
+        if result is not None:
+            return result, etag, cache_key
+
+    if use_processes:
+        # pylint: disable=C0415
+        from hydrogen_widgets.utilities.widget_process_pool import render_widget_in_process
+
+        result = render_widget_in_process(datasource, user_id, domain_id, query_parameters)
+    else:
+        result = render_widget(datasource, user_id, domain_id, query_parameters, context)
+    cache_widget_result(cache_key, result)
+    return result, etag, cache_key
+
+
+def get_json_compatible_result(cache_key:tuple, result:dict)->dict:
+    """
+    Convert the NumPy arrays of a response to lists (see to_json_compatible). The converted form of a
+    cached response is cached by its cache key so cache hits return it without converting again.
+    """
+
+    if cache_key is None:
+        return to_json_compatible(result)
+    cache = get_json_compatible_cache()
+    converted = cache.get(cache_key)
+    if converted is None:
+        converted = to_json_compatible(result)
+        cache.put(cache_key, converted)
+    return converted
+
+
+def etag_matches(if_none_match, etag:str)->bool:
+    """
+    Return True if the etag is one of the ETags of an If-None-Match value.
+    The value may be a string of comma separated, optionally quoted or weak (W/) ETags, "*" or a list of ETags.
+    """
+
+    if not if_none_match or etag is None:
+        return False
+    return any(value in ("*", etag) for value in parse_etags(if_none_match))
+
+
+def parse_etags(if_none_match)->list:
+    """Get the ETags of an If-None-Match value without the quotes and weak (W/) prefixes."""
+
+    values = if_none_match.split(",") if isinstance(if_none_match, str) else if_none_match
+    etags = []
+    for value in values:
+        value = value.strip()
+        if value.startswith("W/"):
+            value = value[2:]
+        etags.append(value if value == "*" else value.strip('"'))
+    return etags
+
+
+def is_widget_cache_enabled()->bool:
+    """Return True if either the in-memory or the on-disk widget cache is enabled."""
+
+    return get_widget_cache().max_bytes > 0 or get_disk_cache_dir() is not None
+
+
+def get_cached_widget_result(cache_key:tuple)->dict:
+    """Get a response from the in-memory widget cache or else the on-disk widget cache. Returns None if not cached."""
+
+    if cache_key is None:
+        return None
+    cache = get_widget_cache()
+    result = cache.get(cache_key)
+    if result is None:
+        result = read_disk_cache(cache_key)
+        if result is not None:
+            cache.put(cache_key, result)
+    return result
+
+
+def cache_widget_result(cache_key:tuple, result:dict):
+    """Add a rendered response to the in-memory and on-disk widget caches."""
+
+    if cache_key is not None and result is not None:
+        get_widget_cache().put(cache_key, result)
+        write_disk_cache(cache_key, result)
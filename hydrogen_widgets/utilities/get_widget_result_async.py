@@ -0,0 +1,209 @@
+"""
+    Get the api_results for a visualization widget from an asyncio event loop.
+
+    Widgets are rendered by get_widget_result on a managed thread pool so the event loop is
+    never blocked. The number of widgets rendered at the same time is limited globally and
+    for each domain so one slow domain can not use every thread or flood the machine with
+    parallel netCDF reads. Requests waiting for a free slot are counted as queued.
+
+    The limits default to the environment variables:
+        HYDROGEN_WIDGET_RENDER_THREADS      Number of render threads (default 4).
+        HYDROGEN_WIDGET_RENDER_PER_DOMAIN   Maximum renders of one domain at the same time (default 2).
+        HYDROGEN_WIDGET_RENDER_TIMEOUT      Default timeout of a request in seconds (default none).
+"""
+import os
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from hydrogen_widgets.utilities.get_widget_result import get_widget_result
+
+_config = {
+    "max_workers": int(os.environ.get("HYDROGEN_WIDGET_RENDER_THREADS", "4")),
+    "max_per_domain": int(os.environ.get("HYDROGEN_WIDGET_RENDER_PER_DOMAIN", "2")),
+    "timeout": float(os.environ["HYDROGEN_WIDGET_RENDER_TIMEOUT"])
+    if os.environ.get("HYDROGEN_WIDGET_RENDER_TIMEOUT", None)
+    else None,
+}
+_stats = {"queued": 0, "running": 0, "timeouts": 0}
+_executor = None
+_executor_lock = threading.Lock()
+_loop_limits = weakref.WeakKeyDictionary()
+
+
+class _RenderLimits:
+    """Semaphores limiting the renders started from one event loop."""
+
+    def __init__(self, max_concurrent: int, max_per_domain: int):
+        self.max_per_domain = max_per_domain
+        self.global_slots = asyncio.Semaphore(max_concurrent)
+        self.domain_slots = {}
+        self.domain_users = {}
+
+    def get_domain_slots(self, domain_key: tuple) -> asyncio.Semaphore:
+        """Get the semaphore of a domain, creating it for the first request of the domain."""
+
+        if domain_key not in self.domain_slots:
+            self.domain_slots[domain_key] = asyncio.Semaphore(self.max_per_domain)
+            self.domain_users[domain_key] = 0
+        self.domain_users[domain_key] = self.domain_users[domain_key] + 1
+        return self.domain_slots[domain_key]
+
+    def release_domain(self, domain_key: tuple):
+        """Remove the semaphore of a domain when it is no longer used by any request."""
+
+        self.domain_users[domain_key] = self.domain_users[domain_key] - 1
+        if self.domain_users[domain_key] == 0:
+            del self.domain_users[domain_key]
+            del self.domain_slots[domain_key]
+
+
+def configure_async_rendering(max_workers:int=None, max_per_domain:int=None, timeout:float=None):
+    """
+    Change the limits used by get_widget_result_async.
+
+    Parameters
+    ----------
+    max_workers: int
+        Number of threads rendering widgets. This is also the global limit of concurrent renders.
+    max_per_domain: int
+        Maximum number of widgets of the same domain rendered at the same time.
+    timeout: float
+        Default timeout in seconds of a request including the time waiting for a free slot.
+    """
+
+    global _executor  # pylint: disable=W0603
+
+    with _executor_lock:
+        if max_workers is not None and max_workers != _config["max_workers"]:
+            _config["max_workers"] = max_workers
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+                _executor = None
+        if max_per_domain is not None:
+            _config["max_per_domain"] = max_per_domain
+        if timeout is not None:
+            _config["timeout"] = timeout
+        _loop_limits.clear()
+
+
+def get_async_render_stats()->dict:
+    """Get the number of queued and running widget renders and the configured limits."""
+
+    result = dict(_stats)
+    result["max_workers"] = _config["max_workers"]
+    result["max_per_domain"] = _config["max_per_domain"]
+    return result
+
+
+async def get_widget_result_async(datasource:str, user_id:str, domain_id:str, query_parameters:dict=None, timeout:float=None, use_cache:bool=True)->dict:
+    """
+    Execute the code to get the requested visualization result for a datasource without blocking the event loop.
+
+    Parameters
+    ----------
+    datasource : str
+        Name of the datasource passed in from the API request that identifies the widget.
+    user_id: str
+        User id of the domain to get data.
+    domain_id: str
+        Domain id that identifies the user domain containing the widget data.
+    query_parameters: dict
+        A dictionary of optional options passed to the widget using the query parameters
+        from the API request. This may be None of there are no options.
+    timeout: float
+        Timeout in seconds including the time waiting for a free render slot.
+        Defaults to the configured timeout. None waits without a limit.
+    use_cache: bool
+        If True, use the process level widget cache.
+    Returns
+    -------
+    response: dict
+        A dictionary (json structure) containing the response to be sent back to the UI
+        to render the widget in the UI. Returns None if the datasoruce is not supported.
+    Raises
+    ------
+    TimeoutError
+        If the widget was not rendered within the timeout. A render already started keeps
+        its render slot until it finishes.
+    """
+
+    loop = asyncio.get_running_loop()
+    timeout = timeout if timeout is not None else _config["timeout"]
+    deadline = loop.time() + timeout if timeout is not None else None
+    limits = _get_loop_limits(loop)
+    domain_key = (str(user_id).lower(), str(domain_id).lower())
+    domain_slots = limits.get_domain_slots(domain_key)
+
+    _stats["queued"] = _stats["queued"] + 1
+    try:
+        await _wait_until(_acquire_slots(domain_slots, limits.global_slots), deadline, loop)
+    except BaseException as e:
+        _stats["queued"] = _stats["queued"] - 1
+        limits.release_domain(domain_key)
+        if isinstance(e, asyncio.TimeoutError):
+            _stats["timeouts"] = _stats["timeouts"] + 1
+            raise TimeoutError(f"Widget '{datasource}' was not started within {timeout} seconds.") from e
+        raise
+    _stats["queued"] = _stats["queued"] - 1
+    _stats["running"] = _stats["running"] + 1
+
+    def release_slots(_):
+        _stats["running"] = _stats["running"] - 1
+        limits.global_slots.release()
+        domain_slots.release()
+        limits.release_domain(domain_key)
+
+    render = functools.partial(
+        get_widget_result, datasource, user_id, domain_id, query_parameters, use_cache=use_cache
+    )
+    future = loop.run_in_executor(_get_executor(), render)
+    future.add_done_callback(release_slots)
+    try:
+        return await _wait_until(asyncio.shield(future), deadline, loop)
+    except asyncio.TimeoutError as e:
+        _stats["timeouts"] = _stats["timeouts"] + 1
+        raise TimeoutError(f"Widget '{datasource}' was not rendered within {timeout} seconds.") from e
+
+
+async def _acquire_slots(domain_slots:asyncio.Semaphore, global_slots:asyncio.Semaphore):
+    """Acquire a render slot of the domain and then a global render slot."""
+
+    await domain_slots.acquire()
+    try:
+        await global_slots.acquire()
+    except BaseException:
+        domain_slots.release()
+        raise
+
+
+async def _wait_until(awaitable, deadline:float, loop:asyncio.AbstractEventLoop):
+    """Await the awaitable until the deadline (loop time) or without limit if deadline is None."""
+
+    if deadline is None:
+        return await awaitable
+    return await asyncio.wait_for(awaitable, max(deadline - loop.time(), 0))
+
+
+def _get_loop_limits(loop:asyncio.AbstractEventLoop)->_RenderLimits:
+    """Get the render limits of the event loop."""
+
+    limits = _loop_limits.get(loop, None)
+    if limits is None:
+        limits = _RenderLimits(_config["max_workers"], _config["max_per_domain"])
+        _loop_limits[loop] = limits
+    return limits
+
+
+def _get_executor()->ThreadPoolExecutor:
+    """Get the thread pool used to render widgets."""
+
+    global _executor  # pylint: disable=W0603
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_config["max_workers"], thread_name_prefix="hydrogen_widget"
+            )
+        return _executor
@@ -0,0 +1,233 @@
+"""
+    heatmap_pyramid.py
+
+    Multi-resolution pyramids of heatmap grids used to return only the level of detail the
+    browser can display.
+
+    Level 0 of a pyramid is the full resolution grid and each following level averages blocks
+    of 2 x 2 cells of the previous level ignoring missing (NaN) values. A heatmap widget called
+    with the view query parameters
+
+        x_min, x_max, y_min, y_max  Window of the grid to display in grid cells (default the whole grid).
+        width, height               Size of the plot in pixels (default no limit).
+
+    returns the window from the finest level with at most width x height cells together with
+    the x0, dx, y0 and dy of the heatmap trace so the cells are drawn at their grid position.
+    Pyramids are computed when a level is first requested and kept in a process level LRU
+    cache keyed by the identity (e.g. file fingerprint) of the grid. The memory budget of the
+    cache in bytes is set by the environment variable HYDROGEN_WIDGET_PYRAMID_CACHE_BYTES
+    (default 256 MB).
+"""
+import os
+import math
+import threading
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple
+import numpy as np
+from hydrogen_widgets.utilities.heatmap_utilities import get_z_values
+
+# Memory budget in bytes of the pyramids kept in the process level cache
+MAX_PYRAMID_CACHE_BYTES = int(os.environ.get("HYDROGEN_WIDGET_PYRAMID_CACHE_BYTES", str(256 * 1024 * 1024)))
+
+_VIEW_PARAMETERS = ["x_min", "x_max", "y_min", "y_max", "width", "height"]
+
+
+class HeatmapView(NamedTuple):
+    """Window of a grid and size in pixels requested by the browser. None values are unlimited."""
+
+    x_min: float
+    x_max: float
+    y_min: float
+    y_max: float
+    width: int
+    height: int
+
+
+class HeatmapPyramid:
+    """Levels of a grid coarsened by 2 at each level with NaN aware means."""
+
+    def __init__(self, grid: np.ndarray):
+        """Create the pyramid of a 2D grid. Masked values are missing."""
+
+        grid = np.ma.asarray(grid)
+        dtype = grid.dtype if np.issubdtype(grid.dtype, np.floating) else np.float64
+        values = np.ma.filled(grid.astype(dtype), np.nan)
+        self.shape = values.shape
+        self._levels = [values]
+        self._counts = [np.isfinite(values).astype(np.int32)]
+        self._lock = threading.Lock()
+        # The coarser levels add at most a third of the size of the full resolution level
+        self.nbytes = (values.nbytes + self._counts[0].nbytes) * 4 // 3
+
+    def level(self, level: int) -> np.ndarray:
+        """Get the grid of a level. Cells of the level with no values in the full resolution grid are NaN."""
+
+        with self._lock:
+            while len(self._levels) <= level:
+                (values, counts) = coarsen_mean(self._levels[-1], self._counts[-1])
+                self._levels.append(values)
+                self._counts.append(counts)
+            return self._levels[level]
+
+
+def coarsen_mean(values: np.ndarray, counts: np.ndarray) -> tuple:
+    """
+    Average blocks of 2 x 2 cells of a grid weighted by the number of full resolution values of each cell.
+
+    Parameters
+    ----------
+    values: np.ndarray
+        Mean values of the cells of a level. NaN if a cell has no values.
+    counts: np.ndarray
+        Number of full resolution values averaged by each cell.
+    Returns
+    -------
+    tuple
+        The (values, counts) of the coarser level. The last row and column of a grid with an odd
+        number of rows or columns average fewer cells.
+    """
+
+    (rows, columns) = values.shape
+    padded_shape = (rows + rows % 2, columns + columns % 2)
+    sums = np.zeros(padded_shape, dtype=np.float64)
+    sums[:rows, :columns] = np.where(counts > 0, values, 0)
+    sums[:rows, :columns] *= counts
+    padded_counts = np.zeros(padded_shape, dtype=np.int32)
+    padded_counts[:rows, :columns] = counts
+    block_shape = (padded_shape[0] // 2, 2, padded_shape[1] // 2, 2)
+    sums = sums.reshape(block_shape).sum(axis=(1, 3))
+    coarse_counts = padded_counts.reshape(block_shape).sum(axis=(1, 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        coarse_values = (sums / coarse_counts).astype(values.dtype)
+    return (coarse_values, coarse_counts)
+
+
+_pyramids = OrderedDict()
+_pyramids_lock = threading.Lock()
+
+
+def get_heatmap_pyramid(key: tuple, grid: np.ndarray) -> HeatmapPyramid:
+    """
+    Get the pyramid of a grid from the process level cache.
+
+    Parameters
+    ----------
+    key: tuple
+        Identity of the grid, for example the fingerprint of the file and the name of the variable.
+        The key must change when the grid changes.
+    grid: np.ndarray
+        The full resolution grid used if the pyramid is not cached.
+    Returns
+    -------
+    HeatmapPyramid
+        The pyramid of the grid.
+    """
+
+    with _pyramids_lock:
+        pyramid = _pyramids.get(key, None)
+        if pyramid is not None:
+            _pyramids.move_to_end(key)
+            return pyramid
+    pyramid = HeatmapPyramid(grid)
+    with _pyramids_lock:
+        _pyramids[key] = pyramid
+        total_bytes = sum(p.nbytes for p in _pyramids.values())
+        while total_bytes > MAX_PYRAMID_CACHE_BYTES and len(_pyramids) > 1:
+            (_, evicted) = _pyramids.popitem(last=False)
+            total_bytes = total_bytes - evicted.nbytes
+    return pyramid
+
+
+def get_heatmap_grid(key: tuple, view: HeatmapView, read_grid: Callable) -> np.ndarray:
+    """Get the full resolution grid from the cached pyramid of the grid if the view uses pyramids, otherwise call read_grid()."""
+
+    if view is not None:
+        with _pyramids_lock:
+            pyramid = _pyramids.get(key, None)
+        if pyramid is not None:
+            return pyramid.level(0)
+    return read_grid()
+
+
+def clear_heatmap_pyramids():
+    """Remove all the cached pyramids."""
+
+    with _pyramids_lock:
+        _pyramids.clear()
+
+
+def get_heatmap_view(query_parameters: dict) -> HeatmapView:
+    """Get the view query parameters of a heatmap widget or None if the whole grid is requested at full resolution."""
+
+    query_parameters = query_parameters if query_parameters else {}
+    values = [query_parameters.get(name, None) for name in _VIEW_PARAMETERS]
+    if all(value is None for value in values):
+        return None
+    try:
+        (x_min, x_max, y_min, y_max) = [float(value) if value is not None else None for value in values[:4]]
+        (width, height) = [int(value) if value is not None else None for value in values[4:]]
+    except ValueError as e:
+        raise Exception("The heatmap view query parameters must be numbers.") from e
+    if (width is not None and width <= 0) or (height is not None and height <= 0):
+        raise Exception("The heatmap width and height must be positive.")
+    return HeatmapView(x_min, x_max, y_min, y_max, width, height)
+
+
+def get_heatmap_values(key: tuple, grid: np.ndarray, view: HeatmapView, z_encoding: str = None) -> dict:
+    """
+    Get the z values of a heatmap trace for a view of a grid.
+
+    Parameters
+    ----------
+    key: tuple
+        Identity of the grid used to cache its pyramid (see get_heatmap_pyramid).
+    grid: np.ndarray
+        The full resolution grid.
+    view: HeatmapView
+        The view returned by get_heatmap_view. None to return the whole grid at full resolution.
+    z_encoding: str
+        The z_encoding query parameter of the widget (see get_z_values).
+    Returns
+    -------
+    dict
+        The "z" of the trace and, if view is not None, the "x0", "dx", "y0" and "dy" of the trace
+        in full resolution grid cells.
+    """
+
+    if view is None:
+        return {"z": get_z_values(grid, z_encoding)}
+    pyramid = get_heatmap_pyramid(key, grid)
+    (rows, columns) = pyramid.shape
+    (x_start, x_end) = _get_window(view.x_min, view.x_max, columns)
+    (y_start, y_end) = _get_window(view.y_min, view.y_max, rows)
+    level = max(_get_level(x_end - x_start, view.width), _get_level(y_end - y_start, view.height))
+    factor = 2**level
+    x_start = x_start // factor
+    y_start = y_start // factor
+    x_end = -(-x_end // factor)
+    y_end = -(-y_end // factor)
+    values = pyramid.level(level)[y_start:y_end, x_start:x_end]
+    return {
+        "z": get_z_values(values, z_encoding),
+        "x0": x_start * factor + (factor - 1) / 2,
+        "dx": factor,
+        "y0": y_start * factor + (factor - 1) / 2,
+        "dy": factor,
+    }
+
+
+def _get_window(start: float, end: float, size: int) -> List[int]:
+    """Get the [start, end) cell indexes of a window of cell coordinates clipped to a grid dimension."""
+
+    start = 0 if start is None else min(max(int(math.floor(start)), 0), size - 1)
+    end = size if end is None else min(max(int(math.ceil(end)) + 1, start + 1), size)
+    return [start, end]
+
+
+def _get_level(cells: int, pixels: int) -> int:
+    """Get the first level where the cells of a window fit in the pixels."""
+
+    level = 0
+    while pixels is not None and -(-cells // 2**level) > pixels:
+        level = level + 1
+    return level
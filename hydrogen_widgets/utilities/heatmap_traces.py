@@ -0,0 +1,82 @@
+"""
+    heatmap_traces.py
+
+    On-demand loading of the traces of heatmap widgets showing one trace at a time.
+
+    The forecast heatmap widgets return one heatmap trace per grid and an updatemenus dropdown
+    that makes one trace visible at a time. With the query parameter lazy_traces=1 only the
+    visible trace contains values. The other traces are stubs without z values that contain
+    "lazy": true and their "trace_index". The UI fetches the values of a stub when its dropdown
+    entry is opened by calling the same datasource with the query parameter trace_index, which
+    returns {"traces": [trace], "trace_index": trace_index} without encoding the other traces.
+    The grid of a trace can be a function, so only the grids of the traces returned with values are read.
+"""
+from typing import List, NamedTuple
+from hydrogen_widgets.utilities.heatmap_pyramid import HeatmapView, get_heatmap_values
+
+
+class TraceLoading(NamedTuple):
+    """The traces of a heatmap widget to return with values."""
+
+    # True to return only the values of the visible traces
+    lazy: bool
+    # Index of the only trace to return or None to return all the traces
+    trace_index: int
+
+
+def get_trace_loading(query_parameters: dict) -> TraceLoading:
+    """Get the lazy_traces and trace_index query parameters of a heatmap widget."""
+
+    query_parameters = query_parameters if query_parameters else {}
+    lazy = str(query_parameters.get("lazy_traces", "0")).lower() in ("1", "true")
+    trace_index = query_parameters.get("trace_index", None)
+    if trace_index is not None:
+        try:
+            trace_index = int(trace_index)
+        except ValueError as e:
+            raise Exception(f"Invalid trace_index '{trace_index}'.") from e
+    return TraceLoading(lazy, trace_index)
+
+
+def add_heatmap_values(
+    traces: List[dict], grids: List[tuple], view: HeatmapView, z_encoding: str, trace_loading: TraceLoading
+) -> List[dict]:
+    """
+    Add the z values of the grids to the heatmap traces that are returned with values.
+
+    Parameters
+    ----------
+    traces: List[dict]
+        The heatmap traces without values.
+    grids: List[tuple]
+        The (key, grid) of each trace used by get_heatmap_values. The grid can be a function returning
+        the grid that is only called if the trace is returned with values.
+    view: HeatmapView
+        The view query parameters of the widget.
+    z_encoding: str
+        The z_encoding query parameter of the widget.
+    trace_loading: TraceLoading
+        The traces to return with values.
+    Returns
+    -------
+    List[dict]
+        The traces. Only the trace trace_loading.trace_index if it is not None.
+    """
+
+    if trace_loading.trace_index is not None:
+        if not 0 <= trace_loading.trace_index < len(traces):
+            raise Exception(f"The trace_index {trace_loading.trace_index} does not exist.")
+        indexes = [trace_loading.trace_index]
+    else:
+        indexes = range(len(traces))
+    result = []
+    for index in indexes:
+        trace = traces[index]
+        if trace_loading.lazy and trace_loading.trace_index is None and not trace.get("visible", True):
+            trace.update({"lazy": True, "trace_index": index})
+        else:
+            (key, grid) = grids[index]
+            grid = grid() if callable(grid) else grid
+            trace.update(get_heatmap_values(key, grid, view, z_encoding))
+        result.append(trace)
+    return result
@@ -0,0 +1,111 @@
+"""
+    heatmap_utilities.py
+
+    Methods to support heatmap visualizations.
+"""
+import base64
+from typing import Union
+import numpy as np
+
+# Values of the z_encoding query parameter and the plotly.js typed array dtype they produce
+Z_ENCODINGS = {
+    "f4": "<f4",
+    "f8": "<f8",
+}
+
+# Quantized values of the z_encoding query parameter and the plotly.js dtype and numpy dtype of the codes.
+# The largest code of a dtype is the sentinel of missing values.
+QUANTIZED_Z_ENCODINGS = {
+    "u8": ("u1", "<u1"),
+    "u16": ("u2", "<u2"),
+}
+
+
+def get_z_values(nparray: np.ndarray, z_encoding: str = None) -> Union[np.ndarray, dict]:
+    """
+    Generate z values of the plotly heatmap.
+
+    Parameters
+    ----------
+    nparray: np.ndarray
+        The 2D grid of values of the heatmap.
+    z_encoding: str
+        None to return the values as a NumPy array, which is converted to nested lists of floats
+        when the response is serialized (widget_json.py). Otherwise the dtype of a plotly.js
+        typed array ("f4" or "f8"). The typed array is a dict with the base64 encoded little
+        endian values, the dtype and the shape of the grid. Missing values are NaN.
+        "u8" or "u16" return quantized values (see encode_quantized_array).
+    Returns
+    -------
+        The z values of the heatmap trace.
+    """
+
+    if z_encoding is None:
+        # Like plotly, use the data of masked arrays without the mask
+        return np.asarray(np.ma.getdata(nparray))
+    return encode_typed_array(nparray, z_encoding)
+
+
+def encode_typed_array(nparray: np.ndarray, z_encoding: str) -> dict:
+    """Encode the array as a plotly.js typed array {dtype, bdata, shape}."""
+
+    if z_encoding in QUANTIZED_Z_ENCODINGS:
+        return encode_quantized_array(nparray, z_encoding)
+    dtype = Z_ENCODINGS.get(z_encoding, None)
+    if dtype is None:
+        raise Exception(f"Unsupported z_encoding '{z_encoding}'.")
+    values = np.ma.filled(np.ma.asarray(nparray, dtype=dtype), np.nan)
+    values = np.ascontiguousarray(values, dtype=dtype)
+    return {
+        "dtype": z_encoding,
+        "bdata": base64.b64encode(values.tobytes()).decode("ascii"),
+        "shape": ", ".join(str(n) for n in values.shape),
+    }
+
+
+def encode_quantized_array(nparray: np.ndarray, z_encoding: str) -> dict:
+    """
+    Encode the array as a plotly.js typed array of unsigned integer codes with a scale and offset.
+
+    Parameters
+    ----------
+    nparray: np.ndarray
+        The 2D grid of values. Masked and non finite values are missing.
+    z_encoding: str
+        "u8" for codes of 1 byte or "u16" for codes of 2 bytes.
+    Returns
+    -------
+    dict
+        The typed array {dtype, bdata, shape, scale, offset, nan}. A value is decoded as
+        offset + scale * code, except that codes equal to nan are missing values.
+    """
+
+    (dtype_name, dtype) = QUANTIZED_Z_ENCODINGS[z_encoding]
+    sentinel = np.iinfo(dtype).max
+    values = np.ma.filled(np.ma.asarray(nparray, dtype=np.float64), np.nan)
+    finite = np.isfinite(values)
+    if finite.any():
+        offset = float(values[finite].min())
+        value_range = float(values[finite].max()) - offset
+    else:
+        (offset, value_range) = (0.0, 0.0)
+    scale = value_range / (sentinel - 1) if value_range > 0 else 1.0
+    codes = np.full(values.shape, sentinel, dtype=dtype)
+    codes[finite] = np.rint((values[finite] - offset) / scale)
+    return {
+        "dtype": dtype_name,
+        "bdata": base64.b64encode(codes.tobytes()).decode("ascii"),
+        "shape": ", ".join(str(n) for n in codes.shape),
+        "scale": scale,
+        "offset": offset,
+        "nan": int(sentinel),
+    }
+
+
+def get_z_encoding(query_parameters: dict) -> str:
+    """Get the z_encoding query parameter of a heatmap widget or None to use nested lists."""
+
+    z_encoding = (query_parameters if query_parameters else {}).get("z_encoding", None)
+    if z_encoding is not None and z_encoding not in Z_ENCODINGS and z_encoding not in QUANTIZED_Z_ENCODINGS:
+        raise Exception(f"Unsupported z_encoding '{z_encoding}'.")
+    return z_encoding
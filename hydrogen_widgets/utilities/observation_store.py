@@ -0,0 +1,367 @@
+"""
+    observation_store.py
+
+    Consolidated columnar store of the observations of a domain.
+
+    The (datetime, value) records of every observations/<site_type>/<site_id>.nc file of a domain
+    are read once, sorted by date and packed contiguously into two raw columns
+    observations/store/<site_type>/dates.<generation>.dat (datetime64[ns]) and
+    values.<generation>.dat (float64) in the widget cache directory of the domain
+    (widget_cache_path.py). index.json has the offset and number of records of each
+    site and the name, size and modification time of its netCDF file. The columns are memory
+    mapped, so the records of a site in a date range are found with two binary searches and
+    returned as a slice of the columns without opening the netCDF file.
+
+    Files added or modified since the store was last updated are appended to the columns when the
+    store is requested and the records of modified or removed files are dropped from the index.
+    The columns are rewritten to a new generation when more than half of their records were
+    dropped, so processes that mapped the previous generation keep reading consistent columns.
+    Missing values are NaN.
+
+    The store is not used if the environment variable HYDROGEN_WIDGET_OBSERVATION_STORE is 0,
+    HYDROGEN_WIDGET_CACHE_PATH is not set, the widget cache directory is not writable or the
+    platform has no fcntl file locks to share the store files between processes (Windows).
+"""
+import os
+import json
+import tempfile
+import threading
+from typing import Tuple
+import numpy as np
+import pandas
+import xarray
+from hydrogen_widgets.utilities.widget_cache_path import get_domain_cache_directory
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Increment when the format of the store files changes so existing stores are rebuilt
+OBSERVATION_STORE_VERSION = 1
+
+# Variable of the observation files of each site type
+OBSERVATION_VARIABLES = {"streamflow": "streamflow", "groundwater": "wtd"}
+
+_config = {"enabled": os.environ.get("HYDROGEN_WIDGET_OBSERVATION_STORE", "1") != "0"}
+
+
+class ObservationStore:
+    """Observations of the sites of a site type mapped from the columns of the store."""
+
+    def __init__(self, directory: str, index: dict):
+        """Map the columns of a store directory described by the contents of its index file."""
+
+        self.directory = directory
+        self.rows = index["rows"]
+        # site_id: (name, size, mtime_ns, offset, count)
+        self.sites = {site_id: tuple(site) for (site_id, site) in index["sites"].items()}
+        self.dates = _map_column(f"{directory}/dates.{index['generation']}.dat", "datetime64[ns]", self.rows)
+        self.values = _map_column(f"{directory}/values.{index['generation']}.dat", "float64", self.rows)
+
+    def series(self, site_id: str, start: np.datetime64 = None, end: np.datetime64 = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the observations of a site in a date range.
+
+        Parameters
+        ----------
+        site_id: str
+            The site id, the name of the observation file without .nc.
+        start: np.datetime64
+            The first date of the range or None to start at the first observation.
+        end: np.datetime64
+            The date after the range or None to end at the last observation.
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            The dates and values of the observations, slices of the memory mapped columns.
+            Raises an exception if the site is not in the store.
+        """
+
+        site = self.sites.get(str(site_id), None)
+        if site is None:
+            raise Exception(f"No observations for the site '{site_id}'.")
+        offset = site[3]
+        dates = self.dates[offset : offset + site[4]]
+        (first, last) = _find_date_range(dates, start, end)
+        return (dates[first:last], self.values[offset + first : offset + last])
+
+
+def configure_observation_store(enabled: bool):
+    """Enable or disable the observation store files."""
+
+    _config["enabled"] = enabled
+
+
+def is_observation_store_enabled() -> bool:
+    """Return True if the observation store files are used."""
+
+    return _config["enabled"]
+
+
+def get_observation_store_directory(domain_path: str, site_type: str) -> str:
+    """
+    Get the directory of the store of the observations of a site type of a domain
+    or None if HYDROGEN_WIDGET_CACHE_PATH is not set.
+    """
+
+    cache_directory = get_domain_cache_directory(domain_path)
+    if cache_directory is None:
+        return None
+    return os.path.join(cache_directory, "observations", "store", site_type)
+
+
+_stores = {}
+# Lock of the threads updating the store of each directory
+_directory_locks = {}
+_stores_lock = threading.Lock()
+
+
+def get_observation_store(domain_path: str, site_type: str) -> ObservationStore:
+    """
+    Get the store of the observations of a site type of a domain after appending the observation
+    files added or modified since the store was last updated.
+
+    Parameters
+    ----------
+    domain_path: str
+        Path to the domain directory.
+    site_type: str
+        The site type, e.g. "streamflow" or "groundwater".
+    Returns
+    -------
+    ObservationStore
+        The store or None if store files are disabled, the site type has no observations directory
+        or the widget cache directory of the domain is not set or not writable.
+    """
+
+    if not _config["enabled"] or site_type not in OBSERVATION_VARIABLES or fcntl is None:
+        return None
+    directory = get_observation_store_directory(domain_path, site_type)
+    if directory is None:
+        return None
+    observations_path = f"{domain_path}/observations/{site_type}"
+    site_files = _list_site_files(observations_path)
+    if site_files is None:
+        return None
+    with _stores_lock:
+        store = _stores.get(directory, None)
+    if store is not None and _is_current(store.sites, site_files):
+        return store
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        lock_stream = open(f"{directory}/.lock", "a", encoding="utf-8")
+    except OSError:
+        return None
+    with _stores_lock:
+        directory_lock = _directory_locks.setdefault(directory, threading.Lock())
+    with directory_lock, lock_stream:
+        # Other processes update the same files, so the index is read again while locked
+        fcntl.flock(lock_stream, fcntl.LOCK_EX)
+        index = _update_store(
+            directory, _read_index(directory), observations_path, site_files, OBSERVATION_VARIABLES[site_type]
+        )
+        store = ObservationStore(directory, index)
+    with _stores_lock:
+        _stores[directory] = store
+    return store
+
+
+def clear_observation_stores():
+    """Remove all the cached stores. The store files are not removed."""
+
+    with _stores_lock:
+        _stores.clear()
+
+
+def get_observations(
+    domain_path: str,
+    site_type: str,
+    site_id: str,
+    start: np.datetime64 = None,
+    end: np.datetime64 = None,
+    dropna: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the observations of a site of a domain in a date range.
+
+    Parameters
+    ----------
+    domain_path: str
+        Path to the domain directory.
+    site_type: str
+        The site type, e.g. "streamflow" or "groundwater".
+    site_id: str
+        The site id, the name of the observation file without .nc.
+    start: np.datetime64
+        The first date of the range or None to start at the first observation.
+    end: np.datetime64
+        The date after the range or None to end at the last observation.
+    dropna: bool
+        True to remove the observations with a missing value.
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The datetime64[ns] dates and float64 values of the observations sorted by date. Read from
+        the observation store of the domain or from the observation file if the store is not used.
+    """
+
+    store = get_observation_store(domain_path, site_type)
+    if store is not None:
+        (dates, values) = store.series(site_id, start, end)
+    else:
+        variable = OBSERVATION_VARIABLES.get(site_type, site_type)
+        (dates, values) = read_observation_file(f"{domain_path}/observations/{site_type}/{site_id}.nc", variable)
+        (first, last) = _find_date_range(dates, start, end)
+        (dates, values) = (dates[first:last], values[first:last])
+    if dropna:
+        present = ~np.isnan(values)
+        (dates, values) = (dates[present], values[present])
+    return (dates, values)
+
+
+def read_observation_file(path: str, variable: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Read the datetime64[ns] dates and float64 values of an observation file sorted by date without missing dates."""
+
+    with xarray.open_dataset(path) as ds:
+        dates = pandas.DatetimeIndex(ds["datetime"].values).to_numpy().astype("datetime64[ns]")
+        values = ds[variable].to_numpy().astype(np.float64)
+    present = ~np.isnat(dates)
+    (dates, values) = (dates[present], values[present])
+    if len(dates) > 1 and not np.all(dates[1:] >= dates[:-1]):
+        order = np.argsort(dates, kind="stable")
+        (dates, values) = (dates[order], values[order])
+    return (dates, values)
+
+
+def _find_date_range(dates: np.ndarray, start: np.datetime64, end: np.datetime64) -> Tuple[int, int]:
+    """Find the first and after last positions of the sorted dates in the range [start, end)."""
+
+    first = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, "ns"), side="left"))
+    last = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(end, "ns"), side="left"))
+    return (first, max(first, last))
+
+
+def _map_column(path: str, dtype: str, rows: int) -> np.ndarray:
+    """Map the first rows of a column file read only."""
+
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+
+def _list_site_files(directory: str) -> dict:
+    """Get the (name, size, mtime_ns) of the observation files of a directory by site id or None if it does not exist."""
+
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return None
+    site_files = {}
+    for entry in entries:
+        if entry.name.endswith(".nc") and entry.is_file():
+            file_stat = entry.stat()
+            site_files[entry.name[: -len(".nc")]] = (entry.name, file_stat.st_size, file_stat.st_mtime_ns)
+    return site_files
+
+
+def _is_current(sites: dict, site_files: dict) -> bool:
+    """Return True if the sites of a store are the observation files."""
+
+    return len(sites) == len(site_files) and all(
+        site_id in sites and tuple(sites[site_id][:3]) == site_file for (site_id, site_file) in site_files.items()
+    )
+
+
+def _read_index(directory: str) -> dict:
+    """Read the index file of a store or return None if it does not exist or has another version."""
+
+    try:
+        with open(f"{directory}/index.json", "r", encoding="utf-8") as stream:
+            index = json.load(stream)
+    except (OSError, ValueError):
+        return None
+    return index if index.get("version", None) == OBSERVATION_STORE_VERSION else None
+
+
+def _update_store(directory: str, index: dict, observations_path: str, site_files: dict, variable: str) -> dict:
+    """Append the observations of the files that are not in the store or were modified and return the new index."""
+
+    if index is None:
+        index = {"version": OBSERVATION_STORE_VERSION, "generation": 0, "rows": 0, "sites": {}}
+        _remove_columns(directory, keep_generation=None)
+        for column in ["dates", "values"]:
+            open(f"{directory}/{column}.0.dat", "wb").close()
+    if _is_current(index["sites"], site_files):
+        return index
+    sites = {
+        site_id: site
+        for (site_id, site) in index["sites"].items()
+        if site_id in site_files and tuple(site[:3]) == site_files[site_id]
+    }
+    rows = index["rows"]
+    new_sites = [site_id for site_id in sorted(site_files) if site_id not in sites]
+    columns = {"dates": [], "values": []}
+    for site_id in new_sites:
+        (dates, values) = read_observation_file(f"{observations_path}/{site_files[site_id][0]}", variable)
+        sites[site_id] = list(site_files[site_id]) + [rows, len(dates)]
+        rows += len(dates)
+        columns["dates"].append(dates)
+        columns["values"].append(values)
+    generation = index["generation"]
+    for (column, dtype) in [("dates", "datetime64[ns]"), ("values", "float64")]:
+        with open(f"{directory}/{column}.{generation}.dat", "r+b") as stream:
+            # Records written after the index by an interrupted update are overwritten
+            stream.seek(index["rows"] * 8)
+            for array in columns[column]:
+                stream.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+            stream.truncate()
+    index = dict(index, rows=rows, sites=sites)
+    live_rows = sum(site[4] for site in sites.values())
+    if rows > 2 * live_rows:
+        index = _compact_store(directory, index)
+    _write_index(directory, index)
+    if index["generation"] != generation:
+        _remove_columns(directory, keep_generation=index["generation"])
+    return index
+
+
+def _compact_store(directory: str, index: dict) -> dict:
+    """Write the observations of the sites of a store to the columns of the next generation and return the new index."""
+
+    generation = index["generation"] + 1
+    sites = {}
+    rows = 0
+    for (column, dtype) in [("dates", "datetime64[ns]"), ("values", "float64")]:
+        source = _map_column(f"{directory}/{column}.{index['generation']}.dat", dtype, index["rows"])
+        rows = 0
+        with open(f"{directory}/{column}.{generation}.dat", "wb") as stream:
+            for (site_id, site) in sorted(index["sites"].items(), key=lambda item: item[1][3]):
+                stream.write(np.ascontiguousarray(source[site[3] : site[3] + site[4]]).tobytes())
+                sites[site_id] = list(site[:3]) + [rows, site[4]]
+                rows += site[4]
+        del source
+    return dict(index, generation=generation, rows=rows, sites=sites)
+
+
+def _remove_columns(directory: str, keep_generation: int):
+    """Remove the column files of a store except those of a generation."""
+
+    for name in os.listdir(directory):
+        if name.endswith(".dat") and name.split(".")[1] != str(keep_generation):
+            os.remove(f"{directory}/{name}")
+
+
+def _write_index(directory: str, index: dict):
+    """Replace the index file of a store."""
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as stream:
+            json.dump(index, stream)
+        os.replace(temp_path, f"{directory}/index.json")
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
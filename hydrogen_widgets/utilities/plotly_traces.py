@@ -0,0 +1,71 @@
+"""
+    plotly_traces.py
+
+    Build plotly.js traces as dicts directly from NumPy arrays.
+
+    The widgets return their traces as dicts of plotly.js attributes. build_trace() converts the
+    data arrays of a trace (x, y, z, lat, lon, ...) with np.asarray instead of copying and type
+    checking every value like plotly.graph_objects, and the arrays are written to json by
+    widget_json.py, so plotly is not imported when rendering widgets. Set the environment variable
+    HYDROGEN_WIDGET_VALIDATE_TRACES=1 or call configure_trace_validation(True) while developing a
+    widget to validate each trace with plotly.graph_objects.
+"""
+import os
+import numpy as np
+
+# Trace attributes that contain one value per point of the trace
+DATA_ARRAY_ATTRIBUTES = {"x", "y", "z", "lat", "lon", "text", "customdata"}
+
+_config = {"validate": os.environ.get("HYDROGEN_WIDGET_VALIDATE_TRACES", "0") == "1"}
+
+
+def configure_trace_validation(validate: bool):
+    """Enable or disable validating the traces built by build_trace with plotly.graph_objects."""
+
+    _config["validate"] = validate
+
+
+def build_trace(trace_type: str, **attributes) -> dict:
+    """
+    Build a plotly.js trace.
+
+    Parameters
+    ----------
+    trace_type: str
+        The plotly.js type of the trace, e.g. "scatter", "scattergeo" or "heatmap".
+    attributes:
+        The attributes of the trace. The data arrays may be NumPy arrays, pandas Series or
+        xarray DataArrays. Lists and tuples are kept as is.
+    Returns
+    -------
+    dict
+        The trace with the type first and the data arrays as NumPy arrays.
+    """
+
+    trace = {"type": trace_type}
+    for (name, value) in attributes.items():
+        trace[name] = to_data_array(value) if name in DATA_ARRAY_ATTRIBUTES else value
+    if _config["validate"]:
+        validate_trace(trace)
+    return trace
+
+
+def to_data_array(values):
+    """Get the values of a data array attribute as a NumPy array without copying NumPy arrays."""
+
+    if values is None or isinstance(values, (list, tuple, dict, str)):
+        return values
+    return np.asarray(values)
+
+
+def validate_trace(trace: dict):
+    """Raise an exception if a trace has an attribute or value that is not valid in plotly.js."""
+
+    # Only imported when validating traces
+    import plotly.graph_objects as go  # pylint: disable=C0415
+
+    try:
+        # The Figure removes the type from the dicts of its traces
+        go.Figure(data=[dict(trace)])
+    except ValueError as e:
+        raise Exception(f"Invalid plotly {trace.get('type')} trace.") from e
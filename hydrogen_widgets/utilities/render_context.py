@@ -0,0 +1,57 @@
+"""
+    render_context.py
+
+    Inputs and intermediate results shared by the widgets rendered for one domain.
+
+    When several widgets of a dashboard are rendered together they are passed the same
+    RenderContext so each input file is opened once and values computed from the inputs
+    (for example the top layer soil moisture of a forecast) are computed once.
+"""
+from typing import Callable
+from hydrogen_common import get_domain_path, get_domain_state
+
+
+class RenderContext:
+    """Memoized inputs and computed values of a user domain."""
+
+    def __init__(self, user_id: str, domain_id: str):
+        self.user_id = user_id
+        self.domain_id = domain_id
+        self._values = {}
+
+    @property
+    def domain_path(self) -> str:
+        """Absolute path of the domain directory."""
+
+        return self.get("domain_path", lambda: get_domain_path(user_id=self.user_id, domain_directory=self.domain_id))
+
+    @property
+    def domain_state(self) -> dict:
+        """Contents of the domain_state.json file of the domain."""
+
+        return self.get("domain_state", lambda: get_domain_state(user_id=self.user_id, domain_directory=self.domain_id))
+
+    def get(self, key, loader: Callable):
+        """Return the value of the key, calling loader() to compute it the first time it is requested."""
+
+        if key not in self._values:
+            self._values[key] = loader()
+        return self._values[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._values
+
+    def close(self):
+        """Close any opened datasets and release the memoized values."""
+
+        for value in self._values.values():
+            close = getattr(value, "close", None)
+            if callable(close):
+                close()
+        self._values.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,104 @@
+"""
+    Render all the widgets of a dashboard in one call.
+    The widgets share the opened input files and computed values of the domain.
+"""
+from hydrogen_widgets.utilities.get_widget_layout import get_widget_layout
+from hydrogen_widgets.utilities.get_widget_result import (
+    get_widget_result,
+    is_widget_cache_enabled,
+    get_cached_widget_result,
+    cache_widget_result,
+)
+from hydrogen_widgets.utilities.render_context import RenderContext
+from hydrogen_widgets.utilities.widget_registry import get_widget_spec
+from hydrogen_widgets.utilities.widget_cache import get_widget_cache_key
+from hydrogen_widgets.utilities.widget_json import to_json_compatible
+
+def render_dashboard(dashboard_id:str, user_id:str, domain_id:str, query_parameters:dict=None, use_cache:bool=True, use_processes:bool=False)->dict:
+    """
+    Get the responses of all the widgets of a dashboard defined in dashboard_config.json.
+
+    The widgets are rendered with a shared RenderContext so input files used by several widgets
+    (for example the forecast file used by all the forecast widgets) are opened and read once
+    and values computed from them are computed once.
+
+    Parameters
+    ----------
+    dashboard_id : str
+        Name of the dashboard in dashboard_config.json. E.g. "forecasts".
+    user_id: str
+        User id of the domain to get data.
+    domain_id: str
+        Domain id that identifies the user domain containing the widget data.
+    query_parameters: dict
+        A dictionary of optional options passed to every widget of the dashboard.
+    use_cache: bool
+        If True, use the process level widget cache for each widget.
+    use_processes: bool
+        If True, render the widgets in parallel in the widget process pool. Widgets that accept a
+        RenderContext are rendered together in one worker process so they still share their inputs.
+    Returns
+    -------
+    response: dict
+        A dictionary of datasource to the response of the widget of the datasource.
+    """
+
+    dashboard = get_widget_layout().get(dashboard_id, None)
+    if dashboard is None:
+        raise Exception(f"Dashboard '{dashboard_id}' is not defined.")
+
+    datasources = []
+    for widget in dashboard.get("widgets", []):
+        datasource = widget.get("datasource", None)
+        if datasource and datasource not in datasources:
+            datasources.append(datasource)
+
+    if use_processes:
+        return _render_dashboard_in_processes(datasources, user_id, domain_id, query_parameters, use_cache)
+
+    result = {}
+    with RenderContext(user_id, domain_id) as context:
+        for datasource in datasources:
+            result[datasource] = get_widget_result(
+                datasource, user_id, domain_id, query_parameters, use_cache=use_cache, context=context
+            )
+    return result
+
+
+def _render_dashboard_in_processes(datasources:list, user_id:str, domain_id:str, query_parameters:dict, use_cache:bool)->dict:
+    """Render the widgets not found in the widget cache in parallel in the widget process pool."""
+
+    # pylint: disable=C0415
+    from hydrogen_widgets.utilities.widget_process_pool import render_widgets_in_processes
+
+    result = {}
+    cache_keys = {}
+    with RenderContext(user_id, domain_id) as context:
+        for datasource in datasources:
+            if get_widget_spec(datasource) is None:
+                result[datasource] = None
+            elif use_cache and is_widget_cache_enabled():
+                cache_keys[datasource] = get_widget_cache_key(
+                    datasource, context.domain_path, user_id, domain_id, query_parameters
+                )
+                response = get_cached_widget_result(cache_keys[datasource])
+                if response is not None:
+                    result[datasource] = response
+
+    # Widgets that share a RenderContext are rendered together in one worker process
+    shared_group = []
+    groups = []
+    for datasource in datasources:
+        if datasource not in result:
+            if get_widget_spec(datasource).accepts_context:
+                shared_group.append(datasource)
+            else:
+                groups.append([datasource])
+    if shared_group:
+        groups.insert(0, shared_group)
+
+    rendered = render_widgets_in_processes(groups, user_id, domain_id, query_parameters) if groups else {}
+    for datasource, response in rendered.items():
+        cache_widget_result(cache_keys.get(datasource, None), response)
+        result[datasource] = response
+    return {datasource: to_json_compatible(result[datasource]) for datasource in datasources}
@@ -0,0 +1,213 @@
+"""
+    render_timing.py
+
+    Stage level timing of widget renders.
+
+    Render functions mark the stages of a render with named spans:
+
+        with timed_stage("open"):
+            dataset = xr.open_dataset(path)
+
+    Conventional stage names are "open" (opening input files), "read" (loading values),
+    "compute" (numpy computations) and "encode" (building the traces of the response).
+    The times of the spans of a stage are added up during the render of a widget and passed
+    to the registered timing sinks with the datasource when the render ends, together with
+    the "total" time of the render. Timing is disabled until a sink is added, and a disabled
+    span only costs a function call.
+
+    Sinks are callables sink(datasource, stage, seconds). Provided sinks are log_stage_timing
+    (the logging module) and StageTimingHistogram (in-memory recent timings with p50/p95).
+    Setting the environment variable HYDROGEN_WIDGET_TIMING=1 adds the default histogram,
+    whose percentiles are returned by get_stage_timings().
+"""
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, List
+
+_sinks = []
+# (datasource, dict of stage to seconds) of the widget being rendered
+_render = contextvars.ContextVar("hydrogen_widget_render", default=None)
+
+
+class StageTimingHistogram:
+    """Timing sink keeping the most recent timings of each datasource and stage."""
+
+    def __init__(self, max_samples: int = 1000):
+        """Create a histogram keeping up to max_samples timings per datasource and stage."""
+
+        self.max_samples = max_samples
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, datasource: str, stage: str, seconds: float):
+        """Record the time of a stage."""
+
+        key = (datasource, stage)
+        with self._lock:
+            samples = self._samples.get(key, None)
+            if samples is None:
+                samples = deque(maxlen=self.max_samples)
+                self._samples[key] = samples
+            samples.append(seconds)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def percentiles(self) -> dict:
+        """
+        Get the timings of the recorded stages.
+
+        Returns
+        -------
+        dict
+            A dict of datasource to a dict of stage to {"count", "p50", "p95", "max"}.
+            count is the number of timings recorded and the other values are seconds
+            computed from the most recent timings.
+        """
+
+        with self._lock:
+            items = [(key, list(samples), self._counts[key]) for key, samples in self._samples.items()]
+        result = {}
+        for (datasource, stage), samples, count in items:
+            samples.sort()
+            result.setdefault(datasource, {})[stage] = {
+                "count": count,
+                "p50": _percentile(samples, 50),
+                "p95": _percentile(samples, 95),
+                "max": samples[-1],
+            }
+        return result
+
+    def clear(self):
+        """Remove all the recorded timings."""
+
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+def _percentile(sorted_samples: List[float], percent: float) -> float:
+    """Get a percentile of sorted values using linear interpolation (like numpy.percentile)."""
+
+    position = (len(sorted_samples) - 1) * percent / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (position - lower)
+
+
+def log_stage_timing(datasource: str, stage: str, seconds: float):
+    """Timing sink writing every stage time to the logging module at debug level."""
+
+    logging.getLogger(__name__).debug("%s %s %.6f", datasource, stage, seconds)
+
+
+def add_timing_sink(sink: Callable):
+    """Add a callable sink(datasource, stage, seconds) called with the time of every stage."""
+
+    if sink not in _sinks:
+        _sinks.append(sink)
+
+
+def remove_timing_sink(sink: Callable):
+    """Remove a timing sink."""
+
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+def is_timing_enabled() -> bool:
+    """Return True if there is a timing sink."""
+
+    return len(_sinks) > 0
+
+
+def get_stage_timings() -> dict:
+    """Get the p50/p95 stage timings per datasource of the default histogram (see StageTimingHistogram.percentiles)."""
+
+    return _default_histogram.percentiles()
+
+
+def enable_stage_timing():
+    """Record stage timings in the default histogram returned by get_stage_timings()."""
+
+    add_timing_sink(_default_histogram)
+
+
+@contextmanager
+def _timed(name: str):
+    """Time the block and pass the time to the sinks."""
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start)
+
+
+class _NoTiming:
+    """Span used when timing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NO_TIMING = _NoTiming()
+
+
+def timed_stage(name: str):
+    """Context manager timing a stage of the widget being rendered."""
+
+    return _timed(name) if _sinks else _NO_TIMING
+
+
+@contextmanager
+def rendering_datasource(datasource: str):
+    """Set the datasource of the stages timed in the block and time the block as the "total" stage."""
+
+    if not _sinks:
+        yield
+        return
+    stages = {}
+    token = _render.set((datasource, stages))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        total = time.perf_counter() - start
+        _render.reset(token)
+        for stage, seconds in stages.items():
+            _send(datasource, stage, seconds)
+        _send(datasource, "total", total)
+
+
+def _record(stage: str, seconds: float):
+    """Add the time of a stage to the stages of the render or pass it to the sinks if not rendering."""
+
+    render = _render.get()
+    if render is None:
+        _send(None, stage, seconds)
+    else:
+        stages = render[1]
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+def _send(datasource: str, stage: str, seconds: float):
+    """Pass the time of a stage to every sink."""
+
+    for sink in list(_sinks):
+        try:
+            sink(datasource, stage, seconds)
+        except Exception:  # pylint: disable=W0703
+            logging.exception("Timing sink failed")
+
+
+_default_histogram = StageTimingHistogram()
+if os.environ.get("HYDROGEN_WIDGET_TIMING", "") not in ("", "0"):
+    enable_stage_timing()
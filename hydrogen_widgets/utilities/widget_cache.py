@@ -0,0 +1,232 @@
+"""
+    widget_cache.py
+
+    Process level cache of widget responses.
+
+    A widget response only changes when one of the files it was computed from changes.
+    Responses are cached using a key that contains the datasource, user, domain, query
+    parameters and a fingerprint (path, size, modification time) of every input file
+    of the widget declared in the widget registry. A new or updated input file changes
+    the key so a stale response is never returned. Entries are evicted least recently
+    used first when the total size of the cached responses exceeds the configured memory
+    budget in bytes.
+
+    The memory budget defaults to the environment variable HYDROGEN_WIDGET_CACHE_BYTES
+    (256 MB if not set). A budget of 0 disables the cache.
+
+    The same key with the version of the widget is used as the ETag of a response, so
+    clients can ask if a response changed without the widget being rendered.
+
+    get_widget_result returns responses with the NumPy arrays converted to lists. The converted
+    response is kept by the same key in a second cache, so a cache hit does not convert the arrays
+    again. Its memory budget is set by HYDROGEN_WIDGET_JSON_CACHE_BYTES (64 MB if not set).
+"""
+import os
+import glob
+import json
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+from hydrogen_widgets.utilities.widget_registry import get_widget_spec
+from hydrogen_widgets.utilities.widget_json import estimate_response_bytes
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class WidgetCache:
+    """LRU cache of widget responses limited by an estimated size in bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        """Return the cached response for the key or None if it is not cached."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses = self.misses + 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits = self.hits + 1
+            return entry[0]
+
+    def put(self, key: tuple, response: dict, size: int = None):
+        """Add a response to the cache and evict least recently used entries to stay within budget."""
+
+        size = size if size is not None else estimate_response_size(response)
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes = self.total_bytes - self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (response, size)
+            self.total_bytes = self.total_bytes + size
+            self._evict()
+
+    def resize(self, max_bytes: int):
+        """Change the memory budget of the cache, evicting entries if required."""
+
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        """Return the hit/miss counters and memory usage of the cache."""
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _evict(self):
+        """Remove least recently used entries until the cache is within budget."""
+
+        while self._entries and self.total_bytes > self.max_bytes:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.total_bytes = self.total_bytes - size
+            self.evictions = self.evictions + 1
+
+
+def _get_default_cache_bytes() -> int:
+    """Get the cache memory budget from the environment."""
+
+    value = os.environ.get("HYDROGEN_WIDGET_CACHE_BYTES", None)
+    return int(value) if value else DEFAULT_CACHE_BYTES
+
+
+_widget_cache = WidgetCache(_get_default_cache_bytes())
+
+
+def get_widget_cache() -> WidgetCache:
+    """Get the process level widget response cache."""
+
+    return _widget_cache
+
+
+def configure_widget_cache(max_bytes: int):
+    """Set the memory budget in bytes of the process level widget cache. Use 0 to disable the cache."""
+
+    _widget_cache.resize(max_bytes)
+
+
+_json_compatible_cache = WidgetCache(
+    int(os.environ.get("HYDROGEN_WIDGET_JSON_CACHE_BYTES", "") or str(64 * 1024 * 1024))
+)
+
+
+def get_json_compatible_cache() -> WidgetCache:
+    """Get the process level cache of the json compatible form (see to_json_compatible) of cached responses."""
+
+    return _json_compatible_cache
+
+
+def configure_json_compatible_cache(max_bytes: int):
+    """Set the memory budget in bytes of the cache of json compatible responses. Use 0 to disable the cache."""
+
+    _json_compatible_cache.resize(max_bytes)
+
+
+def get_widget_cache_key(
+    datasource: str, domain_path: str, user_id: str, domain_id: str, query_parameters: dict
+) -> tuple:
+    """
+    Get the cache key of a widget response.
+
+    Parameters
+    ----------
+    datasource : str
+        Name of the datasource that identifies the widget.
+    domain_path: str
+        Absolute path of the domain directory.
+    user_id: str
+        User id of the domain.
+    domain_id: str
+        Domain id of the domain.
+    query_parameters: dict
+        Query parameters passed to the widget. May be None.
+    Returns
+    -------
+    tuple
+        The cache key or None if the datasource has no known input files and can not be cached.
+    """
+
+    spec = get_widget_spec(datasource)
+    if spec is None or spec.inputs is None:
+        return None
+    query_parameters = query_parameters if query_parameters else {}
+    normalized_parameters = json.dumps(query_parameters, sort_keys=True, default=str)
+    fingerprints = get_input_file_fingerprints(domain_path, spec.inputs, query_parameters)
+    key = (datasource, user_id, domain_id, domain_path, normalized_parameters, fingerprints)
+    if spec.date_dependent:
+        key = key + (datetime.date.today().isoformat(),)
+    return key
+
+
+def get_widget_etag(cache_key: tuple) -> str:
+    """
+    Get the ETag of the response of a widget cache key.
+    The ETag is a hash of the cache key and the version of the widget or None if the key is None.
+    """
+
+    if cache_key is None:
+        return None
+    spec = get_widget_spec(cache_key[0])
+    version = spec.version if spec is not None else ""
+    return hashlib.sha256(repr((version,) + cache_key).encode("utf-8")).hexdigest()[:32]
+
+
+def get_input_file_fingerprints(
+    domain_path: str, patterns: List[str], query_parameters: dict
+) -> Tuple[tuple]:
+    """Get the (path, size, modification time) of every file matching the input file patterns."""
+
+    result = []
+    for pattern in patterns:
+        pattern = pattern.format_map(_QueryParameterValues(query_parameters))
+        for path in sorted(glob.glob(f"{domain_path}/{pattern}")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            result.append((path[len(domain_path) + 1 :], stat.st_size, stat.st_mtime_ns))
+    return tuple(result)
+
+
+def estimate_response_size(response: dict) -> int:
+    """Estimate the memory used by a response, counting NumPy arrays by the size of their data."""
+
+    return estimate_response_bytes(response)
+
+
+class _QueryParameterValues(dict):
+    """Query parameter values used to format input file patterns. Missing parameters are empty."""
+
+    def __init__(self, query_parameters: dict):
+        super().__init__({k: str(v) for k, v in query_parameters.items()})
+
+    def __missing__(self, key):
+        return ""
@@ -0,0 +1,59 @@
+"""
+    widget_cache_path.py
+
+    Directories of the files the widgets derive from the input files of a domain.
+
+    The forecast summary files, the current conditions history and the observation stores are
+    written to <root>/<user>/<domain> where <root> is the directory set by the environment variable
+    HYDROGEN_WIDGET_CACHE_PATH and <user>/<domain> is the path of the domain in CLIENT_HYDRO_DATA_PATH,
+    so the widgets never write to the input data of a domain. Domains outside CLIENT_HYDRO_DATA_PATH
+    use <root>/_/<hash of the domain path>. The files are not written, and the widgets read the input
+    files instead, if HYDROGEN_WIDGET_CACHE_PATH is not set or the directory is not writable.
+"""
+import os
+import hashlib
+
+_config = {"path": os.environ.get("HYDROGEN_WIDGET_CACHE_PATH", None)}
+
+
+def configure_widget_cache_path(path: str):
+    """Set the root directory of the files derived from the input files or None to not write them."""
+
+    _config["path"] = path
+
+
+def get_widget_cache_path() -> str:
+    """Get the root directory of the files derived from the input files or None if they are not written."""
+
+    return _config["path"]
+
+
+def get_domain_cache_directory(domain_path: str) -> str:
+    """
+    Get the directory of the files derived from the input files of a domain.
+
+    Parameters
+    ----------
+    domain_path: str
+        Path to the domain directory.
+    Returns
+    -------
+    str
+        The directory or None if HYDROGEN_WIDGET_CACHE_PATH is not set. The directory is not
+        created: callers create it and do not write the files if that fails.
+    """
+
+    root = _config["path"]
+    if not root:
+        return None
+    domain_path = os.path.abspath(domain_path)
+    data_path = os.environ.get("CLIENT_HYDRO_DATA_PATH", None)
+    if data_path:
+        try:
+            relative_path = os.path.relpath(domain_path, os.path.abspath(data_path))
+        except ValueError:
+            # The domain is on another drive than the data path
+            relative_path = os.pardir
+        if relative_path != os.curdir and relative_path.split(os.sep)[0] != os.pardir:
+            return os.path.join(root, relative_path)
+    return os.path.join(root, "_", hashlib.sha1(domain_path.encode("utf-8")).hexdigest())
@@ -0,0 +1,279 @@
+"""
+    widget_delta.py
+
+    Delta responses for clients that already hold an older version of a widget response.
+
+    The responses returned with an ETag are kept by ETag in a process level LRU cache of delta
+    bases. When a client that holds the response of an older ETag asks for a delta and the old
+    response is still cached, the new response is returned as the operations that change the old
+    response into the new one if the operations are smaller than the new response:
+
+        {"delta_from": old ETag, "operations": [operation, ...]}
+
+    Each operation has the "path" (list of dict keys and list indexes) of the value it changes:
+
+        {"op": "replace", "path": path, "value": value}                 Replace or add a value.
+        {"op": "remove", "path": path}                                  Remove a dict key.
+        {"op": "cells", "path": path, "indexes": indexes, "values": values}
+                                                                        Replace the values of the cells with the
+                                                                        flat (row major) indexes of an array.
+        {"op": "append", "path": path, "drop": count, "values": values}
+                                                                        Remove count values from the start of a
+                                                                        1D array or list and append the values, for
+                                                                        example new time points of a timeseries.
+
+    Arrays and lists of numbers, dates or strings are compared as arrays, so the dates of a timeseries
+    given as strings are appended like its values.
+
+    apply_widget_delta() applies the operations as the UI does. The memory budget of the cached
+    delta bases is set by the environment variable HYDROGEN_WIDGET_DELTA_CACHE_BYTES (default 64 MB).
+"""
+import os
+import copy
+import numpy as np
+from hydrogen_widgets.utilities.widget_cache import WidgetCache
+from hydrogen_widgets.utilities.widget_json import estimate_response_bytes
+
+# A delta is returned only if its estimated size is at most this fraction of the size of the response
+MAX_DELTA_RATIO = 0.5
+
+# Number of candidate start positions of the new values tried when looking for appended values
+_MAX_APPEND_CANDIDATES = 8
+
+_delta_bases = WidgetCache(int(os.environ.get("HYDROGEN_WIDGET_DELTA_CACHE_BYTES", str(64 * 1024 * 1024))))
+
+
+def get_delta_bases() -> WidgetCache:
+    """Get the process level cache of the responses that can be the base of a delta by ETag."""
+
+    return _delta_bases
+
+
+def configure_delta_bases(max_bytes: int):
+    """Set the memory budget in bytes of the cache of delta bases. Use 0 to disable delta responses."""
+
+    _delta_bases.resize(max_bytes)
+
+
+def remember_delta_base(etag: str, response: dict):
+    """Keep a response returned with an ETag so it can be the base of a delta."""
+
+    if etag is not None and response is not None:
+        _delta_bases.put(etag, response)
+
+
+def get_widget_delta(base_etags: list, response: dict) -> dict:
+    """
+    Get the delta from the response of one of the ETags held by the client to a new response.
+
+    Parameters
+    ----------
+    base_etags: list
+        The ETags of the responses held by the client.
+    response: dict
+        The new response.
+    Returns
+    -------
+    dict
+        The delta response or None if no base response is cached or the delta is not smaller than the response.
+    """
+
+    for base_etag in base_etags:
+        base = _delta_bases.get(base_etag)
+        if base is not None:
+            return compute_widget_delta(base, response, base_etag)
+    return None
+
+
+def compute_widget_delta(base: dict, response: dict, base_etag: str) -> dict:
+    """
+    Compute the delta from a base response to a new response.
+
+    Parameters
+    ----------
+    base: dict
+        The response held by the client.
+    response: dict
+        The new response.
+    base_etag: str
+        The ETag of the base response.
+    Returns
+    -------
+    dict
+        The delta response or None if it is not at most MAX_DELTA_RATIO of the size of the response.
+    """
+
+    operations = []
+    _diff(base, response, [], operations)
+    delta = {"delta_from": base_etag, "operations": operations}
+    if estimate_response_bytes(delta) > MAX_DELTA_RATIO * estimate_response_bytes(response):
+        return None
+    return delta
+
+
+def apply_widget_delta(base: dict, delta: dict) -> dict:
+    """Apply the operations of a delta to a copy of the base response and return the new response."""
+
+    response = copy.deepcopy(base)
+    for operation in delta["operations"]:
+        path = operation["path"]
+        if not path:
+            response = operation["value"]
+            continue
+        parent = response
+        for key in path[:-1]:
+            parent = parent[key]
+        key = path[-1]
+        if operation["op"] == "replace":
+            if isinstance(parent, list) and key == len(parent):
+                parent.append(operation["value"])
+            else:
+                parent[key] = operation["value"]
+        elif operation["op"] == "remove":
+            del parent[key]
+        elif operation["op"] == "cells":
+            values = np.array(parent[key])
+            new_values = np.asarray(operation["values"])
+            if values.dtype.kind in "US":
+                # The new strings may be longer than the strings of the array
+                values = values.astype(object)
+            else:
+                # The new values may not fit the type of the array, e.g. floats in an array of ints
+                values = values.astype(np.result_type(values, new_values), copy=False)
+            values.reshape(-1)[np.asarray(operation["indexes"])] = new_values
+            parent[key] = values
+        elif operation["op"] == "append":
+            values = np.asarray(parent[key])[operation["drop"] :]
+            dtype = None if values.dtype.kind in "USO" else values.dtype
+            parent[key] = np.concatenate([values, np.asarray(operation["values"], dtype=dtype)])
+        else:
+            raise Exception(f"Unknown delta operation '{operation['op']}'.")
+    return response
+
+
+def _diff(base, value, path: list, operations: list):
+    """Append the operations that change the base value into the value."""
+
+    if isinstance(base, dict) and isinstance(value, dict):
+        for key in base:
+            if key not in value:
+                operations.append({"op": "remove", "path": path + [key]})
+        for (key, item) in value.items():
+            if key in base:
+                _diff(base[key], item, path + [key], operations)
+            else:
+                operations.append({"op": "replace", "path": path + [key], "value": item})
+    elif isinstance(base, np.ndarray) or isinstance(value, np.ndarray):
+        _diff_arrays(base, value, path, operations)
+    elif isinstance(base, (list, tuple)) and isinstance(value, (list, tuple)):
+        if _is_array_list(base) and _is_array_list(value):
+            _diff_arrays(base, value, path, operations)
+        elif len(base) == len(value):
+            for (index, (base_item, item)) in enumerate(zip(base, value)):
+                _diff(base_item, item, path + [index], operations)
+        else:
+            operations.append({"op": "replace", "path": path, "value": value})
+    elif not _equal_values(base, value):
+        operations.append({"op": "replace", "path": path, "value": value})
+
+
+def _diff_arrays(base, value, path: list, operations: list):
+    """Append the operations that change the base array into the array."""
+
+    base_array = _as_array(base)
+    array = _as_array(value)
+    if (
+        base_array is None
+        or array is None
+        or base_array.ndim != array.ndim
+        or (base_array.dtype.kind == "U") != (array.dtype.kind == "U")
+    ):
+        if not _equal_values(base, value):
+            operations.append({"op": "replace", "path": path, "value": value})
+        return
+    if base_array.shape == array.shape:
+        indexes = np.flatnonzero(~_equal_arrays(base_array, array))
+        if len(indexes) == 0:
+            return
+        # A timeseries of a rolling window keeps its length and appends the values it drops
+        drop = _find_appended(base_array, array) if array.ndim == 1 else None
+        if drop is None or drop >= len(indexes):
+            operations.append(
+                {"op": "cells", "path": path, "indexes": indexes.astype(np.int32), "values": array.reshape(-1)[indexes]}
+            )
+            return
+    else:
+        drop = _find_appended(base_array, array) if array.ndim == 1 else None
+    if drop is None:
+        operations.append({"op": "replace", "path": path, "value": value})
+    else:
+        operations.append(
+            {"op": "append", "path": path, "drop": drop, "values": array[len(base_array) - drop :]}
+        )
+
+
+def _find_appended(base: np.ndarray, array: np.ndarray) -> int:
+    """Find the number of values dropped from the start of base so the rest of base starts the array, or None."""
+
+    if len(base) == 0:
+        return 0
+    if len(array) == 0:
+        return None
+    candidates = np.flatnonzero(_equal_arrays(base, array[:1]))
+    for drop in candidates[:_MAX_APPEND_CANDIDATES]:
+        overlap = len(base) - drop
+        if overlap <= len(array) and _equal_arrays(base[drop:], array[:overlap]).all():
+            return int(drop)
+    return None
+
+
+def _as_array(value) -> np.ndarray:
+    """Get a list or array of numbers, dates or strings as an array, or None if the values are of other types."""
+
+    try:
+        array = np.asarray(value)
+    except ValueError:
+        return None
+    if array.dtype.kind == "S":
+        return array.astype(str)
+    if array.dtype.kind == "O" and array.ndim == 1 and _is_array_list(array):
+        return _as_array(array.tolist())
+    return array if array.dtype.kind in "biufMU" else None
+
+
+def _is_array_list(value) -> bool:
+    """Return True if a list contains only numbers or only strings."""
+
+    if len(value) == 0:
+        return False
+    if all(isinstance(item, str) for item in value):
+        return True
+    return all(isinstance(item, (int, float)) and not isinstance(item, bool) for item in value)
+
+
+def _equal_arrays(base: np.ndarray, array: np.ndarray) -> np.ndarray:
+    """Compare two arrays of the same shape element by element with NaN equal to NaN."""
+
+    equal = base == array
+    if base.dtype.kind == "f" or array.dtype.kind == "f":
+        equal |= np.isnan(base.astype(np.float64)) & np.isnan(array.astype(np.float64))
+    return equal
+
+
+def _equal_values(base, value) -> bool:
+    """Compare two json values with NaN equal to NaN."""
+
+    if isinstance(base, float) and isinstance(value, float) and np.isnan(base) and np.isnan(value):
+        return True
+    if isinstance(base, np.ndarray) or isinstance(value, np.ndarray):
+        try:
+            return np.array_equal(base, value, equal_nan=True)
+        except TypeError:
+            # NaN is only defined for arrays of numbers
+            return np.array_equal(base, value)
+        except ValueError:
+            return False
+    try:
+        return bool(base == value)
+    except ValueError:
+        return False
@@ -0,0 +1,84 @@
+"""
+    widget_disk_cache.py
+
+    On-disk cache of widget responses shared by all the processes of a machine.
+
+    Responses are stored as json files in the directory set by the environment variable
+    HYDROGEN_WIDGET_CACHE_DIR using the same key as the in-memory widget cache, so a
+    response is only found while the input files of the widget are unchanged.
+    The disk cache is disabled if HYDROGEN_WIDGET_CACHE_DIR is not set.
+"""
+import os
+import json
+import glob
+import hashlib
+import tempfile
+from hydrogen_widgets.utilities.widget_json import to_json_compatible
+
+
+def get_disk_cache_dir() -> str:
+    """Get the directory of the on-disk widget cache or None if the disk cache is disabled."""
+
+    return os.environ.get("HYDROGEN_WIDGET_CACHE_DIR", None)
+
+
+def read_disk_cache(cache_key: tuple) -> dict:
+    """Read the cached response of the widget cache key or return None if it is not cached."""
+
+    path = _get_cache_file_path(cache_key)
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        return None
+
+
+def write_disk_cache(cache_key: tuple, response: dict):
+    """Write the response of the widget cache key and remove responses computed from older input files."""
+
+    path = _get_cache_file_path(cache_key)
+    if path is None:
+        return
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as stream:
+            json.dump(to_json_compatible(response), stream)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    # Remove responses of the same request computed from older versions of the input files
+    request_prefix = os.path.basename(path).split(".")[0]
+    for old_path in glob.glob(f"{directory}/{request_prefix}.*.json"):
+        if old_path != path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+
+def _get_cache_file_path(cache_key: tuple) -> str:
+    """
+    Get the path of the cache file of a widget cache key.
+    The file name is the hash of the request followed by the hash of the input file fingerprints.
+    """
+
+    cache_dir = get_disk_cache_dir()
+    if not cache_dir:
+        return None
+    datasource = cache_key[0]
+    request_hash = _hash(cache_key[:5])
+    inputs_hash = _hash(cache_key[5:])
+    return f"{cache_dir}/{datasource}/{request_hash}.{inputs_hash}.json"
+
+
+def _hash(value) -> str:
+    """Get a stable hash of a tuple of strings and numbers."""
+
+    return hashlib.sha256(repr(value).encode("utf-8")).hexdigest()[:32]
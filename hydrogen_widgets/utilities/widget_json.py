@@ -0,0 +1,176 @@
+"""
+    widget_json.py
+
+    Serialize widget responses containing NumPy arrays to json.
+
+    Widgets may return NumPy arrays (for example heatmap z grids, timeseries values and
+    datetime64 dates) in their responses instead of converting them to lists of Python
+    objects. dumps_widget_response() writes the arrays of numbers, booleans and dates directly
+    into the json byte stream using vectorized NumPy string conversion of blocks of rows, so no
+    Python object is created per value. Floats are written with the shortest repr of their
+    float64 value, the same text as json.dumps of the array as lists. NaN and infinite values
+    are written as null and datetime64 values as ISO date strings. Arrays of strings and
+    objects are converted to lists.
+
+    get_widget_result() returns the responses converted to lists by to_json_compatible() for
+    the callers that serialize the response themselves. get_widget_result_json() returns the
+    json written by dumps_widget_response().
+"""
+import json
+import numpy as np
+
+_NULL = b"null"
+
+# Number of values of an array formatted at a time, which bounds the memory of the formatted values
+_BLOCK_VALUES = 65536
+
+
+def dumps_widget_response(response) -> bytes:
+    """
+    Serialize a widget response to json.
+
+    Parameters
+    ----------
+    response: dict
+        A widget response. Values may be dicts, lists, tuples, strings, numbers, None,
+        NumPy scalars or NumPy arrays.
+    Returns
+    -------
+    bytes
+        The utf-8 encoded json of the response.
+    """
+
+    chunks = []
+    _write_value(response, chunks)
+    return b"".join(chunks)
+
+
+def to_json_compatible(response):
+    """
+    Convert the NumPy arrays and scalars of a widget response to lists and Python values
+    so the response can be serialized with json.dumps. Missing values remain NaN.
+    Dicts and lists without NumPy values are returned as is, not copied.
+    """
+
+    if isinstance(response, dict):
+        converted = {key: to_json_compatible(value) for key, value in response.items()}
+        changed = any(converted[key] is not value for key, value in response.items())
+        return converted if changed else response
+    if isinstance(response, (list, tuple)):
+        converted = [to_json_compatible(value) for value in response]
+        changed = any(new is not old for new, old in zip(converted, response))
+        return converted if changed else response
+    if isinstance(response, np.ndarray):
+        if response.dtype.kind == "M":
+            return np.datetime_as_string(response).tolist()
+        return response.tolist()
+    if isinstance(response, np.datetime64):
+        return str(np.datetime_as_string(response))
+    if isinstance(response, np.generic):
+        return response.item()
+    return response
+
+
+def estimate_response_bytes(response) -> int:
+    """Estimate the memory used by a widget response without serializing it."""
+
+    if isinstance(response, np.ndarray):
+        return response.nbytes
+    if isinstance(response, dict):
+        return 64 + sum(len(str(key)) + estimate_response_bytes(value) for key, value in response.items())
+    if isinstance(response, (list, tuple)):
+        return 56 + sum(estimate_response_bytes(value) for value in response)
+    if isinstance(response, (str, bytes)):
+        return 49 + len(response)
+    return 24
+
+
+def _write_value(value, chunks: list):
+    """Append the json of a value to the list of byte chunks."""
+
+    if isinstance(value, dict):
+        chunks.append(b"{")
+        first = True
+        for key, item in value.items():
+            if not first:
+                chunks.append(b",")
+            first = False
+            chunks.append(json.dumps(str(key)).encode("utf-8"))
+            chunks.append(b":")
+            _write_value(item, chunks)
+        chunks.append(b"}")
+    elif isinstance(value, (list, tuple)):
+        chunks.append(b"[")
+        for index, item in enumerate(value):
+            if index > 0:
+                chunks.append(b",")
+            _write_value(item, chunks)
+        chunks.append(b"]")
+    elif isinstance(value, np.ndarray):
+        _write_array(value, chunks)
+    elif isinstance(value, (float, np.floating)):
+        chunks.append(repr(float(value)).encode("ascii") if np.isfinite(value) else _NULL)
+    elif isinstance(value, np.datetime64):
+        chunks.append(_NULL if np.isnat(value) else json.dumps(str(np.datetime_as_string(value))).encode("ascii"))
+    elif isinstance(value, np.generic):
+        chunks.append(json.dumps(value.item()).encode("utf-8"))
+    else:
+        chunks.append(json.dumps(value).encode("utf-8"))
+
+
+def _write_array(array: np.ndarray, chunks: list):
+    """Append the json of a NumPy array to the list of byte chunks."""
+
+    if isinstance(array, np.ma.MaskedArray):
+        array = np.ma.filled(array.astype(float), np.nan) if array.dtype.kind in "fiu" else array.filled()
+    if array.ndim == 0:
+        _write_value(array[()], chunks)
+    elif array.dtype.kind not in "fiubM" or array.size == 0:
+        _write_value(to_json_compatible(array), chunks)
+    elif array.ndim > 2:
+        chunks.append(b"[")
+        for index in range(array.shape[0]):
+            if index > 0:
+                chunks.append(b",")
+            _write_array(array[index], chunks)
+        chunks.append(b"]")
+    else:
+        rows = array.reshape(-1, array.shape[-1])
+        block_rows = max(1, _BLOCK_VALUES // rows.shape[1])
+        if array.ndim == 2:
+            chunks.append(b"[")
+        for start in range(0, rows.shape[0], block_rows):
+            if start > 0:
+                chunks.append(b",")
+            chunks.append(_format_rows(rows[start : start + block_rows]))
+        if array.ndim == 2:
+            chunks.append(b"]")
+
+
+def _format_rows(rows: np.ndarray) -> bytes:
+    """Format the rows of a 2D array of numbers, booleans or dates as comma separated json arrays."""
+
+    text = _format_values(rows)
+    prefixes = np.zeros(rows.shape, dtype="S1")
+    prefixes[:, 0] = b"["
+    separators = np.full(rows.shape, b",", dtype="S2")
+    separators[:, -1] = b"],"
+    separators[-1, -1] = b"]"
+    text = np.char.add(np.char.add(prefixes, text), separators)
+    # The formatted values are padded with zero bytes to the width of the array
+    characters = text.view(np.uint8)
+    return characters[characters != 0].tobytes()
+
+
+def _format_values(values: np.ndarray) -> np.ndarray:
+    """Format each value of an array of numbers, booleans or dates as json in an array of bytes."""
+
+    kind = values.dtype.kind
+    if kind == "b":
+        return np.where(values, b"true", b"false")
+    if kind in "iu":
+        return values.astype("S21")
+    if kind == "f":
+        return np.where(np.isfinite(values), values.astype(np.float64).astype("S32"), _NULL)
+    dates = np.char.add(np.char.add(b'"', np.datetime_as_string(values).astype("S")), b'"')
+    return np.where(np.isnat(values), _NULL, dates)
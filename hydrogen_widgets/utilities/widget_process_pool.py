@@ -0,0 +1,122 @@
+"""
+    widget_process_pool.py
+
+    Render widgets in a pool of worker processes so CPU bound widgets can use all the cores.
+
+    The worker processes import the modules of all the registered widgets when they start so the
+    first request to a worker does not pay for the imports. A worker returns the response of a
+    widget as rendered, so the NumPy arrays of the response are passed back to the calling
+    process as blocks of bytes instead of pickling large nested lists of floats.
+
+    The number of worker processes defaults to the environment variable HYDROGEN_WIDGET_PROCESSES
+    (the number of cores if not set).
+"""
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_widget_process_pool() -> ProcessPoolExecutor:
+    """Get the process pool used to render widgets, starting the worker processes if needed."""
+
+    global _pool  # pylint: disable=W0603
+
+    with _pool_lock:
+        if _pool is None:
+            processes = os.environ.get("HYDROGEN_WIDGET_PROCESSES", None)
+            _pool = ProcessPoolExecutor(
+                max_workers=int(processes) if processes else os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+            )
+        return _pool
+
+
+def shutdown_widget_process_pool():
+    """Stop the worker processes of the widget process pool."""
+
+    global _pool  # pylint: disable=W0603
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def render_widget_in_process(
+    datasource: str, user_id: str, domain_id: str, query_parameters: dict = None
+) -> dict:
+    """Render the widget of a datasource in a worker process and return the response."""
+
+    future = get_widget_process_pool().submit(
+        _render_widgets, [datasource], user_id, domain_id, query_parameters, _get_data_path()
+    )
+    return future.result()[0]
+
+
+def render_widgets_in_processes(
+    datasource_groups: List[List[str]], user_id: str, domain_id: str, query_parameters: dict = None
+) -> dict:
+    """
+    Render groups of widgets in parallel in the worker processes.
+
+    The widgets of a group are rendered in the same worker process with a shared RenderContext.
+    Returns a dict of datasource to the response of the widget.
+    """
+
+    pool = get_widget_process_pool()
+    data_path = _get_data_path()
+    futures = [
+        (group, pool.submit(_render_widgets, group, user_id, domain_id, query_parameters, data_path))
+        for group in datasource_groups
+    ]
+    result = {}
+    for group, future in futures:
+        for datasource, response in zip(group, future.result()):
+            result[datasource] = response
+    return result
+
+
+def _get_data_path() -> str:
+    """Get the root directory of user domains of the calling process to pass to the worker."""
+
+    return os.environ.get("CLIENT_HYDRO_DATA_PATH", None)
+
+
+def _warm_worker():
+    """Import the modules of the registered widgets when a worker process starts."""
+
+    # pylint: disable=C0415
+    from hydrogen_widgets.utilities.widget_registry import WIDGET_REGISTRY, get_widget_function
+
+    for datasource in list(WIDGET_REGISTRY.keys()):
+        try:
+            get_widget_function(datasource)
+        except Exception:  # pylint: disable=W0703
+            # The widget is imported again (and the error reported) when it is rendered
+            pass
+
+
+def _render_widgets(
+    datasources: List[str], user_id: str, domain_id: str, query_parameters: dict, data_path: str
+) -> List[dict]:
+    """Render widgets in a worker process with a shared RenderContext and return the responses."""
+
+    # pylint: disable=C0415
+    from hydrogen_widgets.utilities.get_widget_result import get_widget_response
+    from hydrogen_widgets.utilities.render_context import RenderContext
+
+    if data_path:
+        os.environ["CLIENT_HYDRO_DATA_PATH"] = data_path
+    result = []
+    with RenderContext(user_id, domain_id) as context:
+        for datasource in datasources:
+            result.append(
+                get_widget_response(datasource, user_id, domain_id, query_parameters, use_cache=False, context=context)
+            )
+    return result
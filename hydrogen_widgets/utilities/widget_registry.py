@@ -0,0 +1,229 @@
+"""
+    widget_registry.py
+
+    Registry of the widgets that can be rendered by get_widget_result.
+
+    Each datasource is mapped to the module and function that renders the widget. The module
+    of a widget is only imported the first time the widget is rendered so the heavy
+    dependencies of the widgets (plotly, xarray, netCDF4, pandas, ...) are not loaded
+    until they are needed.
+
+    Other packages can add widgets using the "hydrogen_widgets.widgets" entry point group.
+    The name of the entry point is the datasource and the value is the render function
+    that accepts the arguments (user_id, domain_id, query_parameters). For example, in setup.cfg:
+
+        [options.entry_points]
+        hydrogen_widgets.widgets =
+            my_datasource = my_package.my_widget:render_my_widget
+"""
+import importlib
+import threading
+from typing import Callable, List, NamedTuple
+from hydrogen_widgets.utilities.render_timing import rendering_datasource
+
+ENTRY_POINT_GROUP = "hydrogen_widgets.widgets"
+
+# Signature styles of widget render functions
+DOMAIN_SIGNATURE = "domain"  # render(user_id, domain_id)
+QUERY_SIGNATURE = "query"  # render(user_id, domain_id, query_parameters)
+
+
+class WidgetSpec(NamedTuple):
+    """Declaration of a widget that can be rendered for a datasource."""
+
+    module: str
+    function: str
+    signature: str = QUERY_SIGNATURE
+    # Input files relative to the domain path. May contain glob wildcards and {name}
+    # placeholders replaced by query parameters. None if the response can not be cached.
+    inputs: List[str] = None
+    # True if the response depends on the current date as well as the input files.
+    date_dependent: bool = False
+    # True if the render function accepts a RenderContext shared by widgets of a dashboard.
+    accepts_context: bool = False
+    # True if the widget watcher should render the widget in the background when an input
+    # file changes. The query parameters are the {name} placeholder values of the input file.
+    prerender: bool = True
+    # Version of the response of the widget. Increment it when a change to the widget changes
+    # the response computed from the same input files so clients do not reuse an old ETag.
+    version: str = "1"
+
+
+WIDGET_REGISTRY = {
+    "current_conditions_heatmap": WidgetSpec(
+        module="hydrogen_widgets.current_conditions_heatmap",
+        function="render_current_conditions_heatmap",
+        inputs=[
+            "current_conditions/current_conditions.*.nc",
+            "domain_files/static_domain_variables.nc",
+        ],
+        version="2",
+    ),
+    "location_map": WidgetSpec(
+        module="hydrogen_widgets.location_map",
+        function="render_location_map",
+        signature=DOMAIN_SIGNATURE,
+        inputs=[
+            "domain_state.json",
+            "domain_files/domain.shp",
+            "domain_files/obs_sites.csv",
+        ],
+    ),
+    "terrain_map": WidgetSpec(
+        module="hydrogen_widgets.terrain_map",
+        function="render_terrain_map",
+        signature=DOMAIN_SIGNATURE,
+        inputs=[
+            "domain_state.json",
+            "domain_files/*.shp",
+            "domain_files/obs_sites.csv",
+        ],
+    ),
+    "terrain_obs_points": WidgetSpec(
+        module="hydrogen_widgets.terrain_obs_points",
+        function="render_terrain_obs_points",
+        inputs=["observations/{site_type}/{site_id}.nc"],
+        date_dependent=True,
+        # The UI also passes the site_name so a pre-rendered response would never be requested
+        prerender=False,
+    ),
+    "forecast_soilmoisture_heatmap": WidgetSpec(
+        module="hydrogen_widgets.forecast_soilmoisture_heatmap",
+        function="render_forecast_soilmoisture_heatmap",
+        inputs=[
+            "domain_state.json",
+            "forecast/{scenario_id}/forecast.*.nc",
+            "domain_files/static_domain_variables.nc",
+        ],
+        accepts_context=True,
+        version="2",
+    ),
+    "forecast_watertable_heatmap": WidgetSpec(
+        module="hydrogen_widgets.forecast_waterdepth_heatmap",
+        function="render_forecast_waterdepth_heatmap",
+        inputs=[
+            "domain_state.json",
+            "forecast/{scenario_id}/forecast.*.nc",
+            "domain_files/static_domain_variables.nc",
+        ],
+        accepts_context=True,
+        version="2",
+    ),
+    "forecast_time_series": WidgetSpec(
+        module="hydrogen_widgets.forecast_timeseries",
+        function="render_forecast_timeseries",
+        inputs=[
+            "forecast/{scenario_id}/forecast.*.nc",
+            "domain_files/static_domain_variables.nc",
+        ],
+        accepts_context=True,
+        version="2",
+    ),
+    "observation_points": WidgetSpec(
+        module="hydrogen_widgets.streamflow_points",
+        function="render_streamflow_points",
+        signature=DOMAIN_SIGNATURE,
+        inputs=[
+            "domain_files/obs_sites.csv",
+            "observations/streamflow/*.nc",
+        ],
+        date_dependent=True,
+    ),
+    "scenario_timeseries": WidgetSpec(
+        module="hydrogen_widgets.scenarios_timeseries",
+        function="render_scenario_timeseries",
+        inputs=[
+            "scenarios/{scenario_id}/*run*",
+            "domain_files/static_domain_variables.nc",
+        ],
+        version="2",
+    ),
+}
+
+_loaded_functions = {}
+_entry_points_loaded = False
+_lock = threading.Lock()
+
+
+def register_widget(datasource: str, spec: WidgetSpec):
+    """Add or replace the widget used to render a datasource."""
+
+    with _lock:
+        WIDGET_REGISTRY[datasource] = spec
+        _loaded_functions.pop(datasource, None)
+
+
+def get_widget_spec(datasource: str) -> WidgetSpec:
+    """Get the widget declaration of a datasource or None if the datasource is not supported."""
+
+    spec = WIDGET_REGISTRY.get(datasource, None)
+    if spec is None and not _entry_points_loaded:
+        _load_entry_points()
+        spec = WIDGET_REGISTRY.get(datasource, None)
+    return spec
+
+
+def get_widget_function(datasource: str) -> Callable:
+    """Import the module of the widget of the datasource if needed and return the render function."""
+
+    function = _loaded_functions.get(datasource, None)
+    if function is None:
+        spec = get_widget_spec(datasource)
+        if spec is None:
+            return None
+        module = importlib.import_module(spec.module)
+        function = getattr(module, spec.function)
+        _loaded_functions[datasource] = function
+    return function
+
+
+def render_widget(
+    datasource: str, user_id: str, domain_id: str, query_parameters: dict = None, context=None
+) -> dict:
+    """
+    Render the widget of the datasource. Returns None if the datasource is not supported.
+    The context is only passed to widgets that accept a RenderContext.
+    """
+
+    spec = get_widget_spec(datasource)
+    if spec is None:
+        return None
+    function = get_widget_function(datasource)
+    kwargs = {"context": context} if context is not None and spec.accepts_context else {}
+    with rendering_datasource(datasource):
+        if spec.signature == DOMAIN_SIGNATURE:
+            return function(user_id, domain_id, **kwargs)
+        return function(user_id, domain_id, query_parameters, **kwargs)
+
+
+def get_datasources() -> List[str]:
+    """Get the names of all the registered datasources including those added by entry points."""
+
+    if not _entry_points_loaded:
+        _load_entry_points()
+    return list(WIDGET_REGISTRY.keys())
+
+
+def _load_entry_points():
+    """Register the widgets declared by other packages using entry points without importing them."""
+
+    global _entry_points_loaded  # pylint: disable=W0603
+
+    with _lock:
+        if _entry_points_loaded:
+            return
+        # pylint: disable=C0415
+        from importlib.metadata import entry_points
+
+        all_entry_points = entry_points()
+        if hasattr(all_entry_points, "select"):
+            group = all_entry_points.select(group=ENTRY_POINT_GROUP)
+        else:
+            group = all_entry_points.get(ENTRY_POINT_GROUP, [])
+        for entry_point in group:
+            if entry_point.name not in WIDGET_REGISTRY:
+                module, _, function = entry_point.value.partition(":")
+                WIDGET_REGISTRY[entry_point.name] = WidgetSpec(
+                    module=module.strip(), function=function.strip()
+                )
+        _entry_points_loaded = True
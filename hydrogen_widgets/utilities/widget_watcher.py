@@ -0,0 +1,216 @@
+"""
+    widget_watcher.py
+
+    Watch the files of user domains and render the widgets that depend on a file in the
+    background when the file is added, changed or removed.
+
+    The rendered responses are stored in the widget caches by get_widget_result, so when the
+    on-disk widget cache is enabled (HYDROGEN_WIDGET_CACHE_DIR) the first request for a widget
+    after new data arrives is served from the cache by any API process.
+
+    Files are found by polling the directories used by the input file patterns of the widget
+    registry. The service can be started from the command line:
+
+        python -m hydrogen_widgets.utilities.widget_watcher --interval 60 user_id/domain_id ...
+"""
+import os
+import re
+import time
+import logging
+import argparse
+import threading
+from typing import List, Tuple
+from hydrogen_common import get_domain_path
+from hydrogen_widgets.utilities.widget_registry import WIDGET_REGISTRY
+from hydrogen_widgets.utilities.get_widget_result import get_widget_result
+
+
+class WidgetWatcher:
+    """Polls the files of user domains and renders the widgets depending on changed files."""
+
+    def __init__(self, domains: List[Tuple[str, str]], interval: float = 60.0, prerender_existing: bool = True):
+        """
+        Create a watcher.
+
+        Parameters
+        ----------
+        domains: List[Tuple[str, str]]
+            List of (user_id, domain_id) of the domains to watch.
+        interval: float
+            Number of seconds between polls of the domain files.
+        prerender_existing: bool
+            If True the first poll renders the widgets of all the existing files.
+        """
+
+        self.domains = list(domains)
+        self.interval = interval
+        self.prerender_existing = prerender_existing
+        self.renders = 0
+        self.errors = 0
+        self._snapshots = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start polling the domains in a background thread."""
+
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="hydrogen_widget_watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def poll(self) -> List[Tuple[str, str, str, dict]]:
+        """
+        Check the files of all the watched domains once and render the widgets depending on
+        changed files. Returns the list of (user_id, domain_id, datasource, query_parameters) rendered.
+        """
+
+        result = []
+        for user_id, domain_id in self.domains:
+            domain_path = get_domain_path(user_id=user_id, domain_directory=domain_id)
+            snapshot = get_domain_file_snapshot(domain_path)
+            previous = self._snapshots.get((user_id, domain_id), None)
+            self._snapshots[(user_id, domain_id)] = snapshot
+            if previous is None:
+                if not self.prerender_existing:
+                    continue
+                previous = {}
+            changed_paths = [
+                path for path in set(snapshot) | set(previous) if snapshot.get(path) != previous.get(path)
+            ]
+            for datasource, query_parameters in get_dependent_widgets(changed_paths, sorted(snapshot)):
+                try:
+                    get_widget_result(datasource, user_id, domain_id, query_parameters)
+                    self.renders = self.renders + 1
+                    result.append((user_id, domain_id, datasource, query_parameters))
+                except Exception:  # pylint: disable=W0703
+                    self.errors = self.errors + 1
+                    logging.exception("Unable to render widget '%s' of domain %s/%s", datasource, user_id, domain_id)
+        return result
+
+    def _run(self):
+        """Poll the domains until stopped."""
+
+        while not self._stop_event.is_set():
+            self.poll()
+            self._stop_event.wait(self.interval)
+
+
+def get_domain_file_snapshot(domain_path: str) -> dict:
+    """Get the (size, modification time) of every file of the domain used as an input of a registered widget."""
+
+    result = {}
+    roots = set()
+    for spec in list(WIDGET_REGISTRY.values()):
+        for pattern in spec.inputs or []:
+            roots.add(pattern.split("/")[0])
+    for root in roots:
+        root_path = f"{domain_path}/{root}"
+        if os.path.isfile(root_path):
+            paths = [root_path]
+        else:
+            paths = [
+                os.path.join(directory, name)
+                for directory, _, names in os.walk(root_path)
+                for name in names
+            ]
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            relative_path = os.path.relpath(path, domain_path).replace(os.sep, "/")
+            result[relative_path] = (stat.st_size, stat.st_mtime_ns)
+    return result
+
+
+def get_dependent_widgets(changed_paths: List[str], domain_paths: List[str] = None) -> List[Tuple[str, dict]]:
+    """
+    Get the widgets that depend on the changed files.
+    Returns a list of (datasource, query_parameters) where the query parameters are the values
+    of the {name} placeholders of the input file pattern matching the changed file. Placeholders
+    of the other input patterns of the widget (for example the scenario_id of a widget depending
+    on domain_files/static_domain_variables.nc) are found by matching those patterns with the
+    domain_paths, the paths of all the files of the domain. A widget is skipped if a placeholder
+    has no value.
+    """
+
+    result = []
+    for datasource, spec in list(WIDGET_REGISTRY.items()):
+        if not spec.prerender:
+            continue
+        patterns = spec.inputs or []
+        names = {name for pattern in patterns for name in _get_pattern_regex(pattern).groupindex}
+        for pattern in patterns:
+            regex = _get_pattern_regex(pattern)
+            for path in changed_paths:
+                match = regex.match(path)
+                if match:
+                    for values in _get_placeholder_values(match.groupdict(), names, patterns, domain_paths or []):
+                        query_parameters = values or None
+                        if (datasource, query_parameters) not in result:
+                            result.append((datasource, query_parameters))
+    return result
+
+
+def _get_placeholder_values(values: dict, names: set, patterns: List[str], domain_paths: List[str]) -> List[dict]:
+    """Get the values of all the placeholder names that extend the values found in a changed path."""
+
+    if names.issubset(values):
+        return [values]
+    result = []
+    for pattern in patterns:
+        regex = _get_pattern_regex(pattern)
+        if not regex.groupindex:
+            continue
+        for path in domain_paths:
+            match = regex.match(path)
+            if match and all(values.get(name, value) == value for name, value in match.groupdict().items()):
+                extended = {**values, **match.groupdict()}
+                if names.issubset(extended) and extended not in result:
+                    result.append(extended)
+    return result
+
+
+_pattern_regexes = {}
+
+
+def _get_pattern_regex(pattern: str) -> re.Pattern:
+    """Convert an input file pattern with glob wildcards and {name} placeholders to a regular expression."""
+
+    regex = _pattern_regexes.get(pattern, None)
+    if regex is None:
+        expression = ""
+        for part in re.split(r"(\{\w+\}|\*)", pattern):
+            if part == "*":
+                expression = expression + "[^/]*"
+            elif part.startswith("{") and part.endswith("}"):
+                expression = expression + f"(?P<{part[1:-1]}>[^/]+)"
+            else:
+                expression = expression + re.escape(part)
+        regex = re.compile(expression + "$")
+        _pattern_regexes[pattern] = regex
+    return regex
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render widgets when the files of user domains change.")
+    parser.add_argument("domains", nargs="+", help="Domains to watch as user_id/domain_id")
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between polls")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    watcher = WidgetWatcher([tuple(domain.split("/", 1)) for domain in args.domains], interval=args.interval)
+    watcher.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        watcher.stop()
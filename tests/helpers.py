@@ -0,0 +1,63 @@
+"""
+    helpers.py
+
+    Test data shared by the unit tests.
+"""
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# Path of the forecast file of the test domain added by copy_test_data relative to the data path
+FORECAST_FILE = os.path.join("test_user", "test_domain", "forecast", "test_average", "forecast.06012022.nc")
+
+
+def copy_test_data(data_path: str, forecast: bool = False) -> str:
+    """
+    Copy the test user data to data_path and set CLIENT_HYDRO_DATA_PATH to data_path, so a test can change
+    the input files of the test domain.
+
+    Parameters
+    ----------
+    data_path: str
+        An empty directory, usually a tempfile.TemporaryDirectory.
+    forecast: bool
+        True to add the forecast file FORECAST_FILE of the test_average scenario created by create_forecast_file.
+    Returns
+    -------
+    str
+        The path of the test domain in data_path.
+    """
+
+    shutil.copytree(
+        os.path.join(os.path.dirname(__file__), "test_data", "test_user"),
+        os.path.join(data_path, "test_user"),
+    )
+    if forecast:
+        forecast_path = os.path.join(data_path, FORECAST_FILE)
+        os.makedirs(os.path.dirname(forecast_path))
+        create_forecast_file(forecast_path)
+    os.environ["CLIENT_HYDRO_DATA_PATH"] = data_path
+    return os.path.join(data_path, "test_user", "test_domain")
+
+
+def create_forecast_file(path: str):
+    """Create a small forecast file with the dimensions of the test domain."""
+
+    (members, times, layers, rows, columns) = (4, 6, 5, 20, 49)
+    rng = np.random.default_rng(0)
+    ds = xr.Dataset(
+        {
+            "saturation": (
+                ("member", "time", "z", "y", "x"),
+                rng.uniform(0.2, 1.0, (members, times, layers, rows, columns)).astype("float32"),
+            ),
+            "water_table_depth": (
+                ("member", "time", "y", "x"),
+                rng.uniform(0.0, 40.0, (members, times, rows, columns)).astype("float32"),
+            ),
+        },
+        coords={"time": pd.date_range("2022-06-01", periods=times, freq="D")},
+    )
+    ds.to_netcdf(path)
@@ -0,0 +1,92 @@
+"""
+    test_active_cells.py
+
+    This is a unit test for the active_cells.py
+"""
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+import xarray as xr
+import dask.array as da
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities.active_cells import ActiveCells, clear_active_cells, get_active_cells
+from hydrogen_widgets.utilities.ensemble_reduction import summarize_chunked_ensemble, summarize_ensemble
+from hydrogen_widgets.scenarios_timeseries import get_spatial_means
+
+# pylint: disable=C0413
+
+
+class TestActiveCells(unittest.TestCase):
+    """Unit test class"""
+
+    def setUp(self):
+        self.mask = np.array([[False, True, True], [True, True, False]])
+        self.active_cells = ActiveCells(self.mask)
+
+    def test_compress_and_scatter(self):
+        """Test that compressed grids are scattered back with NaN inactive cells."""
+
+        grids = np.arange(12, dtype=np.float32).reshape(2, 2, 3)
+        vectors = self.active_cells.compress(grids)
+        self.assertEqual(4, self.active_cells.count)
+        np.testing.assert_array_equal([[1, 2, 3, 4], [7, 8, 9, 10]], vectors)
+        scattered = self.active_cells.scatter(vectors)
+        self.assertEqual(np.float32, scattered.dtype)
+        np.testing.assert_array_equal(grids[:, self.mask], scattered[:, self.mask])
+        self.assertTrue(np.isnan(scattered[:, ~self.mask]).all())
+        masked = self.active_cells.mask_inactive(np.ma.masked_array(grids[0], mask=[[0, 0, 0], [1, 0, 0]]))
+        np.testing.assert_array_equal([[np.nan, 1, 2], [np.nan, 4, np.nan]], masked)
+        with self.assertRaises(Exception):
+            self.active_cells.compress(np.zeros((3, 3)))
+
+    def test_summarize_active_cells(self):
+        """Test that the spatial means of an ensemble are the means of the active cells."""
+
+        rng = np.random.default_rng(3)
+        values = rng.random((3, 5, 2, 3))
+        values[:, :, ~self.mask] = 100.0
+        summary = summarize_ensemble(self.active_cells.compress(values), active_cells=self.active_cells)
+        np.testing.assert_allclose(values[:, :, self.mask].mean(axis=-1), summary.means)
+        np.testing.assert_array_equal(values[0, 0, self.mask], summary.start[self.mask])
+        np.testing.assert_allclose((values[:, 0] - values[:, -1])[:, self.mask], summary.deltas[:, self.mask])
+        self.assertTrue(np.isnan(summary.deltas[:, ~self.mask]).all())
+
+        chunked_values = self.active_cells.compress(da.from_array(values, chunks=(1, 2, 2, 3)))
+        chunked_summary = summarize_chunked_ensemble(chunked_values, active_cells=self.active_cells)
+        for (expected, computed) in zip(summary, chunked_summary):
+            np.testing.assert_allclose(expected, computed)
+
+        forcing = values.copy()
+        forcing[0, 0, 0, 1] = np.nan
+        means = get_spatial_means(forcing, self.active_cells)
+        self.assertAlmostEqual(np.nanmean(forcing[0, 0, self.mask]), means[0, 0])
+        np.testing.assert_allclose(summary.means[1:], means[1:])
+
+    def test_get_active_cells(self):
+        """Test reading the active cells from the porosity or the mask of the static domain variables."""
+
+        clear_active_cells()
+        with tempfile.TemporaryDirectory() as domain_path:
+            self.assertIsNone(get_active_cells(domain_path))
+            os.makedirs(f"{domain_path}/domain_files")
+            path = f"{domain_path}/domain_files/static_domain_variables.nc"
+            porosity = np.full((2, 2, 3), 0.4, dtype=np.float32)
+            porosity[-1, 0, 0] = np.nan
+            porosity[-1, 1, 2] = 0.0
+            xr.Dataset({"porosity": (("z", "y", "x"), porosity)}).to_netcdf(path)
+            active_cells = get_active_cells(domain_path)
+            np.testing.assert_array_equal(self.mask, active_cells.mask)
+            self.assertIs(active_cells, get_active_cells(domain_path))
+
+            mask = np.ones((2, 3), dtype=np.int8)
+            mask[0, 2] = 0
+            xr.Dataset({"porosity": (("z", "y", "x"), porosity), "mask": (("y", "x"), mask)}).to_netcdf(path)
+            os.utime(path, ns=(1600000000000000000, 1600000000000000000))
+            self.assertEqual(5, get_active_cells(domain_path).count)
+            self.assertFalse(get_active_cells(domain_path).mask[0, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
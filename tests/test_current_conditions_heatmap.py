@@ -21,6 +21,8 @@ class TestCurrentConditionsHeatMap(unittest.TestCase):
         os.environ["CLIENT_HYDRO_DATA_PATH"] = env_data_path
         api_result = render_current_conditions_heatmap("test_user", "test_domain")
         self.assertEqual("Y [km]", api_result.get("layout").get("yaxis").get("title"))
+        api_result = render_current_conditions_heatmap("test_user", "test_domain", {"date": "2022-05-27"})
+        self.assertEqual("2022-05-27", api_result["date"])
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,152 @@
+"""
+    test_current_conditions_history.py
+
+    This is a unit test for the current_conditions_history.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+import xarray as xr
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from helpers import copy_test_data
+from hydrogen_widgets.utilities import current_conditions_history
+from hydrogen_widgets.utilities.current_conditions_history import (
+    clear_current_conditions_histories,
+    configure_current_conditions_history,
+    get_current_conditions_history,
+)
+from hydrogen_widgets.utilities.dated_file_index import get_dated_file_index
+from hydrogen_widgets.utilities.widget_cache_path import configure_widget_cache_path
+from hydrogen_widgets.current_conditions_heatmap import render_current_conditions_heatmap
+
+# pylint: disable=C0413
+
+
+class TestCurrentConditionsHistory(unittest.TestCase):
+    """Unit test class"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        data_path = self.temp_dir.name
+        self.domain_path = copy_test_data(data_path)
+        self.current_conditions_path = os.path.join(self.domain_path, "current_conditions")
+        # Add the current conditions of two earlier dates with other values
+        for (date, offset) in [("05252022", 10.0), ("05262022", 20.0)]:
+            self.write_current_conditions(date, offset)
+        self.cache_path = os.path.join(data_path, "widget_cache")
+        configure_widget_cache_path(self.cache_path)
+        clear_current_conditions_histories()
+
+    def tearDown(self):
+        configure_widget_cache_path(None)
+        configure_current_conditions_history(True)
+        clear_current_conditions_histories()
+        self.temp_dir.cleanup()
+
+    def write_current_conditions(self, date: str, offset: float):
+        """Write a current conditions file with the values of the test file plus an offset."""
+
+        with xr.open_dataset(f"{self.current_conditions_path}/current_conditions.05272022.nc") as ds:
+            ds = ds.load()
+        ds["soil_moisture"] = ds["soil_moisture"] + offset
+        ds["water_table_depth"] = ds["water_table_depth"] + offset
+        ds.to_netcdf(f"{self.current_conditions_path}/current_conditions.{date}.nc")
+
+    def test_history(self):
+        """Test that the frames of the history are the grids of the current conditions files."""
+
+        current_conditions_files = sorted(os.listdir(self.current_conditions_path))
+        history = get_current_conditions_history(self.domain_path)
+        files = get_dated_file_index(self.current_conditions_path, "current_conditions.").files
+        self.assertEqual(3, len(history.frame_files))
+        # The history files are written to the widget cache directory, not to the current conditions directory
+        self.assertEqual(
+            os.path.join(self.cache_path, "test_user", "test_domain", "current_conditions", "history"), history.directory
+        )
+        self.assertEqual(current_conditions_files, sorted(os.listdir(self.current_conditions_path)))
+        cube = history.frames("water_table_depth", files)
+        self.assertIsInstance(cube, np.memmap)
+        with xr.open_dataset(files[-1].path) as ds:
+            np.testing.assert_array_equal(ds["water_table_depth"], cube[-1])
+            np.testing.assert_array_equal(ds["soil_moisture"] + 10.0, history.frames("soil_moisture", files[:1])[0])
+
+        # A new file is appended to the history without reading the other files
+        self.write_current_conditions("05282022", 30.0)
+        files = get_dated_file_index(self.current_conditions_path, "current_conditions.").files
+        with mock.patch.object(
+            current_conditions_history,
+            "read_current_conditions_grid",
+            wraps=current_conditions_history.read_current_conditions_grid,
+        ) as read_grid:
+            history = get_current_conditions_history(self.domain_path)
+            self.assertEqual(2, read_grid.call_count)
+        np.testing.assert_allclose(cube[-1] + 30.0, history.frames("water_table_depth", files[-1:])[0])
+
+        # The history files are shared by the processes of the domain
+        clear_current_conditions_histories()
+        with mock.patch.object(current_conditions_history, "read_current_conditions_grid") as read_grid:
+            self.assertEqual(4, len(get_current_conditions_history(self.domain_path).frame_files))
+            read_grid.assert_not_called()
+
+    def test_without_history_files(self):
+        """Test that the history is not used without a widget cache path or file locks."""
+
+        configure_widget_cache_path(None)
+        self.assertIsNone(get_current_conditions_history(self.domain_path))
+        configure_widget_cache_path(self.cache_path)
+        with mock.patch.object(current_conditions_history, "fcntl", None):
+            self.assertIsNone(get_current_conditions_history(self.domain_path))
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_domain_locks(self):
+        """Test that the history of a domain is updated while the history of another domain is updated."""
+
+        other_domain_path = os.path.join(os.path.dirname(self.domain_path), "other_domain")
+        shutil.copytree(self.domain_path, other_domain_path)
+        directory = current_conditions_history.get_current_conditions_history_directory(self.domain_path)
+        get_current_conditions_history(self.domain_path)
+        histories = []
+        with current_conditions_history._directory_locks[directory]:
+            thread = threading.Thread(target=lambda: histories.append(get_current_conditions_history(other_domain_path)))
+            thread.start()
+            thread.join(10)
+            self.assertEqual(1, len(histories))
+        self.assertEqual(3, len(histories[0].frame_files))
+
+    def test_heatmap_dates(self):
+        """Test the current conditions heatmap of a date and of a range of dates."""
+
+        latest = render_current_conditions_heatmap("test_user", "test_domain")
+        result = render_current_conditions_heatmap("test_user", "test_domain", {"date": "2022-06-30"})
+        self.assertEqual("2022-05-27", result["date"])
+        self.assertNotIn("frames", result)
+        for (trace, latest_trace) in zip(result["traces"], latest["traces"]):
+            np.testing.assert_array_equal(latest_trace["z"], trace["z"])
+
+        result = render_current_conditions_heatmap(
+            "test_user", "test_domain", {"start_date": "2022-05-26", "z_encoding": "f4"}
+        )
+        self.assertEqual(["2022-05-26", "2022-05-27"], [frame["name"] for frame in result["frames"]])
+        self.assertEqual(2, len(result["layout"]["sliders"][0]["steps"]))
+        self.assertEqual(2, len(result["frames"][0]["data"]))
+        self.assertEqual(result["frames"][0]["data"][1]["z"], result["traces"][1]["z"])
+
+        configure_current_conditions_history(False)
+        result_without_history = render_current_conditions_heatmap(
+            "test_user", "test_domain", {"start_date": "2022-05-26", "z_encoding": "f4"}
+        )
+        self.assertEqual(result["frames"], result_without_history["frames"])
+        with self.assertRaises(Exception):
+            render_current_conditions_heatmap("test_user", "test_domain", {"date": "2022-05-01"})
+        with self.assertRaises(Exception):
+            render_current_conditions_heatmap("test_user", "test_domain", {"date": "05/27/2022"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+    test_dated_file_index.py
+
+    This is a unit test for the dated_file_index.py
+"""
+import os
+import sys
+import datetime
+import tempfile
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities import dated_file_index
+from hydrogen_widgets.utilities.dated_file_index import get_dated_file_index, clear_dated_file_indexes
+from hydrogen_widgets.utilities.forecast_utilities import get_latest_forecast_file
+
+# pylint: disable=C0413,W0212
+
+def touch(path):
+    """Create an empty file."""
+
+    with open(path, "w"):
+        pass
+
+
+class TestDatedFileIndex(unittest.TestCase):
+    """Unit test class"""
+
+    def setUp(self):
+        clear_dated_file_indexes()
+
+    def test_queries(self):
+        """Test the latest, nearest and range queries."""
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name in [
+                "forecast.06012022.nc",
+                "forecast.05202022.nc",
+                "forecast.12312021.nc",
+                "forecast.badname.nc",
+                "forecast.06052022.txt",
+                "other.06302022.nc",
+            ]:
+                touch(f"{directory}/{name}")
+            index = get_dated_file_index(directory, "forecast.")
+            self.assertEqual(3, len(index))
+            self.assertEqual("forecast.06012022.nc", index.latest().name)
+            self.assertEqual(f"{directory}/forecast.06012022.nc", index.latest().path)
+            self.assertEqual("forecast.05202022.nc", index.nearest(datetime.date(2022, 5, 25)).name)
+            self.assertEqual("forecast.06012022.nc", index.nearest(datetime.date(2022, 5, 28)).name)
+            self.assertEqual("forecast.12312021.nc", index.nearest(datetime.date(2020, 1, 1)).name)
+            self.assertEqual("forecast.05202022.nc", index.on_or_before(datetime.date(2022, 5, 31)).name)
+            self.assertIsNone(index.on_or_before(datetime.date(2021, 1, 1)))
+            names = [f.name for f in index.between(datetime.date(2022, 1, 1), datetime.date(2022, 6, 1))]
+            self.assertEqual(["forecast.05202022.nc", "forecast.06012022.nc"], names)
+            self.assertEqual("forecast.06012022.nc", get_latest_forecast_file(directory))
+
+    def test_invalidation(self):
+        """Test that the index is cached until the directory changes."""
+
+        with tempfile.TemporaryDirectory() as directory:
+            touch(f"{directory}/current_conditions.05272022.nc")
+            old_time = 1600000000
+            os.utime(directory, (old_time, old_time))
+            index = get_dated_file_index(directory, "current_conditions.")
+            self.assertIs(index, get_dated_file_index(directory, "current_conditions."))
+
+            touch(f"{directory}/current_conditions.05282022.nc")
+            os.utime(directory, (old_time + 10, old_time + 10))
+            new_index = get_dated_file_index(directory, "current_conditions.")
+            self.assertIsNot(index, new_index)
+            self.assertEqual(datetime.date(2022, 5, 28), new_index.latest().date)
+
+    def test_recently_modified_directory(self):
+        """Test that the index of a directory modified during the scan is not trusted."""
+
+        with tempfile.TemporaryDirectory() as directory:
+            touch(f"{directory}/forecast.06012022.nc")
+            index = get_dated_file_index(directory, "forecast.")
+            self.assertIsNone(dated_file_index._indexes[(directory, "forecast.", ".nc", "%m%d%Y")][0])
+            self.assertIsNot(index, get_dated_file_index(directory, "forecast."))
+
+
+if __name__ == "__main__":
+    unittest.main()
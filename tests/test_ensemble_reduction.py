@@ -0,0 +1,77 @@
+"""
+    test_ensemble_reduction.py
+
+    This is a unit test for the ensemble_reduction.py
+"""
+import os
+import sys
+import unittest
+import numpy as np
+import dask.array as da
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities.ensemble_reduction import (
+    summarize_chunked_ensemble,
+    summarize_ensemble,
+    top_layer_soil_moisture,
+)
+
+# pylint: disable=C0413
+
+
+class TestEnsembleReduction(unittest.TestCase):
+    """Unit test class"""
+
+    def test_summarize_ensemble(self):
+        """Test the reductions of an ensemble with a member count other than 4."""
+
+        rng = np.random.default_rng(1)
+        values = rng.random((6, 5, 3, 4)).astype(np.float32)
+        values[2, -1, 1, 1] = np.nan
+        summary = summarize_ensemble(values)
+        self.assertEqual(6, summary.members)
+        np.testing.assert_array_equal(values[0][0], summary.start)
+        for member in range(6):
+            delta = np.nan_to_num(values[member][0] - values[member][-1])
+            np.testing.assert_allclose(delta, summary.deltas[member])
+            mean = np.nan_to_num(values[member].sum(axis=-1).sum(axis=-1) / 12)
+            np.testing.assert_allclose(mean, summary.means[member], rtol=1e-6)
+            np.testing.assert_allclose(mean - mean[0], summary.mean_changes()[member], rtol=1e-6, atol=1e-7)
+        self.assertEqual(0, summary.deltas[2, 1, 1])
+        self.assertEqual(0, summary.means[2, -1])
+        boundary_summary = summarize_ensemble(values[:, [0, -1]], means=False)
+        self.assertIsNone(boundary_summary.means)
+        self.assertEqual(6, boundary_summary.members)
+        np.testing.assert_array_equal(summary.deltas, boundary_summary.deltas)
+
+    def test_top_layer_soil_moisture(self):
+        """Test the soil moisture of the top layer."""
+
+        saturation = np.full((2, 3, 4, 2, 2), 0.5)
+        saturation[1, 2, -1, 0, 0] = np.nan
+        porosity = np.ones((4, 2, 2))
+        porosity[-1] = 0.4
+        soil_moisture = top_layer_soil_moisture(saturation, porosity)
+        self.assertEqual((2, 3, 2, 2), soil_moisture.shape)
+        self.assertAlmostEqual(0.2, soil_moisture[0, 0, 1, 1])
+        self.assertEqual(0, soil_moisture[1, 2, 0, 0])
+        self.assertEqual(0.5, saturation[0, 0, -1, 0, 0])
+
+    def test_summarize_chunked_ensemble(self):
+        """Test that the chunk by chunk reductions are the same as the reductions of the loaded ensemble."""
+
+        rng = np.random.default_rng(2)
+        saturation = rng.random((3, 7, 2, 5, 4)).astype(np.float32)
+        saturation[1, 3, -1, 2, 2] = np.nan
+        porosity = rng.random((2, 5, 4)).astype(np.float32)
+        expected = summarize_ensemble(top_layer_soil_moisture(saturation, porosity))
+        chunked_saturation = da.from_array(saturation, chunks=(1, 2, 1, 5, 4))
+        chunked_porosity = da.from_array(porosity, chunks=(1, 5, 4))
+        summary = summarize_chunked_ensemble(top_layer_soil_moisture(chunked_saturation, chunked_porosity))
+        self.assertEqual(3, summary.members)
+        for (expected_values, values) in zip(expected, summary):
+            self.assertIsInstance(values, np.ndarray)
+            np.testing.assert_allclose(expected_values, values, rtol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
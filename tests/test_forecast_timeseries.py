@@ -5,8 +5,11 @@
 """
 import os
 import sys
+import tempfile
 import unittest
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from helpers import copy_test_data
 from hydrogen_widgets.forecast_timeseries import render_forecast_timeseries
 
 # pylint: disable=C0413
@@ -17,13 +20,14 @@ class TestForecastWaterDepthHeatmap(unittest.TestCase):
     def test_widget(self):
         """Test the widget."""
 
-        env_data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "test_data"))
-        os.environ["CLIENT_HYDRO_DATA_PATH"] = env_data_path
-        test_query_parameters = {
-            "scenario_id": "test_average",
-        }
-        api_result = render_forecast_timeseries("test_user", "test_domain", test_query_parameters)
-        self.assertEqual(2, len(api_result.get("subplots")));
+        # The test data has no forecast, so the widget renders a copy with a generated forecast file
+        with tempfile.TemporaryDirectory() as data_path:
+            copy_test_data(data_path, forecast=True)
+            test_query_parameters = {
+                "scenario_id": "test_average",
+            }
+            api_result = render_forecast_timeseries("test_user", "test_domain", test_query_parameters)
+            self.assertEqual(2, len(api_result.get("subplots")));
 
 
 if __name__ == "__main__":
@@ -0,0 +1,173 @@
+"""
+    test_forecast_utilities.py
+
+    This is a unit test for the forecast_utilities.py
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from helpers import FORECAST_FILE, copy_test_data
+from hydrogen_widgets.utilities.render_context import RenderContext
+from hydrogen_widgets.utilities import forecast_utilities
+from hydrogen_widgets.utilities.forecast_summary import configure_forecast_summary_files, get_forecast_summary_path
+from hydrogen_widgets.utilities.widget_cache_path import configure_widget_cache_path
+from hydrogen_widgets.utilities.forecast_utilities import (
+    configure_forecast_streaming,
+    get_forecast_heatmap_grids,
+    get_forecast_soil_moisture_summary,
+    get_forecast_summary,
+    get_forecast_water_table_depth_summary,
+)
+
+# pylint: disable=C0413
+
+
+class TestForecastUtilities(unittest.TestCase):
+    """Unit test class"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        data_path = self.temp_dir.name
+        self.domain_path = copy_test_data(data_path, forecast=True)
+        self.forecast_file = os.path.join(data_path, FORECAST_FILE)
+        self.forecast_path = os.path.dirname(self.forecast_file)
+        self.cache_path = os.path.join(data_path, "widget_cache")
+        configure_widget_cache_path(self.cache_path)
+
+    def tearDown(self):
+        configure_widget_cache_path(None)
+        configure_forecast_summary_files(True)
+        configure_forecast_streaming(None)
+        self.temp_dir.cleanup()
+
+    def test_summary_file(self):
+        """Test that the forecast summary is written to a summary file and read from it until the forecast changes."""
+
+        forecast_directory_mtime = os.stat(self.forecast_path).st_mtime_ns
+        with RenderContext("test_user", "test_domain") as context:
+            summary = get_forecast_summary(context, "test_average")
+        summary_path = get_forecast_summary_path(self.domain_path, self.forecast_file)
+        self.assertEqual(
+            os.path.join(self.cache_path, "test_user", "test_domain", "forecast", "test_average", "forecast.06012022.summary.npz"),
+            summary_path,
+        )
+        self.assertTrue(os.path.exists(summary_path))
+        # The forecast directory is not changed
+        self.assertEqual(["forecast.06012022.nc"], os.listdir(self.forecast_path))
+        self.assertEqual(forecast_directory_mtime, os.stat(self.forecast_path).st_mtime_ns)
+        self.assertEqual(6, len(summary.times))
+        self.assertEqual((4, 6), summary.soil_moisture.means.shape)
+
+        with mock.patch.object(forecast_utilities, "get_forecast_dataset") as get_forecast_dataset:
+            with RenderContext("test_user", "test_domain") as context:
+                summary_from_file = get_forecast_summary(context, "test_average")
+                water_table_depth = get_forecast_water_table_depth_summary(context, "test_average")
+                self.assertIs(summary_from_file.water_table_depth, water_table_depth)
+            self.assertEqual(0, get_forecast_dataset.call_count)
+        np.testing.assert_array_equal(summary.times, summary_from_file.times)
+        for (values, values_from_file) in zip(summary.soil_moisture, summary_from_file.soil_moisture):
+            np.testing.assert_array_equal(values, values_from_file)
+
+        os.utime(self.forecast_file, ns=(1600000000000000000, 1600000000000000000))
+        with mock.patch.object(
+            forecast_utilities, "get_forecast_dataset", wraps=forecast_utilities.get_forecast_dataset
+        ) as get_forecast_dataset:
+            with RenderContext("test_user", "test_domain") as context:
+                get_forecast_summary(context, "test_average")
+            self.assertLess(0, get_forecast_dataset.call_count)
+
+    def test_summary_file_without_cache_path(self):
+        """Test that no summary file is written if the widget cache path is not set or not writable."""
+
+        with open(os.path.join(self.temp_dir.name, "file"), "w", encoding="utf-8") as stream:
+            stream.write("not a directory")
+        for cache_path in [None, os.path.join(self.temp_dir.name, "file")]:
+            configure_widget_cache_path(cache_path)
+            with RenderContext("test_user", "test_domain") as context:
+                summary = get_forecast_summary(context, "test_average")
+            self.assertEqual((4, 6), summary.water_table_depth.means.shape)
+            self.assertEqual(["forecast.06012022.nc"], os.listdir(self.forecast_path))
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_summary_file_without_means(self):
+        """Test that the heatmap summaries read only the first and last times and add them to the summary file."""
+
+        with mock.patch.object(
+            forecast_utilities, "_compute_soil_moisture_summary", wraps=forecast_utilities._compute_soil_moisture_summary
+        ) as compute_summary:
+            with RenderContext("test_user", "test_domain") as context:
+                summary = get_forecast_soil_moisture_summary(context, "test_average", means=False)
+            compute_summary.assert_called_once_with(context, "test_average", False)
+        self.assertIsNone(summary.means)
+        with np.load(get_forecast_summary_path(self.domain_path, self.forecast_file)) as npz:
+            self.assertEqual(
+                ["fingerprint", "soil_moisture_deltas", "soil_moisture_start", "times", "version"], sorted(npz.files)
+            )
+
+        # The heatmap summary is read from the summary file and the means are added when they are needed
+        with mock.patch.object(forecast_utilities, "get_forecast_dataset") as get_forecast_dataset:
+            with RenderContext("test_user", "test_domain") as context:
+                summary_from_file = get_forecast_soil_moisture_summary(context, "test_average", means=False)
+                self.assertEqual(6, len(forecast_utilities.get_forecast_times(context, "test_average")))
+            get_forecast_dataset.assert_not_called()
+        np.testing.assert_array_equal(summary.deltas, summary_from_file.deltas)
+        with RenderContext("test_user", "test_domain") as context:
+            full_summary = get_forecast_soil_moisture_summary(context, "test_average")
+        self.assertEqual((4, 6), full_summary.means.shape)
+        with RenderContext("test_user", "test_domain") as context:
+            summary_from_file = get_forecast_soil_moisture_summary(context, "test_average", means=False)
+        np.testing.assert_array_equal(full_summary.means, summary_from_file.means)
+
+    def test_lazy_heatmap_grids(self):
+        """Test that the lazy heatmap grids are read from the summary file without reading the forecast."""
+
+        with RenderContext("test_user", "test_domain") as context:
+            grids = get_forecast_heatmap_grids(context, "test_average", "water_table_depth")
+        self.assertEqual(5, len(grids))
+        with mock.patch.object(forecast_utilities, "get_forecast_dataset") as get_forecast_dataset:
+            with RenderContext("test_user", "test_domain") as context:
+                lazy_grids = get_forecast_heatmap_grids(context, "test_average", "water_table_depth", lazy=True)
+                self.assertEqual(5, len(lazy_grids))
+                for (grid, lazy_grid) in zip(grids, lazy_grids):
+                    np.testing.assert_array_equal(grid, lazy_grid())
+            get_forecast_dataset.assert_not_called()
+
+    def test_summaries_without_means(self):
+        """Test that the summaries read from the first and last times match the summaries of all the times."""
+
+        configure_forecast_summary_files(False)
+        for get_summary in [get_forecast_soil_moisture_summary, get_forecast_water_table_depth_summary]:
+            with RenderContext("test_user", "test_domain") as context:
+                summary = get_summary(context, "test_average", means=False)
+                self.assertIsNone(summary.means)
+                self.assertEqual(4, summary.members)
+            with RenderContext("test_user", "test_domain") as context:
+                full_summary = get_summary(context, "test_average")
+                self.assertEqual((4, 6), full_summary.means.shape)
+                self.assertIs(full_summary, get_summary(context, "test_average", means=False))
+            np.testing.assert_array_equal(full_summary.start, summary.start)
+            np.testing.assert_array_equal(full_summary.deltas, summary.deltas)
+
+    def test_summaries_without_active_cells(self):
+        """Test the summaries of a domain without active cells with and without streaming."""
+
+        configure_forecast_summary_files(False)
+        with RenderContext("test_user", "test_domain") as context:
+            summary = get_forecast_water_table_depth_summary(context, "test_average")
+        for streaming in [False, True]:
+            configure_forecast_streaming(streaming)
+            with mock.patch.object(forecast_utilities, "get_active_cells", return_value=None):
+                for get_summary in [get_forecast_soil_moisture_summary, get_forecast_water_table_depth_summary]:
+                    with RenderContext("test_user", "test_domain") as context:
+                        summary_without_active_cells = get_summary(context, "test_average")
+                    self.assertEqual(summary.deltas.shape, summary_without_active_cells.deltas.shape)
+                    self.assertEqual((4, 6), summary_without_active_cells.means.shape)
+
+
+if __name__ == "__main__":
+    unittest.main()
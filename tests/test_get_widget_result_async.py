@@ -0,0 +1,85 @@
+"""
+    test_get_widget_result_async.py
+
+    This is a unit test for the get_widget_result_async.py
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities.widget_registry import WidgetSpec, WIDGET_REGISTRY, register_widget
+from hydrogen_widgets.utilities.get_widget_result_async import (
+    get_widget_result_async,
+    get_async_render_stats,
+    configure_async_rendering,
+)
+
+# pylint: disable=C0413
+
+_running = {"now": 0, "max": 0}
+_running_lock = threading.Lock()
+
+
+def render_slow_widget(user_id, domain_id, query_parameters):
+    """Widget used to test the concurrency limits."""
+
+    with _running_lock:
+        _running["now"] = _running["now"] + 1
+        _running["max"] = max(_running["max"], _running["now"])
+    time.sleep(query_parameters.get("seconds", 0.1))
+    with _running_lock:
+        _running["now"] = _running["now"] - 1
+    return {"traces": [], "layout": {}}
+
+
+class TestGetWidgetResultAsync(unittest.TestCase):
+    """Unit test class"""
+
+    def setUp(self):
+        register_widget("slow_widget", WidgetSpec(module=__name__, function="render_slow_widget"))
+
+    def tearDown(self):
+        del WIDGET_REGISTRY["slow_widget"]
+        configure_async_rendering(max_workers=4, max_per_domain=2)
+
+    def test_widget(self):
+        """Test the widget."""
+
+        env_data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "test_data"))
+        os.environ["CLIENT_HYDRO_DATA_PATH"] = env_data_path
+        api_result = asyncio.run(get_widget_result_async("location_map", "test_user", "test_domain"))
+        self.assertEqual("usa", api_result.get("layout").get("geo").get("scope"))
+
+    def test_domain_limit(self):
+        """Test that renders of one domain are limited and the other requests are queued."""
+
+        configure_async_rendering(max_workers=4, max_per_domain=1)
+        _running["max"] = 0
+
+        async def run_requests():
+            tasks = [
+                asyncio.ensure_future(get_widget_result_async("slow_widget", "u", "d", {"seconds": 0.1}))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0.05)
+            stats = get_async_render_stats()
+            await asyncio.gather(*tasks)
+            return stats
+
+        stats = asyncio.run(run_requests())
+        self.assertEqual(1, _running["max"])
+        self.assertEqual(1, stats["running"])
+        self.assertEqual(2, stats["queued"])
+        self.assertEqual(0, get_async_render_stats()["queued"])
+
+    def test_timeout(self):
+        """Test the request timeout."""
+
+        with self.assertRaises(TimeoutError):
+            asyncio.run(get_widget_result_async("slow_widget", "u", "d", {"seconds": 0.5}, timeout=0.1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+    test_heatmap_pyramid.py
+
+    This is a unit test for the heatmap_pyramid.py
+"""
+import os
+import sys
+import unittest
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities.heatmap_pyramid import (
+    HeatmapPyramid,
+    clear_heatmap_pyramids,
+    get_heatmap_values,
+    get_heatmap_view,
+)
+from hydrogen_widgets.current_conditions_heatmap import render_current_conditions_heatmap
+
+# pylint: disable=C0413
+
+
+class TestHeatmapPyramid(unittest.TestCase):
+    """Unit test class"""
+
+    def setUp(self):
+        clear_heatmap_pyramids()
+
+    def test_levels(self):
+        """Test the NaN aware means of the levels of a pyramid."""
+
+        grid = np.arange(15, dtype=np.float32).reshape(3, 5)
+        grid[0, 0] = np.nan
+        grid[2, 4] = np.nan
+        pyramid = HeatmapPyramid(grid)
+        level1 = pyramid.level(1)
+        self.assertEqual((2, 3), level1.shape)
+        self.assertEqual(np.float32, level1.dtype)
+        self.assertAlmostEqual((1 + 5 + 6) / 3, level1[0, 0], places=5)
+        self.assertAlmostEqual((10 + 11) / 2, level1[1, 0], places=5)
+        self.assertAlmostEqual((4 + 9) / 2, level1[0, 2], places=5)
+        self.assertTrue(np.isnan(level1[1, 2]))
+        # The mean of a level is weighted by the number of values of the cells of the previous level
+        self.assertAlmostEqual(np.nanmean(grid), pyramid.level(3)[0, 0], places=5)
+        masked = np.ma.masked_array([[1.0, 100.0], [3.0, 5.0]], mask=[[False, True], [False, False]])
+        self.assertAlmostEqual(3.0, HeatmapPyramid(masked).level(1)[0, 0])
+
+    def test_view(self):
+        """Test the window and level of detail returned for a view."""
+
+        self.assertIsNone(get_heatmap_view({"z_encoding": "f4"}))
+        with self.assertRaises(Exception):
+            get_heatmap_view({"width": "wide"})
+        grid = np.ones((100, 300))
+        values = get_heatmap_values(("grid",), grid, None)
+        self.assertEqual((100, 300), values["z"].shape)
+        self.assertNotIn("dx", values)
+
+        values = get_heatmap_values(("grid",), grid, get_heatmap_view({"width": "100", "height": "100"}))
+        self.assertEqual((25, 75), values["z"].shape)
+        self.assertEqual(4, values["dx"])
+        self.assertEqual(1.5, values["x0"])
+
+        view = get_heatmap_view({"x_min": 100, "x_max": 149, "y_min": -10, "y_max": 19, "width": 30})
+        values = get_heatmap_values(("grid",), grid, view)
+        self.assertEqual((10, 25), values["z"].shape)
+        self.assertEqual(2, values["dy"])
+        self.assertEqual(100.5, values["x0"])
+        self.assertEqual(0.5, values["y0"])
+
+    def test_current_conditions_heatmap(self):
+        """Test the current conditions heatmap with a view."""
+
+        env_data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "test_data"))
+        os.environ["CLIENT_HYDRO_DATA_PATH"] = env_data_path
+        api_result = render_current_conditions_heatmap("test_user", "test_domain")
+        view_result = render_current_conditions_heatmap(
+            "test_user", "test_domain", {"x_min": "10", "x_max": "19", "y_min": "5", "y_max": "14"}
+        )
+        for trace, view_trace in zip(api_result["traces"], view_result["traces"]):
+            np.testing.assert_array_equal(np.array(trace["z"])[5:15, 10:20], view_trace["z"])
+            self.assertEqual(10, view_trace["x0"])
+            self.assertEqual(5, view_trace["y0"])
+        small_result = render_current_conditions_heatmap("test_user", "test_domain", {"width": 10, "height": 10})
+        self.assertEqual((3, 7), small_result["traces"][0]["z"].shape)
+
+
+if __name__ == "__main__":
+    unittest.main()
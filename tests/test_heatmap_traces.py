@@ -0,0 +1,76 @@
+"""
+    test_heatmap_traces.py
+
+    This is a unit test for the heatmap_traces.py
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from helpers import copy_test_data
+from hydrogen_widgets.utilities import forecast_utilities
+from hydrogen_widgets.utilities.heatmap_traces import get_trace_loading
+from hydrogen_widgets.forecast_soilmoisture_heatmap import render_forecast_soilmoisture_heatmap
+from hydrogen_widgets.forecast_waterdepth_heatmap import render_forecast_waterdepth_heatmap
+
+# pylint: disable=C0413
+
+
+class TestHeatmapTraces(unittest.TestCase):
+    """Unit test class"""
+
+    def test_trace_loading(self):
+        """Test the lazy_traces and trace_index query parameters."""
+
+        self.assertEqual((False, None), get_trace_loading(None))
+        self.assertEqual((True, 2), get_trace_loading({"lazy_traces": "true", "trace_index": "2"}))
+        with self.assertRaises(Exception):
+            get_trace_loading({"trace_index": "first"})
+
+    def test_lazy_forecast_heatmap(self):
+        """Test the stubs of a lazy forecast heatmap and fetching a trace by index."""
+
+        with tempfile.TemporaryDirectory() as data_path:
+            copy_test_data(data_path, forecast=True)
+
+            query_parameters = {"scenario_id": "test_average"}
+            api_result = render_forecast_soilmoisture_heatmap("test_user", "test_domain", query_parameters)
+            lazy_result = render_forecast_soilmoisture_heatmap(
+                "test_user", "test_domain", {**query_parameters, "lazy_traces": "1"}
+            )
+            self.assertEqual(api_result["layout"], lazy_result["layout"])
+            self.assertEqual(5, len(lazy_result["traces"]))
+            np.testing.assert_array_equal(api_result["traces"][0]["z"], lazy_result["traces"][0]["z"])
+            for index, trace in enumerate(lazy_result["traces"][1:], 1):
+                self.assertNotIn("z", trace)
+                self.assertEqual({"lazy": True, "trace_index": index}, {k: trace[k] for k in ["lazy", "trace_index"]})
+
+            trace_result = render_forecast_soilmoisture_heatmap(
+                "test_user", "test_domain", {**query_parameters, "trace_index": "3"}
+            )
+            self.assertEqual(3, trace_result["trace_index"])
+            self.assertEqual(1, len(trace_result["traces"]))
+            self.assertEqual(api_result["traces"][3]["colorbar"], trace_result["traces"][0]["colorbar"])
+            np.testing.assert_array_equal(api_result["traces"][3]["z"], trace_result["traces"][0]["z"])
+            with self.assertRaises(Exception):
+                render_forecast_soilmoisture_heatmap("test_user", "test_domain", {**query_parameters, "trace_index": 5})
+
+            # Without a summary file only the members of the traces returned with values are read
+            for render in [render_forecast_soilmoisture_heatmap, render_forecast_waterdepth_heatmap]:
+                api_result = render("test_user", "test_domain", query_parameters)
+                for (parameters, members) in [({"lazy_traces": "1"}, [[0]]), ({"trace_index": "3"}, [[2]])]:
+                    with mock.patch.object(
+                        forecast_utilities, "_summarize_by_member", wraps=forecast_utilities._summarize_by_member
+                    ) as summarize_by_member:
+                        result = render("test_user", "test_domain", {**query_parameters, **parameters})
+                    self.assertEqual(members, [call.args[4] for call in summarize_by_member.call_args_list])
+                    index = result.get("trace_index", 0)
+                    np.testing.assert_array_equal(api_result["traces"][index]["z"], result["traces"][0]["z"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+    test_heatmap_utilities.py
+
+    This is a unit test for the heatmap_utilities.py
+"""
+import os
+import sys
+import base64
+import unittest
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities.heatmap_utilities import get_z_values
+from hydrogen_widgets.current_conditions_heatmap import render_current_conditions_heatmap
+
+# pylint: disable=C0413
+
+def decode_typed_array(z_values):
+    """Decode a plotly.js typed array."""
+
+    shape = [int(n) for n in z_values["shape"].split(",")]
+    data = base64.b64decode(z_values["bdata"])
+    return np.frombuffer(data, dtype="<" + z_values["dtype"]).reshape(shape)
+
+
+class TestHeatmapUtilities(unittest.TestCase):
+    """Unit test class"""
+
+    def test_typed_array(self):
+        """Test encoding z values as a typed array."""
+
+        grid = np.array([[1.5, np.nan, 3.0], [4.0, 5.0, 6.25]])
+        z_values = get_z_values(grid, "f4")
+        self.assertEqual("f4", z_values["dtype"])
+        self.assertEqual("2, 3", z_values["shape"])
+        decoded = decode_typed_array(z_values)
+        np.testing.assert_array_equal(grid.astype("float32"), decoded)
+        self.assertEqual([4.0, 5.0, 6.25], get_z_values(grid)[1].tolist())
+        with self.assertRaises(Exception):
+            get_z_values(grid, "u9")
+
+    def test_quantized_array(self):
+        """Test encoding z values as quantized codes with a scale and offset."""
+
+        grid = np.ma.masked_array(
+            [[0.25, np.nan, 0.5], [0.3, 0.45, 0.1]], mask=[[False, False, False], [False, False, True]]
+        )
+        for z_encoding, dtype, sentinel in [("u8", "u1", 255), ("u16", "u2", 65535)]:
+            z_values = get_z_values(grid, z_encoding)
+            self.assertEqual(dtype, z_values["dtype"])
+            self.assertEqual(sentinel, z_values["nan"])
+            codes = decode_typed_array(z_values)
+            self.assertEqual([sentinel, sentinel], [codes[0, 1], codes[1, 2]])
+            self.assertEqual([0, sentinel - 1], [codes[0, 0], codes[0, 2]])
+            decoded = z_values["offset"] + z_values["scale"] * codes.astype(float)
+            np.testing.assert_allclose([0.3, 0.45], decoded[1, :2], atol=z_values["scale"] / 2)
+        constant = get_z_values(np.full((2, 2), 7.0), "u8")
+        self.assertEqual(7.0, constant["offset"])
+        self.assertEqual([0], np.unique(decode_typed_array(constant)).tolist())
+        self.assertEqual([255], np.unique(decode_typed_array(get_z_values(np.full((2, 2), np.nan), "u8"))).tolist())
+
+    def test_current_conditions_heatmap(self):
+        """Test the current conditions heatmap with typed array z values."""
+
+        env_data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "test_data"))
+        os.environ["CLIENT_HYDRO_DATA_PATH"] = env_data_path
+        api_result = render_current_conditions_heatmap("test_user", "test_domain")
+        typed_result = render_current_conditions_heatmap("test_user", "test_domain", {"z_encoding": "f8"})
+        for trace, typed_trace in zip(api_result["traces"], typed_result["traces"]):
+            np.testing.assert_array_equal(np.array(trace["z"]), decode_typed_array(typed_trace["z"]))
+
+if __name__ == "__main__":
+    unittest.main()
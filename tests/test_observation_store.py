@@ -0,0 +1,167 @@
+"""
+    test_observation_store.py
+
+    This is a unit test for the observation_store.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+import xarray as xr
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from helpers import copy_test_data
+from hydrogen_widgets.utilities import observation_store
+from hydrogen_widgets.utilities.observation_store import (
+    clear_observation_stores,
+    configure_observation_store,
+    get_observation_store,
+    get_observations,
+    read_observation_file,
+)
+from hydrogen_widgets.utilities.widget_cache_path import configure_widget_cache_path
+from hydrogen_widgets.terrain_obs_points import render_terrain_obs_points
+
+# pylint: disable=C0413
+
+
+class TestObservationStore(unittest.TestCase):
+    """Unit test class"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        data_path = self.temp_dir.name
+        self.domain_path = copy_test_data(data_path)
+        self.streamflow_path = os.path.join(self.domain_path, "observations", "streamflow")
+        self.cache_path = os.path.join(data_path, "widget_cache")
+        configure_widget_cache_path(self.cache_path)
+        clear_observation_stores()
+
+    def tearDown(self):
+        configure_widget_cache_path(None)
+        configure_observation_store(True)
+        clear_observation_stores()
+        self.temp_dir.cleanup()
+
+    def test_series(self):
+        """Test that the observations of the store are the observations of the files."""
+
+        observation_files = sorted(os.listdir(os.path.dirname(self.streamflow_path)))
+        store = get_observation_store(self.domain_path, "streamflow")
+        self.assertEqual(5, len(store.sites))
+        # The store files are written to the widget cache directory, not to the observations directory
+        self.assertEqual(
+            os.path.join(self.cache_path, "test_user", "test_domain", "observations", "store", "streamflow"),
+            store.directory,
+        )
+        self.assertEqual(observation_files, sorted(os.listdir(os.path.dirname(self.streamflow_path))))
+        self.assertIsInstance(store.dates, np.memmap)
+        (file_dates, file_values) = read_observation_file(f"{self.streamflow_path}/06714215.nc", "streamflow")
+        (dates, values) = store.series("06714215")
+        np.testing.assert_array_equal(file_dates, dates)
+        np.testing.assert_array_equal(file_values, values)
+
+        # A date range is a slice of the columns
+        (dates, values) = store.series("06714215", np.datetime64("2000-01-01"), np.datetime64("2000-02-01"))
+        self.assertEqual(31, len(dates))
+        self.assertEqual(np.datetime64("2000-01-01", "ns"), dates[0])
+        self.assertTrue(np.shares_memory(values, store.values))
+        self.assertEqual(0, len(store.series("06714215", np.datetime64("2030-01-01"))[0]))
+        with self.assertRaises(Exception):
+            store.series("00000000")
+
+        # The observations are the same without the store
+        configure_observation_store(False)
+        (file_dates, file_values) = get_observations(
+            self.domain_path, "streamflow", "06714215", np.datetime64("2000-01-01"), np.datetime64("2000-02-01")
+        )
+        np.testing.assert_array_equal(file_dates, dates)
+        np.testing.assert_array_equal(file_values, values)
+
+    def test_update(self):
+        """Test that added, modified and removed observation files update the store."""
+
+        store = get_observation_store(self.domain_path, "streamflow")
+        rows = store.rows
+        with xr.open_dataset(f"{self.streamflow_path}/06718550.nc") as ds:
+            ds = ds.load()
+        ds["streamflow"][0] = np.nan
+        ds = ds.isel(datetime=slice(None, None, -1))
+        ds.to_netcdf(f"{self.streamflow_path}/06718550.nc")
+
+        # Only the modified file is read
+        with mock.patch.object(
+            observation_store, "read_observation_file", wraps=observation_store.read_observation_file
+        ) as read_file:
+            store = get_observation_store(self.domain_path, "streamflow")
+            self.assertEqual(1, read_file.call_count)
+        self.assertEqual(rows + ds.sizes["datetime"], store.rows)
+        (dates, values) = get_observations(self.domain_path, "streamflow", "06718550", dropna=True)
+        self.assertEqual(ds.sizes["datetime"] - 1, len(dates))
+        self.assertTrue(np.all(dates[1:] > dates[:-1]))
+        self.assertFalse(np.isnan(values).any())
+
+        # The store files are shared by the processes of the domain
+        clear_observation_stores()
+        with mock.patch.object(observation_store, "read_observation_file") as read_file:
+            self.assertEqual(store.rows, get_observation_store(self.domain_path, "streamflow").rows)
+            read_file.assert_not_called()
+
+        # The columns are compacted when most of their records were removed
+        for name in ["06713500.nc", "06714215.nc", "06719505.nc"]:
+            os.remove(f"{self.streamflow_path}/{name}")
+        store = get_observation_store(self.domain_path, "streamflow")
+        self.assertEqual(["06718550", "394839104570300"], sorted(store.sites))
+        self.assertEqual(sum(site[4] for site in store.sites.values()), store.rows)
+        (dates, values) = store.series("394839104570300")
+        (file_dates, file_values) = read_observation_file(f"{self.streamflow_path}/394839104570300.nc", "streamflow")
+        np.testing.assert_array_equal(file_dates, dates)
+        np.testing.assert_array_equal(file_values, values)
+        store_files = os.listdir(store.directory)
+        self.assertEqual(["dates.1.dat", "values.1.dat"], sorted(f for f in store_files if f.endswith(".dat")))
+
+    def test_without_store_files(self):
+        """Test that the store is not used without a widget cache path or file locks."""
+
+        configure_widget_cache_path(None)
+        self.assertIsNone(get_observation_store(self.domain_path, "streamflow"))
+        configure_widget_cache_path(self.cache_path)
+        with mock.patch.object(observation_store, "fcntl", None):
+            self.assertIsNone(get_observation_store(self.domain_path, "streamflow"))
+            (dates, values) = get_observations(self.domain_path, "streamflow", "06714215")
+        (file_dates, file_values) = read_observation_file(f"{self.streamflow_path}/06714215.nc", "streamflow")
+        np.testing.assert_array_equal(file_dates, dates)
+        np.testing.assert_array_equal(file_values, values)
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_domain_locks(self):
+        """Test that the store of a domain is updated while the store of another domain is updated."""
+
+        other_domain_path = os.path.join(os.path.dirname(self.domain_path), "other_domain")
+        shutil.copytree(self.domain_path, other_domain_path)
+        directory = observation_store.get_observation_store_directory(self.domain_path, "streamflow")
+        get_observation_store(self.domain_path, "streamflow")
+        stores = []
+        with observation_store._directory_locks[directory]:
+            thread = threading.Thread(target=lambda: stores.append(get_observation_store(other_domain_path, "streamflow")))
+            thread.start()
+            thread.join(10)
+            self.assertEqual(1, len(stores))
+        self.assertEqual(5, len(stores[0].sites))
+
+    def test_terrain_obs_points(self):
+        """Test the terrain observation points widget with and without the store."""
+
+        query_parameters = {"site_id": "403536111545001", "site_name": "test", "site_type": "groundwater"}
+        result = render_terrain_obs_points("test_user", "test_domain", query_parameters)
+        configure_observation_store(False)
+        self.assertEqual(result, render_terrain_obs_points("test_user", "test_domain", query_parameters))
+        self.assertEqual("2020-09-11", result["traces"][0]["x"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+    test_plotly_traces.py
+
+    This is a unit test for the plotly_traces.py
+"""
+import os
+import sys
+import subprocess
+import unittest
+import numpy as np
+import pandas as pd
+import xarray as xr
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities.plotly_traces import build_trace, configure_trace_validation
+from hydrogen_widgets.utilities.widget_json import dumps_widget_response
+
+# pylint: disable=C0413
+
+
+class TestPlotlyTraces(unittest.TestCase):
+    """Unit test class"""
+
+    def tearDown(self):
+        configure_trace_validation(False)
+
+    def test_build_trace(self):
+        """Test that the data arrays of a trace are NumPy arrays and the other attributes are kept."""
+
+        values = np.array([1.5, np.nan, 2.5])
+        dates = xr.DataArray(pd.date_range("2022-06-01", periods=3, freq="D"), dims="time")
+        trace = build_trace("scatter", name="Run 1", line={"width": 4}, x=dates, y=values)
+        self.assertEqual(["type", "name", "line", "x", "y"], list(trace.keys()))
+        self.assertEqual("scatter", trace["type"])
+        self.assertIs(values, trace["y"])
+        self.assertIsInstance(trace["x"], np.ndarray)
+        response = dumps_widget_response(trace)
+        self.assertTrue(response.startswith(b'{"type":"scatter","name":"Run 1","line":{"width":4},"x":["2022-06-01T00:00'))
+        self.assertTrue(response.endswith(b'"y":[1.5,null,2.5]}'))
+        trace = build_trace("scattergeo", lat=pd.Series([39.7, 39.8]), lon=(-105.0, -105.1))
+        np.testing.assert_array_equal([39.7, 39.8], trace["lat"])
+        self.assertEqual((-105.0, -105.1), trace["lon"])
+
+    def test_validation(self):
+        """Test that traces are validated with plotly only when validation is enabled."""
+
+        self.assertEqual("red", build_trace("scatter", colour="red")["colour"])
+        configure_trace_validation(True)
+        trace = build_trace("scatter", mode="lines", y=np.arange(3))
+        self.assertEqual("scatter", trace["type"])
+        with self.assertRaises(Exception):
+            build_trace("scatter", colour="red")
+
+    def test_plotly_not_imported(self):
+        """Test that rendering widgets with traces does not import plotly."""
+
+        root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+        code = (
+            "import os, sys\n"
+            "os.environ['CLIENT_HYDRO_DATA_PATH'] = os.path.abspath('tests/test_data')\n"
+            "from hydrogen_widgets.location_map import render_location_map\n"
+            "render_location_map('test_user', 'test_domain')\n"
+            "print('plotly' in sys.modules)\n"
+        )
+        environment = {key: value for key, value in os.environ.items() if key != "HYDROGEN_WIDGET_VALIDATE_TRACES"}
+        output = subprocess.check_output([sys.executable, "-c", code], cwd=root_path, text=True, env=environment)
+        self.assertEqual("False", output.strip())
+
+
+if __name__ == "__main__":
+    unittest.main()
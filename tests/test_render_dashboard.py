@@ -0,0 +1,64 @@
+"""
+    test_render_dashboard.py
+
+    This is a unit test for the render_dashboard.py
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import xarray as xr
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from helpers import copy_test_data
+from hydrogen_widgets.utilities import forecast_utilities
+from hydrogen_widgets.utilities.active_cells import clear_active_cells
+from hydrogen_widgets.utilities.render_dashboard import render_dashboard
+
+# pylint: disable=C0413
+
+class TestRenderDashboard(unittest.TestCase):
+    """Unit test class"""
+
+    def test_watershed_conditions(self):
+        """Test rendering the widgets of the watershed conditions dashboard."""
+
+        env_data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "test_data"))
+        os.environ["CLIENT_HYDRO_DATA_PATH"] = env_data_path
+        api_result = render_dashboard("watershed_conditions", "test_user", "test_domain", use_cache=False)
+        self.assertEqual(
+            ["current_conditions_heatmap", "location_map", "observation_points"], list(api_result.keys())
+        )
+        self.assertEqual("usa", api_result["location_map"].get("layout").get("geo").get("scope"))
+
+    def test_forecasts(self):
+        """Test that the forecast widgets of the forecasts dashboard open the forecast file once."""
+
+        with tempfile.TemporaryDirectory() as data_path:
+            copy_test_data(data_path, forecast=True)
+            clear_active_cells()
+
+            with mock.patch.object(
+                forecast_utilities.xr, "open_dataset", wraps=xr.open_dataset
+            ) as open_dataset:
+                api_result = render_dashboard(
+                    "forecasts", "test_user", "test_domain", {"scenario_id": "test_average"}, use_cache=False
+                )
+                # The forecast file and the static domain variables file, and the static domain
+                # variables file once per process to read the active cells
+                self.assertEqual(3, open_dataset.call_count)
+            self.assertEqual(4, len(api_result))
+            self.assertEqual(5, len(api_result["forecast_soilmoisture_heatmap"].get("traces")))
+            self.assertEqual(5, len(api_result["forecast_watertable_heatmap"].get("traces")))
+            self.assertEqual(2, len(api_result["forecast_time_series"].get("subplots")))
+
+    def test_unknown_dashboard(self):
+        """Test an unknown dashboard."""
+
+        with self.assertRaises(Exception):
+            render_dashboard("dummy", "test_user", "test_domain")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+    test_render_timing.py
+
+    This is a unit test for the render_timing.py
+"""
+import os
+import sys
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities.render_timing import (
+    StageTimingHistogram,
+    add_timing_sink,
+    remove_timing_sink,
+    timed_stage,
+    is_timing_enabled,
+)
+from hydrogen_widgets.utilities.get_widget_result import get_widget_result
+
+# pylint: disable=C0413
+
+class TestRenderTiming(unittest.TestCase):
+    """Unit test class"""
+
+    def test_stage_timings(self):
+        """Test that the stages of a widget render are passed to a sink."""
+
+        env_data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "test_data"))
+        os.environ["CLIENT_HYDRO_DATA_PATH"] = env_data_path
+        calls = []
+        histogram = StageTimingHistogram()
+
+        def callback(datasource, stage, seconds):
+            calls.append((datasource, stage, seconds))
+
+        add_timing_sink(callback)
+        add_timing_sink(histogram)
+        try:
+            get_widget_result("current_conditions_heatmap", "test_user", "test_domain", use_cache=False)
+            get_widget_result("current_conditions_heatmap", "test_user", "test_domain", use_cache=False)
+        finally:
+            remove_timing_sink(callback)
+            remove_timing_sink(histogram)
+
+        stages = [stage for datasource, stage, _ in calls if datasource == "current_conditions_heatmap"]
+        self.assertEqual(2, stages.count("total"))
+        self.assertEqual(2, stages.count("open"))
+        self.assertEqual(2, stages.count("encode"))
+        timings = histogram.percentiles()["current_conditions_heatmap"]
+        self.assertEqual(2, timings["read"]["count"])
+        self.assertLessEqual(timings["total"]["p50"], timings["total"]["p95"])
+        self.assertGreaterEqual(timings["total"]["p50"], timings["read"]["p50"])
+
+    def test_disabled(self):
+        """Test that a stage does nothing when there is no sink."""
+
+        self.assertFalse(is_timing_enabled())
+        with timed_stage("compute"):
+            pass
+
+    def test_percentiles(self):
+        """Test the percentiles of the histogram."""
+
+        histogram = StageTimingHistogram(max_samples=100)
+        for i in range(101):
+            histogram("widget", "read", float(i))
+        timings = histogram.percentiles()["widget"]["read"]
+        self.assertEqual(101, timings["count"])
+        self.assertEqual(50.5, timings["p50"])
+        self.assertEqual(95.05, round(timings["p95"], 2))
+        self.assertEqual(100.0, timings["max"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,8 +6,11 @@
 import os
 import sys
 import unittest
+import numpy as np
+import xarray as xr
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from hydrogen_widgets.scenarios_timeseries import render_scenario_timeseries
+from hydrogen_widgets.scenarios_timeseries import get_spatial_means, render_scenario_timeseries
+from hydrogen_widgets.utilities.active_cells import ActiveCells
 
 # pylint: disable=C0413
 
@@ -25,5 +28,28 @@ class TestScenariesTimeseries(unittest.TestCase):
         api_result = render_scenario_timeseries("test_user", "test_domain", test_query_parameters)
         self.assertEqual(5, len(api_result.get("layout").get("updatemenus")[0].get("buttons")))
 
+    def test_spatial_means(self):
+        """Test that the spatial means are the xarray means of the active cells ignoring missing values."""
+
+        rng = np.random.default_rng(0)
+        values = rng.uniform(0.0, 300.0, (6, 20, 49)).astype("float32")
+        values[1, 3:7, 10:20] = np.nan
+        values[4] = np.nan
+        expected = xr.DataArray(values, dims=("time", "y", "x")).mean(dim=["x", "y"]).values
+        for active_cells in [None, ActiveCells(np.ones((20, 49), dtype=bool))]:
+            means = get_spatial_means(values, active_cells)
+            np.testing.assert_allclose(expected, means, rtol=1e-6)
+            # A time without a value has no mean
+            self.assertTrue(np.isnan(means[4]))
+
+        # Only the active cells are averaged
+        mask = np.zeros((20, 49), dtype=bool)
+        mask[:10] = True
+        np.testing.assert_allclose(
+            np.nanmean(values[[0, 1, 2, 3, 5], :10], axis=(1, 2)),
+            get_spatial_means(values, ActiveCells(mask))[[0, 1, 2, 3, 5]],
+            rtol=1e-6,
+        )
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,100 @@
+"""
+    test_widget_cache.py
+
+    This is a unit test for the widget_cache.py
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from helpers import copy_test_data
+from hydrogen_widgets.utilities.widget_cache import WidgetCache, get_json_compatible_cache, get_widget_cache
+from hydrogen_widgets.utilities.get_widget_result import get_widget_response, get_widget_result, NOT_MODIFIED
+from hydrogen_widgets.utilities.widget_json import to_json_compatible
+
+# pylint: disable=C0413
+
+class TestWidgetCache(unittest.TestCase):
+    """Unit test class"""
+
+    def test_lru_eviction(self):
+        """Test that least recently used entries are evicted to stay within the byte budget."""
+
+        cache = WidgetCache(max_bytes=100)
+        cache.put(("a",), {"traces": []}, size=40)
+        cache.put(("b",), {"traces": []}, size=40)
+        self.assertIsNotNone(cache.get(("a",)))
+        cache.put(("c",), {"traces": []}, size=40)
+        self.assertIsNone(cache.get(("b",)))
+        self.assertIsNotNone(cache.get(("a",)))
+        self.assertIsNotNone(cache.get(("c",)))
+        stats = cache.stats()
+        self.assertEqual(1, stats["evictions"])
+        self.assertEqual(80, stats["bytes"])
+        self.assertEqual(3, stats["hits"])
+        self.assertEqual(1, stats["misses"])
+
+        # An entry larger than the budget is not cached
+        cache.put(("d",), {"traces": []}, size=101)
+        self.assertIsNone(cache.get(("d",)))
+
+    def test_get_widget_result_cache(self):
+        """Test that a cached response is returned until an input file changes."""
+
+        with tempfile.TemporaryDirectory() as data_path:
+            copy_test_data(data_path)
+            cache = get_widget_cache()
+            cache.clear()
+
+            result1 = get_widget_response("location_map", "test_user", "test_domain")
+            result2 = get_widget_response("location_map", "test_user", "test_domain")
+            self.assertIs(result1, result2)
+            self.assertEqual(1, cache.stats()["hits"])
+
+            obs_sites = os.path.join(data_path, "test_user", "test_domain", "domain_files", "obs_sites.csv")
+            stat = os.stat(obs_sites)
+            os.utime(obs_sites, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            result3 = get_widget_response("location_map", "test_user", "test_domain")
+            self.assertIsNot(result1, result3)
+            self.assertEqual(to_json_compatible(result1), to_json_compatible(result3))
+
+            result4 = get_widget_response("location_map", "test_user", "test_domain", use_cache=False)
+            self.assertIsNot(result3, result4)
+
+            # A cache hit of get_widget_result does not convert the arrays of the response again
+            result5 = get_widget_result("location_map", "test_user", "test_domain")
+            with patch("hydrogen_widgets.utilities.get_widget_result.to_json_compatible") as convert:
+                self.assertIs(result5, get_widget_result("location_map", "test_user", "test_domain"))
+                convert.assert_not_called()
+            cache.clear()
+            get_json_compatible_cache().clear()
+
+    def test_etag(self):
+        """Test that a response is not rendered when the ETag of the caller is unchanged."""
+
+        with tempfile.TemporaryDirectory() as data_path:
+            copy_test_data(data_path)
+
+            result, etag = get_widget_result("terrain_map", "test_user", "test_domain", use_cache=False, return_etag=True)
+            self.assertIsNotNone(result)
+            self.assertIsNotNone(etag)
+
+            with patch("hydrogen_widgets.utilities.get_widget_result.render_widget") as render:
+                result = get_widget_result("terrain_map", "test_user", "test_domain", use_cache=False, if_none_match=f'W/"{etag}"')
+                self.assertIs(NOT_MODIFIED, result)
+                render.assert_not_called()
+
+            obs_sites = os.path.join(data_path, "test_user", "test_domain", "domain_files", "obs_sites.csv")
+            stat = os.stat(obs_sites)
+            os.utime(obs_sites, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            result, new_etag = get_widget_result(
+                "terrain_map", "test_user", "test_domain", use_cache=False, if_none_match=etag, return_etag=True
+            )
+            self.assertIsNot(NOT_MODIFIED, result)
+            self.assertNotEqual(etag, new_etag)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+"""
+    test_widget_cache_path.py
+
+    This is a unit test for the widget_cache_path.py
+"""
+import os
+import sys
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities.widget_cache_path import configure_widget_cache_path, get_domain_cache_directory
+
+# pylint: disable=C0413
+
+
+class TestWidgetCachePath(unittest.TestCase):
+    """Unit test class"""
+
+    def tearDown(self):
+        configure_widget_cache_path(None)
+
+    def test_domain_cache_directory(self):
+        """Test the widget cache directory of domains in and outside the data path."""
+
+        data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "test_data"))
+        os.environ["CLIENT_HYDRO_DATA_PATH"] = data_path
+        self.assertIsNone(get_domain_cache_directory(f"{data_path}/test_user/test_domain"))
+
+        configure_widget_cache_path("/cache")
+        self.assertEqual(
+            os.path.join("/cache", "test_user", "test_domain"),
+            get_domain_cache_directory(f"{data_path}/test_user/test_domain"),
+        )
+        other_directory = get_domain_cache_directory("/other/test_user/test_domain")
+        self.assertEqual(os.path.join("/cache", "_"), os.path.dirname(other_directory))
+        self.assertNotEqual(other_directory, get_domain_cache_directory("/other/test_user/other_domain"))
+        self.assertEqual(other_directory, get_domain_cache_directory("/other/test_user/../test_user/test_domain"))
+        # The data path itself is not a domain of a user
+        self.assertEqual(os.path.join("/cache", "_"), os.path.dirname(get_domain_cache_directory(data_path)))
+
+
+if __name__ == "__main__":
+    unittest.main()
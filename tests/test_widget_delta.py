@@ -0,0 +1,175 @@
+"""
+    test_widget_delta.py
+
+    This is a unit test for the widget_delta.py
+"""
+import os
+import sys
+import copy
+import tempfile
+import unittest
+import numpy as np
+import xarray as xr
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from helpers import copy_test_data
+from hydrogen_widgets.utilities.widget_delta import apply_widget_delta, compute_widget_delta, get_delta_bases
+from hydrogen_widgets.utilities.get_widget_result import get_widget_result
+from hydrogen_widgets.utilities.widget_json import to_json_compatible
+
+# pylint: disable=C0413
+
+
+class TestWidgetDelta(unittest.TestCase):
+    """Unit test class"""
+
+    def test_heatmap_cells(self):
+        """Test that only the changed cells of a heatmap are in the delta."""
+
+        grid = np.arange(400, dtype=np.float64).reshape(20, 20)
+        grid[0, 0] = np.nan
+        base = {"traces": [{"type": "heatmap", "z": grid, "name": "SM"}], "layout": {"title": "a", "old": 1}}
+        new_grid = grid.copy()
+        new_grid[3, 4] = -1.0
+        new_grid[19, 19] = np.nan
+        response = {"traces": [{"type": "heatmap", "z": new_grid, "name": "SM"}], "layout": {"title": "b"}}
+        delta = compute_widget_delta(base, response, "etag1")
+        self.assertEqual("etag1", delta["delta_from"])
+        operations = {operation["op"]: operation for operation in delta["operations"]}
+        self.assertEqual([0, "z"], operations["cells"]["path"][1:])
+        np.testing.assert_array_equal([64, 399], operations["cells"]["indexes"])
+        self.assertEqual(["layout", "old"], operations["remove"]["path"])
+        self.assertEqual("b", operations["replace"]["value"])
+        applied = apply_widget_delta(base, delta)
+        np.testing.assert_array_equal(new_grid, applied["traces"][0]["z"])
+        self.assertEqual({"title": "b"}, applied["layout"])
+        # The base is not changed
+        self.assertEqual(1, base["layout"]["old"])
+
+        # Float values of the cells of an array of ints are not truncated
+        counts = {"z": np.arange(1000)}
+        new_counts = counts["z"].astype(np.float64)
+        new_counts[2] = 1.5
+        applied = apply_widget_delta(counts, compute_widget_delta(counts, {"z": new_counts}, "etag1"))
+        np.testing.assert_array_equal(new_counts, applied["z"])
+
+        # A delta that is not smaller than the response is not returned
+        self.assertIsNone(compute_widget_delta(base, {"traces": [{"z": grid + 1.0}]}, "etag1"))
+
+    def test_timeseries_append(self):
+        """Test that new time points of a timeseries are appended."""
+
+        dates = np.arange("2022-01-01", "2023-01-01", dtype="datetime64[D]")
+        values = np.linspace(0.0, 1.0, len(dates))
+        base = {"traces": [{"type": "scatter", "x": dates, "y": values.tolist()}]}
+        new_dates = np.arange("2022-01-03", "2023-01-04", dtype="datetime64[D]")
+        new_values = np.concatenate([values[2:], [2.0, 3.0, 4.0]])
+        response = {"traces": [{"type": "scatter", "x": new_dates, "y": new_values}]}
+        delta = compute_widget_delta(base, response, "etag1")
+        self.assertEqual(["append", "append"], [operation["op"] for operation in delta["operations"]])
+        self.assertEqual(2, delta["operations"][0]["drop"])
+        np.testing.assert_array_equal([2.0, 3.0, 4.0], delta["operations"][1]["values"])
+        applied = apply_widget_delta(base, delta)
+        np.testing.assert_array_equal(new_dates, applied["traces"][0]["x"])
+        np.testing.assert_array_equal(new_values, applied["traces"][0]["y"])
+
+    def test_rolling_window_append(self):
+        """Test that the new time points of a timeseries window of a fixed length are appended."""
+
+        dates = [str(date) for date in np.arange("2022-01-01", "2023-01-02", dtype="datetime64[D]")]
+        values = np.linspace(0.0, 1.0, len(dates))
+        base = {"traces": [{"type": "scatter", "x": dates[:-1], "y": values[:-1]}]}
+        response = {"traces": [{"type": "scatter", "x": dates[1:], "y": values[1:]}]}
+        delta = compute_widget_delta(base, response, "etag1")
+        self.assertEqual(["append", "append"], [operation["op"] for operation in delta["operations"]])
+        self.assertEqual([1, 1], [operation["drop"] for operation in delta["operations"]])
+        self.assertEqual(["2023-01-01"], to_json_compatible(delta["operations"][0]["values"]))
+        applied = apply_widget_delta(base, delta)
+        self.assertEqual(dates[1:], to_json_compatible(applied["traces"][0]["x"]))
+        np.testing.assert_array_equal(values[1:], applied["traces"][0]["y"])
+
+    def test_string_arrays(self):
+        """Test that unchanged arrays and lists of strings are not replaced and changed strings are cells."""
+
+        names = np.array(["soil moisture", "water table depth"] * 50)
+        base = {"traces": [{"x": names, "text": names.tolist()}]}
+        self.assertEqual([], compute_widget_delta(base, copy.deepcopy(base), "etag1")["operations"])
+        new_names = names.tolist()
+        new_names[3] = "a longer water table depth"
+        response = {"traces": [{"x": np.array(new_names), "text": new_names}]}
+        delta = compute_widget_delta(base, response, "etag1")
+        self.assertEqual(["cells", "cells"], [operation["op"] for operation in delta["operations"]])
+        applied = apply_widget_delta(base, delta)
+        self.assertEqual(new_names, to_json_compatible(applied["traces"][0]["x"]))
+        self.assertEqual(new_names, to_json_compatible(applied["traces"][0]["text"]))
+
+    def test_timeseries_widget_append(self):
+        """Test the delta of the terrain observation points widget when a new observation arrives."""
+
+        with tempfile.TemporaryDirectory() as data_path:
+            copy_test_data(data_path)
+            get_delta_bases().clear()
+            query_parameters = {"site_id": "403536111545001", "site_name": "test", "site_type": "groundwater"}
+            base, etag = get_widget_result(
+                "terrain_obs_points", "test_user", "test_domain", query_parameters, return_etag=True
+            )
+
+            path = os.path.join(data_path, "test_user", "test_domain", "observations", "groundwater", "403536111545001.nc")
+            with xr.open_dataset(path) as ds:
+                ds = ds.load()
+            new_observation = xr.Dataset({"wtd": ("datetime", [5.0])}, coords={"datetime": ["2022-03-25"]})
+            xr.concat([ds, new_observation], dim="datetime").to_netcdf(path)
+
+            delta = get_widget_result(
+                "terrain_obs_points", "test_user", "test_domain", query_parameters,
+                if_none_match=etag, accept_delta=True,
+            )
+            self.assertEqual(etag, delta["delta_from"])
+            operations = {operation["path"][-1]: operation for operation in delta["operations"]}
+            self.assertEqual(["append", "append"], [operations[key]["op"] for key in ["x", "y"]])
+            self.assertEqual(["2022-03-25"], to_json_compatible(operations["x"]["values"]))
+            response = get_widget_result("terrain_obs_points", "test_user", "test_domain", query_parameters)
+            self.assertEqual(response["traces"], to_json_compatible(apply_widget_delta(base, delta))["traces"])
+            get_delta_bases().clear()
+
+    def test_get_widget_result_delta(self):
+        """Test the delta of the current conditions heatmap when a new current conditions file arrives."""
+
+        with tempfile.TemporaryDirectory() as data_path:
+            copy_test_data(data_path)
+            get_delta_bases().clear()
+            base, etag = get_widget_result("current_conditions_heatmap", "test_user", "test_domain", return_etag=True)
+
+            current_conditions_path = os.path.join(data_path, "test_user", "test_domain", "current_conditions")
+            with xr.open_dataset(f"{current_conditions_path}/current_conditions.05272022.nc") as ds:
+                ds = ds.load()
+            ds["water_table_depth"][2, 3] = 99.0
+            ds.to_netcdf(f"{current_conditions_path}/current_conditions.05282022.nc")
+
+            delta, new_etag = get_widget_result(
+                "current_conditions_heatmap", "test_user", "test_domain",
+                if_none_match=f'W/"{etag}"', return_etag=True, accept_delta=True,
+            )
+            self.assertNotEqual(etag, new_etag)
+            self.assertEqual(etag, delta["delta_from"])
+            self.assertEqual(1, len(delta["operations"]))
+            self.assertEqual([2 * 49 + 3], delta["operations"][0]["indexes"])
+            response = get_widget_result("current_conditions_heatmap", "test_user", "test_domain")
+            applied = to_json_compatible(apply_widget_delta(base, delta))
+            np.testing.assert_array_equal(response["traces"][1]["z"], applied["traces"][1]["z"])
+
+            # Without a cached base or accept_delta the full response is returned
+            get_delta_bases().clear()
+            response = get_widget_result(
+                "current_conditions_heatmap", "test_user", "test_domain", if_none_match=etag, accept_delta=True
+            )
+            self.assertIn("traces", response)
+
+            # The responses of callers that do not use ETags are not kept as delta bases
+            get_delta_bases().clear()
+            get_widget_result("current_conditions_heatmap", "test_user", "test_domain")
+            self.assertEqual(0, get_delta_bases().stats()["entries"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+    test_widget_json.py
+
+    This is a unit test for the widget_json.py
+"""
+import os
+import sys
+import json
+import unittest
+from unittest import mock
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities import widget_json
+from hydrogen_widgets.utilities.widget_json import (
+    dumps_widget_response,
+    to_json_compatible,
+    estimate_response_bytes,
+)
+from hydrogen_widgets.utilities.get_widget_result import get_widget_result, get_widget_result_json
+
+# pylint: disable=C0413
+
+class TestWidgetJson(unittest.TestCase):
+    """Unit test class"""
+
+    def test_dumps_arrays(self):
+        """Test writing NumPy arrays to json."""
+
+        response = {
+            "z": np.array([[1.5, np.nan, 3.0], [4.0, -np.inf, 0.1]]),
+            "x": np.array(["2022-06-01", "NaT"], dtype="datetime64[D]"),
+            "counts": np.arange(3, dtype="int32"),
+            "flags": np.array([True, False]),
+            "masked": np.ma.masked_array([1.0, 2.0], mask=[False, True]),
+            "grid": np.zeros((2, 0)),
+            "cube": np.ones((2, 1, 2), dtype="float32"),
+            "scale": np.float32(0.5),
+            "name": "test",
+            "list": [1, None, np.int64(2)],
+        }
+        result = json.loads(dumps_widget_response(response))
+        self.assertEqual([[1.5, None, 3.0], [4.0, None, 0.1]], result["z"])
+        self.assertEqual(["2022-06-01", None], result["x"])
+        self.assertEqual([0, 1, 2], result["counts"])
+        self.assertEqual([True, False], result["flags"])
+        self.assertEqual([1.0, None], result["masked"])
+        self.assertEqual([[], []], result["grid"])
+        self.assertEqual([[[1.0, 1.0]], [[1.0, 1.0]]], result["cube"])
+        self.assertEqual(0.5, result["scale"])
+        self.assertEqual("test", result["name"])
+        self.assertEqual([1, None, 2], result["list"])
+
+    def test_same_values_as_lists(self):
+        """Test the json of an array has the same values as the json of the array as lists."""
+
+        grid = np.random.default_rng(1).random((50, 40))
+        self.assertEqual(json.loads(json.dumps(grid.tolist())), json.loads(dumps_widget_response(grid)))
+
+    def test_blocks(self):
+        """Test that arrays formatted in several blocks of rows have the json of the arrays as lists."""
+
+        grid = np.random.default_rng(2).standard_normal((7, 5)) * 1e10
+        grid[2, 3] = np.nan
+        values = grid.reshape(-1)
+        dates = np.arange("2022-01-01", "2022-01-12", dtype="datetime64[D]")
+        with mock.patch.object(widget_json, "_BLOCK_VALUES", 10):
+            for array in [grid, values, grid.astype(np.float32), np.arange(-20, 15), dates]:
+                expected = json.loads(json.dumps(to_json_compatible(array)).replace("NaN", "null"))
+                self.assertEqual(expected, json.loads(dumps_widget_response(array)))
+
+    def test_to_json_compatible(self):
+        """Test converting the arrays of a response to lists."""
+
+        response = {"z": np.array([[1.0, 2.0]]), "x": np.array(["2022-06-01"], dtype="datetime64[D]")}
+        result = to_json_compatible(response)
+        self.assertEqual({"z": [[1.0, 2.0]], "x": ["2022-06-01"]}, result)
+        plain = {"traces": [{"x": [1, 2]}]}
+        self.assertIs(plain, to_json_compatible(plain))
+        self.assertGreaterEqual(estimate_response_bytes(response), response["z"].nbytes)
+
+    def test_get_widget_result_json(self):
+        """Test getting the json of a heatmap widget."""
+
+        env_data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "test_data"))
+        os.environ["CLIENT_HYDRO_DATA_PATH"] = env_data_path
+        result = get_widget_result("current_conditions_heatmap", "test_user", "test_domain", use_cache=False)
+        result_json = get_widget_result_json("current_conditions_heatmap", "test_user", "test_domain", use_cache=False)
+        self.assertIsInstance(result["traces"][0]["z"], list)
+        self.assertEqual(
+            json.loads(json.dumps(result).replace("NaN", "null")), json.loads(result_json)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
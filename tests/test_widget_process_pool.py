@@ -0,0 +1,48 @@
+"""
+    test_widget_process_pool.py
+
+    This is a unit test for the widget_process_pool.py
+"""
+import os
+import sys
+import json
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities.get_widget_result import get_widget_result
+from hydrogen_widgets.utilities.render_dashboard import render_dashboard
+from hydrogen_widgets.utilities.widget_process_pool import shutdown_widget_process_pool
+
+# pylint: disable=C0413
+
+class TestWidgetProcessPool(unittest.TestCase):
+    """Unit test class"""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_widget_process_pool()
+
+    def test_widget(self):
+        """Test rendering a widget in a worker process."""
+
+        env_data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "test_data"))
+        os.environ["CLIENT_HYDRO_DATA_PATH"] = env_data_path
+        api_result = get_widget_result("location_map", "test_user", "test_domain", use_cache=False, use_processes=True)
+        expected = get_widget_result("location_map", "test_user", "test_domain", use_cache=False)
+        self.assertEqual(json.dumps(expected), json.dumps(api_result))
+        self.assertIsNone(get_widget_result("dummy", "test_user", "test_domain", use_processes=True))
+
+    def test_dashboard(self):
+        """Test rendering the widgets of a dashboard in parallel in worker processes."""
+
+        env_data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "test_data"))
+        os.environ["CLIENT_HYDRO_DATA_PATH"] = env_data_path
+        api_result = render_dashboard(
+            "watershed_conditions", "test_user", "test_domain", use_cache=False, use_processes=True
+        )
+        self.assertEqual(
+            ["current_conditions_heatmap", "location_map", "observation_points"], list(api_result.keys())
+        )
+        self.assertEqual("Y [km]", api_result["current_conditions_heatmap"].get("layout").get("yaxis").get("title"))
+
+if __name__ == "__main__":
+    unittest.main()
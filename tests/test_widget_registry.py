@@ -0,0 +1,59 @@
+"""
+    test_widget_registry.py
+
+    This is a unit test for the widget_registry.py
+"""
+import os
+import sys
+import subprocess
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hydrogen_widgets.utilities.widget_registry import (
+    WidgetSpec,
+    DOMAIN_SIGNATURE,
+    WIDGET_REGISTRY,
+    register_widget,
+    render_widget,
+    get_datasources,
+)
+
+# pylint: disable=C0413
+
+def render_test_widget(user_id, domain_id):
+    """Widget used to test registering a widget."""
+
+    return {"traces": [], "layout": {"title": f"{user_id}/{domain_id}"}}
+
+
+class TestWidgetRegistry(unittest.TestCase):
+    """Unit test class"""
+
+    def test_lazy_import(self):
+        """Test that importing get_widget_result does not import the widget dependencies."""
+
+        root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+        code = (
+            "import sys\n"
+            "import hydrogen_widgets.utilities.get_widget_result\n"
+            "print(','.join(m for m in ['plotly', 'xarray', 'netCDF4', 'pandas', 'shapefile'] if m in sys.modules))\n"
+        )
+        output = subprocess.check_output([sys.executable, "-c", code], cwd=root_path, text=True)
+        self.assertEqual("", output.strip())
+
+    def test_register_widget(self):
+        """Test registering a new widget."""
+
+        register_widget(
+            "test_widget",
+            WidgetSpec(module=__name__, function="render_test_widget", signature=DOMAIN_SIGNATURE),
+        )
+        try:
+            self.assertIn("test_widget", get_datasources())
+            api_result = render_widget("test_widget", "test_user", "test_domain")
+            self.assertEqual("test_user/test_domain", api_result.get("layout").get("title"))
+            self.assertIsNone(render_widget("dummy", "test_user", "test_domain"))
+        finally:
+            del WIDGET_REGISTRY["test_widget"]
+
+if __name__ == "__main__":
+    unittest.main()
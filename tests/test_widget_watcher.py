@@ -0,0 +1,93 @@
+"""
+    test_widget_watcher.py
+
+    This is a unit test for the widget_watcher.py
+"""
+import os
+import sys
+import glob
+import shutil
+import tempfile
+import unittest
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from helpers import copy_test_data
+from hydrogen_widgets.utilities.widget_watcher import WidgetWatcher, get_dependent_widgets
+from hydrogen_widgets.utilities.widget_cache import get_widget_cache
+from hydrogen_widgets.utilities.get_widget_result import get_widget_result
+
+# pylint: disable=C0413
+
+class TestWidgetWatcher(unittest.TestCase):
+    """Unit test class"""
+
+    def test_dependent_widgets(self):
+        """Test finding the widgets that depend on changed files."""
+
+        result = get_dependent_widgets(["forecast/test_average/forecast.06012022.nc"])
+        self.assertEqual(
+            [
+                ("forecast_soilmoisture_heatmap", {"scenario_id": "test_average"}),
+                ("forecast_watertable_heatmap", {"scenario_id": "test_average"}),
+                ("forecast_time_series", {"scenario_id": "test_average"}),
+            ],
+            result,
+        )
+        result = get_dependent_widgets(["domain_files/obs_sites.csv"])
+        self.assertEqual(["location_map", "terrain_map", "observation_points"], [r[0] for r in result])
+        self.assertEqual([], get_dependent_widgets(["observations/streamflow/06713500.txt"]))
+
+        # The scenario of a widget depending on a file without placeholders is found in the domain files
+        result = get_dependent_widgets(
+            ["domain_files/static_domain_variables.nc"],
+            ["domain_files/static_domain_variables.nc", "forecast/test_average/forecast.06012022.nc"],
+        )
+        self.assertEqual(
+            [
+                ("current_conditions_heatmap", None),
+                ("forecast_soilmoisture_heatmap", {"scenario_id": "test_average"}),
+                ("forecast_watertable_heatmap", {"scenario_id": "test_average"}),
+                ("forecast_time_series", {"scenario_id": "test_average"}),
+            ],
+            result,
+        )
+
+    def test_poll(self):
+        """Test that a changed file is rendered into the on-disk cache."""
+
+        with tempfile.TemporaryDirectory() as data_path, tempfile.TemporaryDirectory() as cache_dir:
+            copy_test_data(data_path)
+            os.environ["HYDROGEN_WIDGET_CACHE_DIR"] = cache_dir
+            try:
+                watcher = WidgetWatcher([("test_user", "test_domain")], prerender_existing=False)
+                self.assertEqual([], watcher.poll())
+
+                cc_file = glob.glob(f"{data_path}/test_user/test_domain/current_conditions/*.nc")[0]
+                shutil.copy(cc_file, cc_file.replace("05272022", "05282022"))
+                rendered = watcher.poll()
+                self.assertEqual([("test_user", "test_domain", "current_conditions_heatmap", None)], rendered)
+                self.assertEqual(1, len(glob.glob(f"{cache_dir}/current_conditions_heatmap/*.json")))
+
+                # The widgets of every scenario depending on the static file are rendered
+                os.utime(f"{data_path}/test_user/test_domain/domain_files/static_domain_variables.nc")
+                rendered = watcher.poll()
+                self.assertEqual(
+                    [
+                        ("test_user", "test_domain", "current_conditions_heatmap", None),
+                        ("test_user", "test_domain", "scenario_timeseries", {"scenario_id": "test_average"}),
+                    ],
+                    rendered,
+                )
+                self.assertEqual(0, watcher.errors)
+
+                # The response is served from the disk cache
+                get_widget_cache().clear()
+                get_widget_result("current_conditions_heatmap", "test_user", "test_domain")
+                self.assertEqual(1, get_widget_cache().stats()["misses"])
+                self.assertEqual(1, len(glob.glob(f"{cache_dir}/current_conditions_heatmap/*.json")))
+            finally:
+                del os.environ["HYDROGEN_WIDGET_CACHE_DIR"]
+                get_widget_cache().clear()
+
+if __name__ == "__main__":
+    unittest.main()